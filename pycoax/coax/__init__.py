@@ -1,13 +1,15 @@
 from .__about__ import __version__
 
 from .interface import InterfaceFeature
-from .serial_interface import SerialInterface, open_serial_interface
+from .serial_interface import SerialInterface, InterfaceInfo, InfoQuery, open_serial_interface
+from .async_serial_interface import AsyncSerialInterface, open_async_serial_interface
 
 from .protocol import (
     PollAction,
     PollResponse,
     PowerOnResetCompletePollResponse,
     KeystrokePollResponse,
+    DataWords,
     TerminalType,
     Control,
     SecondaryControl,
@@ -51,10 +53,23 @@ from .features import (
 
 from .multiplexer import get_device_address
 
+from .pool import InterfacePool
+
+from .address_counter import AddressCounterSession
+
+from .optimizer import CommandOptimizer
+
+from .poll import PollEvent, PollEngine, PollScheduler
+
+from .screen import ScreenBuffer, read_buffer, interleave_eab, deinterleave_eab
+
+from .status import wait_for_status
+
 from .exceptions import (
     InterfaceError,
     ReceiveError,
     InterfaceTimeout,
     ReceiveTimeout,
-    ProtocolError
+    ProtocolError,
+    StatusTimeout
 )
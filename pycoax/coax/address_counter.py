@@ -0,0 +1,181 @@
+"""
+coax.address_counter
+~~~~~~~~~~~~~~~~~~~~
+"""
+
+from .interface import _normalize_commands, _get_result
+from .protocol import Poll, PollAck, ReadStatus, ReadTerminalId, ReadExtendedId, \
+                      ReadAddressCounterHi, ReadAddressCounterLo, ReadData, ReadMultiple, \
+                      LoadControlRegister, LoadSecondaryControl, LoadMask, LoadAddressCounterHi, \
+                      LoadAddressCounterLo, WriteData, ReadFeatureId, EABLoadMask, \
+                      EABWriteAlternate, EABReadStatus
+
+class AddressCounterSession:
+    """Execute commands on a terminal, tracking the address counter to drop
+    address counter loads that would not change it.
+
+    Loads are only dropped when the address counter is known from earlier
+    commands that all succeeded, or from an earlier load in the same batch.
+    Any error makes the address counter unknown until it is loaded or read.
+    """
+
+    def __init__(self, interface, address=None, step_inhibit=False):
+        self.interface = interface
+        self.address = address
+
+        self.address_counter_hi = None
+        self.address_counter_lo = None
+
+        # Step inhibit from the control register, None if unknown.
+        self.step_inhibit = step_inhibit
+
+        # Number of address counter loads dropped.
+        self.dropped_count = 0
+
+    @property
+    def address_counter(self):
+        """Address counter, None if unknown."""
+        if self.address_counter_hi is None or self.address_counter_lo is None:
+            return None
+
+        return (self.address_counter_hi << 8) | self.address_counter_lo
+
+    def invalidate(self):
+        """Mark the address counter as unknown."""
+        self.address_counter_hi = None
+        self.address_counter_lo = None
+
+    def execute(self, commands, timeout=None):
+        """Execute one or more commands."""
+        (normalized_commands, has_multiple_commands) = _normalize_commands(commands)
+
+        # Commands are executed on the session terminal.
+        if any(address not in (None, self.address) for (address, _) in normalized_commands):
+            raise ValueError('Command address must be the session address')
+
+        commands = [command for (_, command) in normalized_commands]
+
+        indexes = self._get_indexes(commands)
+
+        self.dropped_count += len(commands) - len(indexes)
+
+        responses = [None] * len(commands)
+
+        if indexes:
+            try:
+                executed_responses = self.interface.execute([(self.address, commands[index]) for index in indexes], timeout)
+            except BaseException:
+                self.invalidate()
+
+                raise
+
+            for (index, response) in zip(indexes, executed_responses):
+                responses[index] = response
+
+                self._update(commands[index], response)
+
+        return _get_result(responses, has_multiple_commands)
+
+    def _get_indexes(self, commands):
+        # Determine which commands to execute, loads are dropped if the
+        # register is known to already have the value.
+        indexes = []
+
+        hi = self.address_counter_hi
+        lo = self.address_counter_lo
+
+        for (index, command) in enumerate(commands):
+            if isinstance(command, LoadAddressCounterHi):
+                if command.address == hi:
+                    continue
+
+                hi = command.address
+            elif isinstance(command, LoadAddressCounterLo):
+                if command.address == lo:
+                    continue
+
+                lo = command.address
+            elif not _is_address_counter_unchanged(command):
+                # The address counter is known again only once the responses
+                # confirm the command succeeded.
+                hi = None
+                lo = None
+
+            indexes.append(index)
+
+        return indexes
+
+    def _update(self, command, response):
+        if isinstance(response, BaseException):
+            if isinstance(command, LoadControlRegister):
+                self.step_inhibit = None
+
+            self.invalidate()
+            return
+
+        if isinstance(command, LoadAddressCounterHi):
+            self.address_counter_hi = command.address
+        elif isinstance(command, LoadAddressCounterLo):
+            self.address_counter_lo = command.address
+        elif isinstance(command, ReadAddressCounterHi):
+            self.address_counter_hi = response
+        elif isinstance(command, ReadAddressCounterLo):
+            self.address_counter_lo = response
+        elif isinstance(command, LoadControlRegister):
+            self.step_inhibit = bool(command.control.step_inhibit)
+        elif isinstance(command, (WriteData, EABWriteAlternate)):
+            self._step(_get_write_length(command), True)
+        elif isinstance(command, ReadData):
+            self._step(1, False)
+        elif isinstance(command, ReadMultiple):
+            self._step(len(response), False)
+        elif not _is_address_counter_unchanged(command):
+            self.invalidate()
+
+    def _step(self, count, is_write):
+        if self.step_inhibit is None or (self.step_inhibit and not is_write):
+            self.invalidate()
+            return
+
+        if self.step_inhibit:
+            return
+
+        address_counter = self.address_counter
+
+        if address_counter is None:
+            self.invalidate()
+            return
+
+        address_counter = (address_counter + count) & 0xffff
+
+        self.address_counter_hi = address_counter >> 8
+        self.address_counter_lo = address_counter & 0xff
+
+# Commands that do not use or change the address counter.
+_ADDRESS_COUNTER_UNUSED_COMMANDS = (Poll, PollAck, ReadStatus, ReadTerminalId, ReadExtendedId,
+                                    LoadControlRegister, LoadSecondaryControl, LoadMask, ReadFeatureId,
+                                    EABLoadMask, EABReadStatus)
+
+# Commands that do not change the address counter.
+_ADDRESS_COUNTER_UNCHANGED_COMMANDS = _ADDRESS_COUNTER_UNUSED_COMMANDS + (ReadAddressCounterHi,
+                                                                          ReadAddressCounterLo)
+
+def _is_address_counter_unchanged(command):
+    return isinstance(command, _ADDRESS_COUNTER_UNCHANGED_COMMANDS)
+
+def _get_data_length(data):
+    if isinstance(data, tuple):
+        (data, repeat_count) = data
+
+        return len(data) * repeat_count
+
+    return len(data)
+
+def _get_write_length(command):
+    # The number of cells written by a WRITE_DATA or EAB_WRITE_ALTERNATE command.
+    length = _get_data_length(command.data)
+
+    if isinstance(command, EABWriteAlternate):
+        return length // 2
+
+    return length
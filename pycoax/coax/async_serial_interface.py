@@ -0,0 +1,393 @@
+"""
+coax.async_serial_interface
+~~~~~~~~~~~~~~~~~~~~~~~~~~~
+"""
+
+import asyncio
+import os
+import struct
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from serial import SerialException
+
+from .interface import _normalize_commands, _pack_outbound_frames, _unpack_inbound_frames, _get_result
+from .serial_interface import WindowsSafeSerial, InfoQuery, _PROBE_MESSAGE, _get_max_data_length, \
+                              _parse_reset_response, _parse_features, _parse_message_buffer_size, \
+                              _unpack_message, _calculate_timeout_milliseconds, \
+                              _get_transmit_receive_messages, _get_transmit_receive_response, \
+                              _convert_error
+from .poll import _Poller
+from .slip import SlipDecoder, SlipError, encode
+from .exceptions import InterfaceError, InterfaceTimeout
+
+class AsyncSerialInterface:
+    """Serial attached 3270 coax interface, using asyncio."""
+
+    def __init__(self, serial):
+        if serial is None:
+            raise ValueError('Serial port is required')
+
+        self.serial = serial
+
+        self.features = set()
+
+        self.legacy_firmware_detected = None
+        self.legacy_firmware_version = None
+
+        # The maximum time to wait for a response message, in seconds, None
+        # will wait for the command timeout and RESPONSE_TIMEOUT.
+        self.timeout = None
+
+        # The size of the firmware message buffer, if known, this limits the
+        # length of write data frames.
+        self.message_buffer_size = None
+
+        self._slip_decoder = SlipDecoder()
+        self._messages = deque()
+        self._message_waiter = None
+        self._lock = None
+        self._loop = None
+
+        # Error reading from the serial port, raised to all subsequent reads.
+        self._read_error = None
+
+        # Number of responses to messages whose execution timed out or was
+        # cancelled, and the time they are expected by.
+        self._late_response_count = 0
+        self._late_response_deadline = None
+
+        # Data not yet accepted by the serial port, written when it is writable.
+        self._write_buffer = bytearray()
+        self._writer_added = False
+
+    def open(self):
+        """Start reading from the serial port."""
+        if os.name == 'nt':
+            raise NotImplementedError('Serial port readers are not supported on Windows')
+
+        self._loop = asyncio.get_running_loop()
+        self._lock = asyncio.Lock()
+
+        self._loop.add_reader(self.serial.fileno(), self._handle_readable)
+
+    def close(self):
+        """Stop reading from the serial port."""
+        if self._loop is None:
+            return
+
+        self._loop.remove_reader(self.serial.fileno())
+
+        if self._writer_added:
+            self._loop.remove_writer(self.serial.fileno())
+
+            self._writer_added = False
+
+        self._loop = None
+
+    async def reset(self):
+        """Reset the interface."""
+        async with self._lock:
+            self.serial.reset_input_buffer()
+
+            self._clear_messages()
+
+            self._write_message(bytes([0x01]))
+
+            try:
+                message = await self._read_message(timeout=5)
+            finally:
+                self.serial.reset_input_buffer()
+
+                self._clear_messages()
+
+            (self.legacy_firmware_detected, self.legacy_firmware_version) = _parse_reset_response(message)
+
+            # Query features and message buffer size, if this is not a legacy firmware.
+            if not self.legacy_firmware_detected:
+                try:
+                    self.features = _parse_features(await self._query_info(InfoQuery.FEATURES))
+                except InterfaceError:
+                    pass
+
+                try:
+                    self.message_buffer_size = _parse_message_buffer_size(await self._query_info(InfoQuery.MESSAGE_BUFFER_SIZE))
+                except InterfaceError:
+                    pass
+
+    async def wait_for_ready(self, timeout=5):
+        """Wait for the interface firmware to start.
+
+        The interface is probed, with an increasing probe timeout, until it
+        responds or the timeout expires.
+        """
+        async with self._lock:
+            deadline = time.monotonic() + timeout
+
+            probe_timeout = 0.05
+            probe_count = 0
+
+            try:
+                while True:
+                    probe_count += 1
+
+                    if await self._probe(min(probe_timeout, max(deadline - time.monotonic(), 0.01))):
+                        break
+
+                    if time.monotonic() >= deadline:
+                        raise InterfaceTimeout('Interface did not respond')
+
+                    probe_timeout = min(probe_timeout * 2, 1)
+
+                # Consume any late responses to earlier probes.
+                for _ in range(probe_count - 1):
+                    try:
+                        await self._read_message(timeout=probe_timeout)
+                    except (InterfaceError, InterfaceTimeout):
+                        break
+            finally:
+                self.serial.reset_input_buffer()
+
+                self._clear_messages()
+
+    @property
+    def max_data_length(self):
+        """Maximum number of data bytes in a single frame."""
+        return _get_max_data_length(self.message_buffer_size)
+
+    async def execute(self, commands, timeout=None):
+        """Execute one or more commands."""
+        (normalized_commands, has_multiple_commands) = _normalize_commands(commands)
+
+        (outbound_frames, response_lengths, frame_counts) = _pack_outbound_frames(normalized_commands, self.max_data_length)
+
+        async with self._lock:
+            inbound_frames = await self._transmit_receive(outbound_frames, response_lengths, timeout)
+
+        responses = _unpack_inbound_frames(inbound_frames, normalized_commands, frame_counts)
+
+        return _get_result(responses, has_multiple_commands)
+
+    async def events(self, address=None, min_interval=0.01, max_interval=0.1, active_time=1,
+                     timeout=0.1, max_events=16):
+        """Poll a terminal, yielding a PollEvent for each POLL response.
+
+        Responses are acknowledged and buffered, up to max_events - polling is
+        paused while the buffer is full, leaving any further responses with the
+        terminal. The interval and errors are handled as by PollEngine, except
+        that an interface error is raised.
+
+        Polling stops when the generator is closed - if iteration is stopped
+        early, call aclose() so that no further responses are acknowledged -
+        responses still buffered are lost.
+        """
+        poller = _Poller(address, min_interval, max_interval, active_time)
+
+        queue = asyncio.Queue(max_events)
+
+        async def run():
+            try:
+                while True:
+                    responses = await self.execute(poller._get_poll_commands(), timeout)
+
+                    event = poller._handle_poll_responses(responses, time.monotonic())
+
+                    if event is not None:
+                        await queue.put(event)
+
+                    await asyncio.sleep(poller._get_wait_interval(event))
+            except Exception as error:
+                await queue.put(error)
+
+        task = asyncio.create_task(run())
+
+        try:
+            while True:
+                event = await queue.get()
+
+                if isinstance(event, BaseException):
+                    raise event
+
+                yield event
+        finally:
+            task.cancel()
+
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+    async def _probe(self, timeout):
+        self.serial.reset_input_buffer()
+
+        self._clear_messages()
+
+        # Any valid response indicates that the firmware is running, including
+        # an error from legacy firmware that does not support INFO queries.
+        self._write_message(_PROBE_MESSAGE)
+
+        try:
+            await self._read_message(timeout=timeout)
+        except (InterfaceError, InterfaceTimeout):
+            return False
+
+        return True
+
+    async def _query_info(self, query):
+        self._write_message(bytes([0xf0, query.value]))
+
+        message = await self._read_message()
+
+        if message[0] != 0x01:
+            raise _convert_error(message)
+
+        return message[1:]
+
+    async def _transmit_receive(self, outbound_frames, response_lengths, timeout):
+        timeout_milliseconds = _calculate_timeout_milliseconds(timeout, self.timeout)
+
+        messages = _get_transmit_receive_messages(outbound_frames, response_lengths, timeout_milliseconds,
+                                                  self.features)
+
+        # The interface will wait for the command timeout before responding.
+        read_timeout = self.timeout if self.timeout is not None else (timeout or 0) + RESPONSE_TIMEOUT
+
+        await self._discard_late_responses()
+
+        responses = []
+
+        for message in messages:
+            self._write_message(message)
+
+            try:
+                response_message = await self._read_message(read_timeout)
+            except (InterfaceTimeout, asyncio.CancelledError):
+                # The response may arrive late, it is discarded before the next
+                # message is sent so that it is not mistaken for the response.
+                self._add_late_response(read_timeout)
+
+                raise
+
+            responses.append(_get_transmit_receive_response(response_message))
+
+        return responses
+
+    def _add_late_response(self, timeout):
+        if self._messages:
+            self._messages.popleft()
+            return
+
+        self._late_response_count += 1
+        self._late_response_deadline = self._loop.time() + timeout
+
+    async def _discard_late_responses(self):
+        while self._late_response_count:
+            try:
+                await self._read_message(max(self._late_response_deadline - self._loop.time(), 0))
+            except InterfaceTimeout:
+                break
+            except InterfaceError:
+                pass
+
+            self._late_response_count -= 1
+
+        self._late_response_count = 0
+
+    async def _read_message(self, timeout=None):
+        if timeout is None:
+            timeout = self.timeout if self.timeout is not None else RESPONSE_TIMEOUT
+
+        while not self._messages:
+            if self._read_error is not None:
+                raise self._read_error
+
+            self._message_waiter = self._loop.create_future()
+
+            try:
+                await asyncio.wait_for(self._message_waiter, timeout)
+            except asyncio.TimeoutError:
+                raise InterfaceTimeout()
+            finally:
+                self._message_waiter = None
+
+        message = self._messages.popleft()
+
+        if isinstance(message, SlipError):
+            raise InterfaceError('SLIP protocol error')
+
+        return _unpack_message(message)
+
+    def _write_message(self, message):
+        self._write_buffer += encode(struct.pack('>H', len(message)) + message + struct.pack('>H', 0))
+
+        self._handle_writable()
+
+    def _handle_writable(self):
+        # The serial port is non-blocking, so that a slow port does not block
+        # the event loop - any data not written is retried when it is writable.
+        if self._write_buffer:
+            count = self.serial.write(bytes(self._write_buffer))
+
+            del self._write_buffer[:count]
+
+        if self._write_buffer and not self._writer_added:
+            self._loop.add_writer(self.serial.fileno(), self._handle_writable)
+
+            self._writer_added = True
+        elif not self._write_buffer and self._writer_added:
+            self._loop.remove_writer(self.serial.fileno())
+
+            self._writer_added = False
+
+    def _handle_readable(self):
+        try:
+            data = self.serial.read(self.serial.in_waiting or 1)
+        except SerialException as error:
+            # The serial port is no longer readable, the error is raised to the
+            # waiting and subsequent reads.
+            self._read_error = InterfaceError(f'Serial port read error: {error}')
+
+            self._loop.remove_reader(self.serial.fileno())
+        else:
+            if not data:
+                return
+
+            self._messages.extend(self._slip_decoder.decode(data))
+
+        if self._message_waiter is not None and not self._message_waiter.done():
+            self._message_waiter.set_result(None)
+
+    def _clear_messages(self):
+        self._slip_decoder.reset()
+        self._messages.clear()
+
+        self._late_response_count = 0
+
+# The time to wait for a response message, in seconds, in addition to any
+# command timeout if the interface timeout is None.
+RESPONSE_TIMEOUT = 5
+
+@asynccontextmanager
+async def open_async_serial_interface(serial_port, reset=True, startup_timeout=5):
+    """Opens serial port and initializes serial attached 3270 coax interface, using asyncio."""
+    with WindowsSafeSerial(serial_port, 115200, timeout=0, write_timeout=0) as serial:
+        serial.reset_input_buffer()
+        serial.reset_output_buffer()
+
+        interface = AsyncSerialInterface(serial)
+
+        interface.open()
+
+        try:
+            # Wait for the interface firmware to start, this is only required for
+            # the original Arduino Mega based interface which restarts when the
+            # serial port is opened - others will respond to the first probe.
+            if 'COAX_FAST_START' not in os.environ:
+                await interface.wait_for_ready(startup_timeout)
+
+            if reset:
+                await interface.reset()
+
+            yield interface
+        finally:
+            interface.close()
@@ -17,3 +17,13 @@ class ReceiveTimeout(Exception):
 
 class ProtocolError(Exception):
     """A protocol error occurred."""
+
+class StatusTimeout(TimeoutError):
+    """The terminal status was not reached in time."""
+
+    def __init__(self, message, status, count):
+        super().__init__(message)
+
+        # The last status read, and the number of READ_STATUS commands executed.
+        self.status = status
+        self.count = count
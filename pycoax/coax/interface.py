@@ -3,9 +3,13 @@ coax.interface
 ~~~~~~~~~~~~~~
 """
 
+import threading
+from copy import copy
 from enum import Enum
+from collections import deque
+from concurrent.futures import Future
 
-from .protocol import FrameFormat, pack_data_word
+from .protocol import FrameFormat, pack_data_words
 from .exceptions import ProtocolError
 
 class Interface:
@@ -14,38 +18,301 @@ class Interface:
     def __init__(self):
         self.features = set()
 
+        # Optimizer applied to each batch of commands, such as a
+        # CommandOptimizer, None to disable.
+        self.optimizer = None
+
+        self._io_thread = None
+
     def reset(self):
         """Reset the interface."""
         raise NotImplementedError
 
     def execute(self, commands, timeout=None):
         """Execute one or more commands."""
+        # Commands must be executed on the I/O thread, if it is running, to
+        # ensure they are not interleaved with commands from other threads.
+        if self._io_thread is not None and not self._io_thread.is_current():
+            return self.execute_async(commands, timeout).result()
+
         (normalized_commands, has_multiple_commands) = _normalize_commands(commands)
 
         responses = self._execute(normalized_commands, timeout)
 
-        if has_multiple_commands:
-            return responses
+        return _get_result(responses, has_multiple_commands)
+
+    def prepare(self, commands, timeout=None):
+        """Prepare one or more commands for repeated execution.
+
+        The commands are packed once, and can then be executed many times with
+        execute_prepared().
+        """
+        (normalized_commands, has_multiple_commands) = _normalize_commands(commands)
+
+        return PreparedCommands(self, normalized_commands, has_multiple_commands, timeout)
+
+    def execute_prepared(self, prepared_commands):
+        """Execute prepared commands."""
+        if prepared_commands.interface is not self:
+            raise ValueError('Commands were prepared for a different interface')
+
+        # The packed frames are submitted, so that they are not packed again
+        # on the I/O thread.
+        if self._io_thread is not None and not self._io_thread.is_current():
+            return self._io_thread.submit_prepared(prepared_commands).result()
+
+        return self._execute_prepared(prepared_commands)
+
+    def execute_async(self, commands, timeout=None):
+        """Execute one or more commands on the I/O thread, returning a future.
+
+        The I/O thread is started if it is not already running. Commands
+        submitted concurrently with the same timeout are combined into a single
+        batch.
+        """
+        (normalized_commands, has_multiple_commands) = _normalize_commands(commands)
+
+        if self._io_thread is None:
+            self.start_io_thread()
+
+        return self._io_thread.submit(normalized_commands, has_multiple_commands, timeout)
 
-        response = responses[0]
+    def start_io_thread(self):
+        """Start the I/O thread."""
+        if self._io_thread is not None:
+            return
 
-        if isinstance(response, BaseException):
-            raise response
+        self._io_thread = _IOThread(self)
 
-        return response
+        self._io_thread.start()
+
+    def stop_io_thread(self):
+        """Stop the I/O thread, after executing any pending commands."""
+        if self._io_thread is None:
+            return
+
+        self._io_thread.stop()
+
+        self._io_thread = None
+
+    @property
+    def max_data_length(self):
+        """Maximum number of data bytes in a single frame, None if unlimited."""
+        return None
 
     def _execute(self, commands, timeout):
-        (outbound_frames, response_lengths) = _pack_outbound_frames(commands)
+        if self.optimizer is None:
+            return self._execute_commands(commands, timeout)
+
+        (optimized_commands, indexes) = self.optimizer.optimize(commands)
+
+        responses = self._execute_commands(optimized_commands, timeout) if optimized_commands else []
+
+        # Dropped commands, such as redundant register loads, have no response.
+        return [responses[index] if index is not None else None for index in indexes]
+
+    def _execute_commands(self, commands, timeout):
+        (outbound_frames, response_lengths, frame_counts) = _pack_outbound_frames(commands, self.max_data_length)
 
         inbound_frames = self._transmit_receive(outbound_frames, response_lengths, timeout)
 
-        responses = _unpack_inbound_frames(inbound_frames, commands)
+        responses = _unpack_inbound_frames(inbound_frames, commands, frame_counts)
 
         return responses
 
+    def _execute_prepared(self, prepared_commands):
+        (packed_frames, response_lengths, frame_counts) = prepared_commands.get_packed_frames()
+
+        inbound_frames = self._transmit_receive_prepared(packed_frames, response_lengths, prepared_commands.timeout)
+
+        responses = _unpack_inbound_frames(inbound_frames, prepared_commands.commands, frame_counts)
+
+        return _get_result(responses, prepared_commands.has_multiple_commands)
+
     def _transmit_receive(self, outbound_frames, response_lengths, timeout):
         raise NotImplementedError
 
+    def _pack_prepared_command(self, address, command, timeout):
+        (outbound_frames, response_lengths, _) = _pack_outbound_frames([(address, command)], self.max_data_length)
+
+        return (outbound_frames, response_lengths)
+
+    def _transmit_receive_prepared(self, packed_frames, response_lengths, timeout):
+        return self._transmit_receive(packed_frames, response_lengths, timeout)
+
+class PreparedCommands:
+    """Commands prepared for repeated execution on an interface."""
+
+    def __init__(self, interface, commands, has_multiple_commands, timeout):
+        self.interface = interface
+        self.commands = list(commands)
+        self.has_multiple_commands = has_multiple_commands
+        self.timeout = timeout
+
+        self._packed_commands = [interface._pack_prepared_command(address, command, timeout)
+                                 for (address, command) in self.commands]
+
+        self._packed_frames = None
+
+    def rebind(self, index, data):
+        """Replace the data of a prepared command, such as WRITE_DATA."""
+        (address, command) = self.commands[index]
+
+        if not hasattr(command, 'data'):
+            raise TypeError(f'Command does not have data: {type(command).__name__}')
+
+        # The original command is not modified, as it may be shared.
+        command = copy(command)
+
+        command.data = data
+
+        packed_command = self.interface._pack_prepared_command(address, command, self.timeout)
+
+        self.commands[index] = (address, command)
+        self._packed_commands[index] = packed_command
+
+        self._packed_frames = None
+
+    def get_packed_frames(self):
+        """Get the packed frames, response lengths and frame counts."""
+        if self._packed_frames is None:
+            packed_frames = []
+            response_lengths = []
+            frame_counts = []
+
+            for (command_packed_frames, command_response_lengths) in self._packed_commands:
+                packed_frames += command_packed_frames
+                response_lengths += command_response_lengths
+
+                frame_counts.append(len(command_packed_frames))
+
+            self._packed_frames = (packed_frames, response_lengths, frame_counts)
+
+        return self._packed_frames
+
+class _IOThread:
+    """Interface I/O thread."""
+
+    def __init__(self, interface):
+        self.interface = interface
+
+        self.thread = threading.Thread(target=self._run, name='coax-io', daemon=True)
+
+        self._condition = threading.Condition()
+        self._submissions = deque()
+        self._running = False
+
+    def start(self):
+        self._running = True
+
+        self.thread.start()
+
+    def stop(self):
+        with self._condition:
+            self._running = False
+
+            self._condition.notify()
+
+        if not self.is_current():
+            self.thread.join()
+
+    def is_current(self):
+        return threading.current_thread() is self.thread
+
+    def submit(self, commands, has_multiple_commands, timeout):
+        return self._submit(commands, has_multiple_commands, timeout)
+
+    def submit_prepared(self, prepared_commands):
+        return self._submit(prepared_commands, prepared_commands.has_multiple_commands, prepared_commands.timeout)
+
+    def _submit(self, commands, has_multiple_commands, timeout):
+        future = Future()
+
+        with self._condition:
+            if not self._running:
+                raise RuntimeError('I/O thread is not running')
+
+            self._submissions.append((future, commands, has_multiple_commands, timeout))
+
+            self._condition.notify()
+
+        return future
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while self._running and not self._submissions:
+                    self._condition.wait()
+
+                if not self._submissions:
+                    return
+
+                batch = self._get_batch()
+
+            if batch:
+                self._execute_batch(batch)
+
+    def _get_batch(self):
+        # Combine all pending submissions that share the timeout of the first,
+        # as a single TRANSMIT_RECEIVE batch has a single timeout.
+        timeout = self._submissions[0][3]
+
+        batch = []
+
+        while self._submissions and self._submissions[0][3] == timeout:
+            # Prepared commands are executed alone, as they are already packed.
+            is_prepared = isinstance(self._submissions[0][1], PreparedCommands)
+
+            if is_prepared and batch:
+                break
+
+            submission = self._submissions.popleft()
+
+            (future, _, _, _) = submission
+
+            if future.set_running_or_notify_cancel():
+                batch.append(submission)
+
+            if is_prepared and batch:
+                break
+
+        return batch
+
+    def _execute_batch(self, batch):
+        (future, prepared_commands, _, _) = batch[0]
+
+        if isinstance(prepared_commands, PreparedCommands):
+            try:
+                future.set_result(self.interface._execute_prepared(prepared_commands))
+            except BaseException as error:
+                future.set_exception(error)
+
+            return
+
+        commands = [command for (_, submission_commands, _, _) in batch for command in submission_commands]
+
+        timeout = batch[0][3]
+
+        try:
+            responses = self.interface._execute(commands, timeout)
+        except BaseException as error:
+            for (future, _, _, _) in batch:
+                future.set_exception(error)
+
+            return
+
+        index = 0
+
+        for (future, submission_commands, has_multiple_commands, _) in batch:
+            submission_responses = responses[index:index + len(submission_commands)]
+
+            index += len(submission_commands)
+
+            try:
+                future.set_result(_get_result(submission_responses, has_multiple_commands))
+            except BaseException as error:
+                future.set_exception(error)
+
 class InterfaceFeature(Enum):
     """Interface feature."""
 
@@ -53,48 +320,65 @@ class InterfaceFeature(Enum):
 
 def normalize_frame(address, frame):
     """Convert a coax frame into words, repeat count and offset."""
-    words = []
+    if address is not None and (address < 0 or address > 63):
+        raise ValueError('Address must be between 0 and 63')
+
+    # The address, if present, is the first word - building the list with it
+    # avoids shifting all of the words later.
+    words = [address] if address is not None else []
 
     repeat_count = 0
     repeat_offset = 0
 
     if frame[0] == FrameFormat.WORDS:
-        if isinstance(frame[1], tuple):
-            repeat_count = frame[1][1]
+        data = frame[1]
 
-            words += frame[1][0]
-        else:
-            words += frame[1]
+        if isinstance(data, tuple):
+            (data, repeat_count) = data
+
+        words += data
     elif frame[0] == FrameFormat.WORD_DATA:
         words.append(frame[1])
 
         if len(frame) > 2:
-            if isinstance(frame[2], tuple):
+            data = frame[2]
+
+            if isinstance(data, tuple):
                 repeat_offset = 1
-                repeat_count = frame[2][1]
 
-                words += [pack_data_word(byte) for byte in frame[2][0]]
-            else:
-                words += [pack_data_word(byte) for byte in frame[2]]
-    elif frame[0] == FrameFormat.DATA:
-        if isinstance(frame[1], tuple):
-            repeat_count = frame[1][1]
+                (data, repeat_count) = data
 
-            words += [pack_data_word(byte) for byte in frame[1][0]]
-        else:
-            words += [pack_data_word(byte) for byte in frame[1]]
+            words += pack_data_words(data)
+    elif frame[0] == FrameFormat.DATA:
+        data = frame[1]
 
-    if address is not None:
-        if address < 0 or address > 63:
-            raise ValueError('Address must be between 0 and 63')
+        if isinstance(data, tuple):
+            (data, repeat_count) = data
 
-        words.insert(0, address)
+        words += pack_data_words(data)
 
-        if repeat_count > 0:
-            repeat_offset += 1
+    if address is not None and repeat_count > 0:
+        repeat_offset += 1
 
     return (words, repeat_count, repeat_offset)
 
+def _get_frame_length(address, frame):
+    # The number of words in a frame, excluding repeats, as normalize_frame
+    # would produce without packing the data.
+    length = 1 if address is not None else 0
+
+    if frame[0] == FrameFormat.WORD_DATA:
+        length += 1
+
+        data = frame[2] if len(frame) > 2 else []
+    else:
+        data = frame[1]
+
+    if isinstance(data, tuple):
+        (data, _) = data
+
+    return length + len(data)
+
 def _is_command(command):
     return hasattr(command, 'pack_outbound_frame') and hasattr(command, 'unpack_inbound_frame')
 
@@ -134,31 +418,68 @@ def _normalize_commands(commands):
 
     return ([_normalize_command(command) for command in commands], True)
 
-def _pack_outbound_frames(commands):
+def _get_result(responses, has_multiple_commands):
+    if has_multiple_commands:
+        return responses
+
+    response = responses[0]
+
+    if isinstance(response, BaseException):
+        raise response
+
+    return response
+
+def _pack_outbound_frames(commands, max_data_length=None):
     frames = []
     response_lengths = []
+    frame_counts = []
 
     for (address, command) in commands:
-        frame = command.pack_outbound_frame()
+        # Commands that can be split into multiple frames, such as WRITE_DATA,
+        # are packed into frames that fit the interface limit. Runs of data
+        # are packed as repeated frames, this is not supported for addressed
+        # frames as the repeat offset would overflow.
+        if max_data_length is not None and hasattr(command, 'pack_outbound_frames'):
+            command_frames = command.pack_outbound_frames(max_data_length, repeat=address is None)
+        else:
+            command_frames = [command.pack_outbound_frame()]
+
         response_length = command.response_length or 1
 
-        frames.append((address, frame))
-        response_lengths.append(response_length)
+        for frame in command_frames:
+            frames.append((address, frame))
+            response_lengths.append(response_length)
 
-    return (frames, response_lengths)
+        frame_counts.append(len(command_frames))
+
+    return (frames, response_lengths, frame_counts)
+
+def _unpack_inbound_frames(frames, commands, frame_counts=None):
+    if frame_counts is None:
+        frame_counts = [1] * len(commands)
 
-def _unpack_inbound_frames(frames, commands):
     responses = []
 
-    for (frame, (_, command)) in zip(frames, commands):
-        if isinstance(frame, BaseException):
-            responses.append(frame)
-        else:
+    index = 0
+
+    for ((_, command), frame_count) in zip(commands, frame_counts):
+        response = None
+
+        # The response to a command packed into multiple frames is that of the
+        # last frame, or the first error.
+        for frame in frames[index:index + frame_count]:
+            if isinstance(frame, BaseException):
+                response = frame
+                break
+
             try:
                 response = command.unpack_inbound_frame(frame)
             except ProtocolError as error:
                 response = error
+                break
+
+        responses.append(response)
 
-            responses.append(response)
+        index += frame_count
 
     return responses
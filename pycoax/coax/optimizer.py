@@ -0,0 +1,237 @@
+"""
+coax.optimizer
+~~~~~~~~~~~~~~
+"""
+
+from .interface import _get_frame_length
+from .protocol import Poll, Reset, LoadControlRegister, LoadSecondaryControl, LoadMask, \
+                      LoadAddressCounterHi, LoadAddressCounterLo, WriteData, DiagnosticReset, \
+                      EABLoadMask, EABWriteAlternate
+from .address_counter import _ADDRESS_COUNTER_UNUSED_COMMANDS, _get_write_length
+
+class CommandOptimizer:
+    """Optimizer for batches of commands, set as Interface.optimizer to enable.
+
+    Register loads that would not change the register are dropped, as are
+    address counter loads that are replaced before the address counter is
+    used, and contiguous WRITE_DATA or EAB_WRITE_ALTERNATE commands are merged.
+    Commands are not reordered.
+
+    Each batch is optimized assuming every command in it succeeds, and that
+    the control register step inhibit is as given until the control register
+    is loaded - if step_inhibit is None writes are not merged. The step inhibit
+    loaded is kept for each address across batches, it becomes unknown after
+    a terminal reset or POLL if it differs from the initial step inhibit.
+    """
+
+    def __init__(self, step_inhibit=False):
+        self.step_inhibit = step_inhibit
+
+        # Step inhibit for each address, as of the end of the last batch.
+        self._step_inhibits = {}
+
+        self.batch_count = 0
+
+        # Number of commands and TRANSMIT_RECEIVE message bytes before
+        # optimization, and saved by optimization.
+        self.command_count = 0
+        self.commands_saved = 0
+        self.byte_count = 0
+        self.bytes_saved = 0
+
+    def optimize(self, commands):
+        """Optimize normalized commands.
+
+        Returns the optimized commands, and for each original command the index
+        of the optimized command that replaces it or None if it was dropped.
+        """
+        optimized_commands = []
+        indexes = []
+
+        states = {}
+
+        for (address, command) in commands:
+            state = states.get(address)
+
+            if state is None:
+                state = states[address] = _TerminalState(self._step_inhibits.get(address, self.step_inhibit))
+
+            if isinstance(command, _TERMINAL_RESET_COMMANDS):
+                state = states[address] = _TerminalState(self._get_reset_step_inhibit(state.step_inhibit))
+
+            index = len(optimized_commands)
+
+            if isinstance(command, (LoadAddressCounterHi, LoadAddressCounterLo)):
+                is_hi = isinstance(command, LoadAddressCounterHi)
+
+                if command.address == (state.address_counter_hi if is_hi else state.address_counter_lo):
+                    indexes.append(None)
+                    continue
+
+                # Drop the previous load of the register if the address counter
+                # has not been used since.
+                dead_index = state.pending_load_indexes.get(is_hi)
+
+                if dead_index is not None:
+                    optimized_commands[dead_index] = None
+
+                state.pending_load_indexes[is_hi] = index
+
+                if is_hi:
+                    state.address_counter_hi = command.address
+                else:
+                    state.address_counter_lo = command.address
+            elif isinstance(command, _REGISTER_LOAD_COMMANDS):
+                key = (type(command), getattr(command, 'feature_address', None))
+
+                frame = command.pack_outbound_frame()
+
+                if state.registers.get(key) == frame:
+                    indexes.append(None)
+                    continue
+
+                state.registers[key] = frame
+
+                if isinstance(command, LoadControlRegister):
+                    state.step_inhibit = bool(command.control.step_inhibit)
+            elif isinstance(command, (WriteData, EABWriteAlternate)):
+                state.pending_load_indexes.clear()
+
+                previous_index = _get_previous_index(optimized_commands)
+
+                if previous_index is not None and state.step_inhibit is False \
+                        and _is_mergeable(optimized_commands[previous_index], address, command):
+                    (_, previous_command) = optimized_commands[previous_index]
+
+                    optimized_commands[previous_index] = (address, _merge_writes(previous_command, command))
+
+                    state.step(command)
+
+                    indexes.append(previous_index)
+                    continue
+
+                state.step(command)
+            elif not isinstance(command, _ADDRESS_COUNTER_UNUSED_COMMANDS):
+                state.pending_load_indexes.clear()
+
+                state.address_counter_hi = None
+                state.address_counter_lo = None
+
+            optimized_commands.append((address, command))
+            indexes.append(index)
+
+        for (address, state) in states.items():
+            self._step_inhibits[address] = state.step_inhibit
+
+        (optimized_commands, indexes) = _compact(optimized_commands, indexes)
+
+        self._update_counts(commands, optimized_commands)
+
+        return (optimized_commands, indexes)
+
+    def _get_reset_step_inhibit(self, step_inhibit):
+        # The control register may or may not have been reset.
+        if step_inhibit != self.step_inhibit:
+            return None
+
+        return step_inhibit
+
+    def _update_counts(self, commands, optimized_commands):
+        byte_count = sum(_get_message_length(address, command) for (address, command) in commands)
+        optimized_byte_count = sum(_get_message_length(address, command) for (address, command) in optimized_commands)
+
+        self.batch_count += 1
+        self.command_count += len(commands)
+        self.commands_saved += len(commands) - len(optimized_commands)
+        self.byte_count += byte_count
+        self.bytes_saved += byte_count - optimized_byte_count
+
+class _TerminalState:
+    """Terminal state, as known while optimizing a batch."""
+
+    def __init__(self, step_inhibit):
+        self.address_counter_hi = None
+        self.address_counter_lo = None
+        self.step_inhibit = step_inhibit
+        self.registers = {}
+
+        # Index of the last address counter hi and lo load, if the address
+        # counter has not been used since.
+        self.pending_load_indexes = {}
+
+    def step(self, command):
+        if self.step_inhibit is None:
+            self.address_counter_hi = None
+            self.address_counter_lo = None
+            return
+
+        if self.step_inhibit:
+            return
+
+        if self.address_counter_hi is None or self.address_counter_lo is None:
+            self.address_counter_hi = None
+            self.address_counter_lo = None
+            return
+
+        address_counter = (self.address_counter_hi << 8) | self.address_counter_lo
+
+        address_counter = (address_counter + _get_write_length(command)) & 0xffff
+
+        self.address_counter_hi = address_counter >> 8
+        self.address_counter_lo = address_counter & 0xff
+
+# Commands that reset the terminal state, a POLL is included as the response
+# may indicate that the terminal has reset.
+_TERMINAL_RESET_COMMANDS = (Poll, Reset, DiagnosticReset)
+
+# Register load commands, other than address counter loads.
+_REGISTER_LOAD_COMMANDS = (LoadControlRegister, LoadSecondaryControl, LoadMask, EABLoadMask)
+
+def _get_previous_index(optimized_commands):
+    for index in range(len(optimized_commands) - 1, -1, -1):
+        if optimized_commands[index] is not None:
+            return index
+
+    return None
+
+def _is_mergeable(previous, address, command):
+    (previous_address, previous_command) = previous
+
+    if previous_address != address or type(previous_command) is not type(command):
+        return False
+
+    # Repeated data is not merged, as that would expand it.
+    if isinstance(previous_command.data, tuple) or isinstance(command.data, tuple):
+        return False
+
+    if isinstance(command, EABWriteAlternate):
+        return previous_command.feature_address == command.feature_address
+
+    return True
+
+def _merge_writes(previous_command, command):
+    data = bytes(previous_command.data) + bytes(command.data)
+
+    # The original commands are not modified, as they may be shared.
+    if isinstance(command, EABWriteAlternate):
+        return EABWriteAlternate(command.feature_address, data)
+
+    return WriteData(data)
+
+def _compact(optimized_commands, indexes):
+    new_indexes = []
+
+    index = 0
+
+    for command in optimized_commands:
+        new_indexes.append(index if command is not None else None)
+
+        if command is not None:
+            index += 1
+
+    return ([command for command in optimized_commands if command is not None],
+            [new_indexes[index] if index is not None else None for index in indexes])
+
+def _get_message_length(address, command):
+    # Message type, repeat, words, response length and timeout.
+    return 7 + (_get_frame_length(address, command.pack_outbound_frame()) * 2)
@@ -2,7 +2,7 @@
 coax.parity
 ~~~~~~~~~~~
 
-Single byte parity computation
+Single byte and bulk parity computation
 """
 
 # From http://p-nand-q.com/python/algorithms/math/bit-parity.html
@@ -14,6 +14,10 @@ def _parallel_swar(i):
 
 _PARITY_LOOKUP = [_parallel_swar(i) for i in range(256)]
 
+# Parity of each byte, for use with bytes.translate().
+EVEN_PARITY_TABLE = bytes(_PARITY_LOOKUP)
+ODD_PARITY_TABLE = bytes([1 - parity for parity in _PARITY_LOOKUP])
+
 def even_parity(byte):
     """Compute even parity"""
     if byte < 0 or byte > 255:
@@ -23,4 +27,27 @@ def even_parity(byte):
 
 def odd_parity(byte):
     """Compute odd parity"""
-    return int(not even_parity(byte))
+    if byte < 0 or byte > 255:
+        raise ValueError('Input must be between 0 and 255')
+
+    return ODD_PARITY_TABLE[byte]
+
+def even_parity_bytes(bytes_):
+    """Compute even parity of each byte, returning bytes of 0 or 1."""
+    return bytes(bytes_).translate(EVEN_PARITY_TABLE)
+
+def odd_parity_bytes(bytes_):
+    """Compute odd parity of each byte, returning bytes of 0 or 1."""
+    return bytes(bytes_).translate(ODD_PARITY_TABLE)
+
+def verify_odd_parity(bytes_, parity):
+    """Verify odd parity of each byte, returning the first mismatch index or -1."""
+    if len(bytes_) != len(parity):
+        raise ValueError('Parity length must equal bytes length')
+
+    expected_parity = odd_parity_bytes(bytes_)
+
+    if expected_parity == parity:
+        return -1
+
+    return next(index for index in range(len(parity)) if parity[index] != expected_parity[index])
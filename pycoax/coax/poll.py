@@ -0,0 +1,352 @@
+"""
+coax.poll
+~~~~~~~~~
+"""
+
+import threading
+import time
+from queue import Queue
+
+from .protocol import Poll, PollAck
+from .multiplexer import get_device_address
+from .exceptions import InterfaceError, InterfaceTimeout
+
+class PollEvent:
+    """Terminal POLL response, or error, received by a poll engine."""
+
+    __slots__ = ('address', 'response', 'timestamp')
+
+    def __init__(self, address, response, timestamp):
+        self.address = address
+        self.response = response
+        self.timestamp = timestamp
+
+    def __repr__(self):
+        return f'<PollEvent address={self.address}, response={self.response}, timestamp={self.timestamp}>'
+
+class _Poller:
+    """POLL and POLL_ACK sequencing and interval, shared by poll loops."""
+
+    def __init__(self, address, min_interval, max_interval, active_time):
+        if min_interval <= 0 or max_interval < min_interval:
+            raise ValueError('Invalid interval')
+
+        self.address = address
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.active_time = active_time
+
+        self.interval = max_interval
+
+        self._last_response_time = None
+        self._acknowledge = False
+        self._error_response = False
+
+    def _get_poll_commands(self):
+        commands = [(self.address, Poll())]
+
+        # The acknowledgement of the previous response is sent with this poll,
+        # saving a round trip for each keystroke.
+        if self._acknowledge:
+            commands.insert(0, (self.address, PollAck()))
+
+        return commands
+
+    def _handle_poll_responses(self, responses, timestamp):
+        response = responses[-1]
+
+        if self._acknowledge:
+            # If the acknowledgement failed the response is the one already
+            # delivered, the acknowledgement is sent again with the next poll.
+            if isinstance(responses[0], BaseException):
+                return None
+
+            self._acknowledge = False
+
+        if isinstance(response, BaseException):
+            is_repeated_error = self._error_response
+
+            self._error_response = True
+
+            self._update_interval(timestamp)
+
+            if is_repeated_error:
+                return None
+        else:
+            self._error_response = False
+
+            if response is None:
+                self._update_interval(timestamp)
+                return None
+
+            self._acknowledge = True
+
+            self._last_response_time = timestamp
+
+            self.interval = self.min_interval
+
+        return PollEvent(self.address, response, timestamp)
+
+    def _get_wait_interval(self, event):
+        # After a response poll again immediately, with the acknowledgement,
+        # as another response may be waiting.
+        if event is not None and self._acknowledge:
+            return 0
+
+        return self.interval
+
+    def _update_interval(self, timestamp):
+        if self._last_response_time is not None and timestamp - self._last_response_time < self.active_time:
+            self.interval = self.min_interval
+        else:
+            self.interval = min(self.interval * 2, self.max_interval)
+
+class PollEngine(_Poller):
+    """Poll a terminal on a thread, acknowledging responses.
+
+    Each POLL response, such as a keystroke, is acknowledged and delivered as
+    a PollEvent to the callback and queue. The interval between polls is
+    min_interval until active_time has elapsed since the last response, then
+    doubles up to max_interval. The first of consecutive error responses, such
+    as a ReceiveTimeout, is delivered. An interface error stops the engine and
+    is delivered.
+    """
+
+    def __init__(self, interface, address=None, callback=None, queue=None, min_interval=0.01,
+                 max_interval=0.1, active_time=1, timeout=0.1):
+        if callback is None and queue is None:
+            raise ValueError('Callback or queue is required')
+
+        super().__init__(address, min_interval, max_interval, active_time)
+
+        self.interface = interface
+        self.callback = callback
+        self.queue = queue
+        self.timeout = timeout
+
+        # The error that stopped the engine, if any.
+        self.error = None
+
+        self._thread = None
+        self._stop_event = threading.Event()
+
+    def __enter__(self):
+        self.start()
+
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def start(self):
+        """Start polling on a thread."""
+        if self._thread is not None:
+            return
+
+        # The interface may also be used by the application, commands are
+        # serialized on the interface I/O thread.
+        self.interface.start_io_thread()
+
+        self._stop_event.clear()
+
+        self._thread = threading.Thread(target=self._run, name='coax-poll', daemon=True)
+
+        self._thread.start()
+
+    def stop(self):
+        """Stop polling."""
+        if self._thread is None:
+            return
+
+        self._stop_event.set()
+
+        if threading.current_thread() is not self._thread:
+            self._thread.join()
+
+        self._thread = None
+
+    def poll(self):
+        """Poll the terminal once, returning the event delivered or None."""
+        responses = self.interface.execute(self._get_poll_commands(), timeout=self.timeout)
+
+        event = self._handle_poll_responses(responses, time.monotonic())
+
+        if event is not None:
+            self._deliver(event)
+
+        return event
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            try:
+                event = self.poll()
+            except (InterfaceError, InterfaceTimeout) as error:
+                self.error = error
+
+                self._deliver(PollEvent(self.address, error, time.monotonic()))
+
+                return
+
+            interval = self._get_wait_interval(event)
+
+            if interval:
+                self._stop_event.wait(interval)
+
+    def _deliver(self, event):
+        if self.queue is not None:
+            self.queue.put(event)
+
+        if self.callback is not None:
+            self.callback(event)
+
+class PollScheduler:
+    """Poll terminals attached to a 3299 multiplexer on a thread, in batches.
+
+    All ports that are due are polled in a single batch, with recently active
+    ports first. Each port is polled as by PollEngine, except that a port that
+    has error responses, such as a ReceiveTimeout if no terminal is attached,
+    is polled at an interval that doubles from max_interval up to
+    max_absent_interval. Events for each port are delivered to queues[port].
+    """
+
+    def __init__(self, interface, ports=range(8), min_interval=0.01, max_interval=0.1,
+                 active_time=1, max_absent_interval=5, timeout=0.1):
+        if max_absent_interval < max_interval:
+            raise ValueError('Invalid absent interval')
+
+        self.interface = interface
+        self.ports = list(ports)
+        self.max_interval = max_interval
+        self.max_absent_interval = max_absent_interval
+        self.timeout = timeout
+
+        self.queues = {port: Queue() for port in self.ports}
+
+        # The error that stopped the scheduler, if any.
+        self.error = None
+
+        self._pollers = {port: _Poller(get_device_address(port), min_interval, max_interval, active_time)
+                         for port in self.ports}
+
+        self._absent_intervals = {port: None for port in self.ports}
+        self._next_poll_times = {port: 0 for port in self.ports}
+
+        self._thread = None
+        self._stop_event = threading.Event()
+
+    def __enter__(self):
+        self.start()
+
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def start(self):
+        """Start polling on a thread."""
+        if self._thread is not None:
+            return
+
+        # The interface may also be used by the application, commands are
+        # serialized on the interface I/O thread.
+        self.interface.start_io_thread()
+
+        self._stop_event.clear()
+
+        self._thread = threading.Thread(target=self._run, name='coax-poll-scheduler', daemon=True)
+
+        self._thread.start()
+
+    def stop(self):
+        """Stop polling."""
+        if self._thread is None:
+            return
+
+        self._stop_event.set()
+
+        if threading.current_thread() is not self._thread:
+            self._thread.join()
+
+        self._thread = None
+
+    def is_absent(self, port):
+        """Is the port considered absent, after error responses?"""
+        return self._absent_intervals[port] is not None
+
+    def poll(self):
+        """Poll the ports that are due once, returning the port and event for
+        each event delivered."""
+        now = time.monotonic()
+
+        ports = [port for port in self.ports if self._next_poll_times[port] <= now]
+
+        if not ports:
+            return []
+
+        # Recently active ports are polled first.
+        ports.sort(key=lambda port: self._pollers[port]._last_response_time or 0, reverse=True)
+
+        port_commands = [(port, self._pollers[port]._get_poll_commands()) for port in ports]
+
+        responses = self.interface.execute([command for (_, commands) in port_commands for command in commands],
+                                           timeout=self.timeout)
+
+        timestamp = time.monotonic()
+
+        events = []
+
+        index = 0
+
+        for (port, commands) in port_commands:
+            port_responses = responses[index:index + len(commands)]
+
+            index += len(commands)
+
+            event = self._handle_poll_responses(port, port_responses, timestamp)
+
+            if event is not None:
+                self.queues[port].put(event)
+
+                events.append((port, event))
+
+        return events
+
+    def _handle_poll_responses(self, port, responses, timestamp):
+        poller = self._pollers[port]
+
+        event = poller._handle_poll_responses(responses, timestamp)
+
+        if isinstance(responses[-1], BaseException):
+            absent_interval = self._absent_intervals[port]
+
+            if absent_interval is None:
+                absent_interval = self.max_interval
+            else:
+                absent_interval = min(absent_interval * 2, self.max_absent_interval)
+
+            self._absent_intervals[port] = absent_interval
+
+            self._next_poll_times[port] = timestamp + absent_interval
+        else:
+            self._absent_intervals[port] = None
+
+            self._next_poll_times[port] = timestamp + poller._get_wait_interval(event)
+
+        return event
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            try:
+                self.poll()
+            except (InterfaceError, InterfaceTimeout) as error:
+                self.error = error
+
+                for port in self.ports:
+                    self.queues[port].put(PollEvent(self._pollers[port].address, error, time.monotonic()))
+
+                return
+
+            interval = min(self._next_poll_times.values()) - time.monotonic()
+
+            if interval > 0:
+                self._stop_event.wait(interval)
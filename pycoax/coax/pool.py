@@ -0,0 +1,140 @@
+"""
+coax.pool
+~~~~~~~~~
+"""
+
+from contextlib import ExitStack
+
+from .interface import InterfaceFeature, _normalize_commands
+from .serial_interface import open_serial_interface
+from .protocol import ReadTerminalId
+from .multiplexer import get_device_address
+
+class InterfacePool:
+    """Pool of serial attached 3270 coax interfaces.
+
+    Terminals are identified by a tuple of serial port and 3299 port, the 3299
+    port is None for a terminal attached directly to an interface.
+    """
+
+    def __init__(self, serial_ports, probe_timeout=0.1):
+        self.serial_ports = list(serial_ports)
+        self.probe_timeout = probe_timeout
+
+        self.interfaces = {}
+        self.terminals = {}
+
+        self._exit_stack = None
+
+    def __enter__(self):
+        self.open()
+
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def open(self):
+        """Open and reset all interfaces, and probe for terminals."""
+        self._exit_stack = ExitStack()
+
+        try:
+            for serial_port in self.serial_ports:
+                interface = self._exit_stack.enter_context(open_serial_interface(serial_port))
+
+                # Each interface has an I/O thread so that commands for terminals
+                # on different interfaces are executed concurrently.
+                interface.start_io_thread()
+
+                self.interfaces[serial_port] = interface
+
+            self.probe()
+        except BaseException:
+            self.close()
+
+            raise
+
+    def close(self):
+        """Close all interfaces."""
+        if self._exit_stack is None:
+            return
+
+        self._exit_stack.close()
+
+        self._exit_stack = None
+
+        self.interfaces = {}
+        self.terminals = {}
+
+    def probe(self):
+        """Probe all interfaces for attached terminals."""
+        futures = {}
+
+        for (serial_port, interface) in self.interfaces.items():
+            ports = [None]
+
+            if InterfaceFeature.PROTOCOL_3299 in interface.features:
+                ports += range(8)
+
+            commands = [(_get_address(port), ReadTerminalId()) for port in ports]
+
+            futures[serial_port] = (ports, interface.execute_async(commands, timeout=self.probe_timeout))
+
+        terminals = {}
+
+        for (serial_port, (ports, future)) in futures.items():
+            for (port, response) in zip(ports, future.result()):
+                if not isinstance(response, BaseException):
+                    terminals[(serial_port, port)] = response
+
+        self.terminals = terminals
+
+        return terminals
+
+    def execute(self, terminal, commands, timeout=None):
+        """Execute one or more commands on a terminal."""
+        return self.execute_async(terminal, commands, timeout).result()
+
+    def execute_async(self, terminal, commands, timeout=None):
+        """Execute one or more commands on a terminal, returning a future."""
+        (serial_port, port) = terminal
+
+        if serial_port not in self.interfaces:
+            raise KeyError(f'Unknown serial port: {serial_port}')
+
+        interface = self.interfaces[serial_port]
+
+        address = _get_address(port)
+
+        (normalized_commands, has_multiple_commands) = _normalize_commands(commands)
+
+        addressed_commands = [(address, command) for (_, command) in normalized_commands]
+
+        if not has_multiple_commands:
+            return interface.execute_async(addressed_commands[0], timeout)
+
+        return interface.execute_async(addressed_commands, timeout)
+
+    def execute_many(self, terminal_commands, timeout=None):
+        """Execute commands on multiple terminals concurrently.
+
+        Returns a map of terminal to response, a response is an exception if
+        the execution for that terminal raised an exception.
+        """
+        futures = {terminal: self.execute_async(terminal, commands, timeout)
+                   for (terminal, commands) in terminal_commands.items()}
+
+        responses = {}
+
+        for (terminal, future) in futures.items():
+            error = future.exception()
+
+            responses[terminal] = error if error is not None else future.result()
+
+        return responses
+
+def _get_address(port):
+    if port is None:
+        return None
+
+    return get_device_address(port)
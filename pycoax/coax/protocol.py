@@ -3,9 +3,13 @@ coax.protocol
 ~~~~~~~~~~~~~
 """
 
+import re
+import sys
+from array import array
 from enum import Enum
+from functools import lru_cache
 
-from .parity import odd_parity
+from .parity import ODD_PARITY_TABLE, verify_odd_parity
 from .exceptions import ProtocolError
 
 class FrameFormat(Enum):
@@ -65,6 +69,8 @@ class PollAction(Enum):
 class PollResponse:
     """Terminal POLL response."""
 
+    __slots__ = ('value',)
+
     @staticmethod
     def is_power_on_reset_complete(value):
         """Is the response word a power on reset complete response?"""
@@ -81,6 +87,8 @@ class PollResponse:
 class PowerOnResetCompletePollResponse(PollResponse):
     """Terminal power-on-reset complete poll response."""
 
+    __slots__ = ()
+
     def __init__(self, value):
         if not PollResponse.is_power_on_reset_complete(value):
             raise ValueError(f'Invalid POR poll response: {value}')
@@ -90,6 +98,8 @@ class PowerOnResetCompletePollResponse(PollResponse):
 class KeystrokePollResponse(PollResponse):
     """Terminal keystroke poll response."""
 
+    __slots__ = ('scan_code',)
+
     def __init__(self, value):
         if not PollResponse.is_keystroke(value):
             raise ValueError(f'Invalid keystroke poll response: {value}')
@@ -104,6 +114,8 @@ class KeystrokePollResponse(PollResponse):
 class Status:
     """Terminal status."""
 
+    __slots__ = ('value', 'monocase', 'busy', 'feature_error', 'operation_complete')
+
     def __init__(self, value):
         self.value = value
 
@@ -117,6 +129,43 @@ class Status:
                 f'feature_error={self.feature_error}, '
                 f'operation_complete={self.operation_complete}>')
 
+class DataWords:
+    """Data bytes backed by 10-bit data words, unpacked on access."""
+
+    __slots__ = ('words',)
+
+    def __init__(self, words):
+        self.words = words
+
+    def __len__(self):
+        return len(self.words)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return unpack_data_words(self.words[index])
+
+        return unpack_data_word(self.words[index])
+
+    def __iter__(self):
+        return iter(bytes(self))
+
+    def __bytes__(self):
+        return unpack_data_words(self.words)
+
+    def __eq__(self, other):
+        if isinstance(other, DataWords):
+            return self.words == other.words
+
+        if isinstance(other, (bytes, bytearray, memoryview)):
+            return bytes(self) == other
+
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f'<DataWords {bytes(self)!r}>'
+
 class TerminalType(Enum):
     """Terminal type."""
 
@@ -126,6 +175,8 @@ class TerminalType(Enum):
 class TerminalId:
     """Terminal model and keyboard."""
 
+    __slots__ = ('value', 'type', 'model', 'keyboard')
+
     _MODEL_MAP = {
         0b010: 2,
         0b011: 3,
@@ -160,6 +211,8 @@ class TerminalId:
 class Control:
     """Terminal control register."""
 
+    __slots__ = ('step_inhibit', 'display_inhibit', 'cursor_inhibit', 'cursor_reverse', 'cursor_blink')
+
     def __init__(self, step_inhibit=False, display_inhibit=False, cursor_inhibit=False,
                  cursor_reverse=False, cursor_blink=False):
         self.step_inhibit = step_inhibit
@@ -188,6 +241,8 @@ class Control:
 class SecondaryControl:
     """Terminal secondary control register."""
 
+    __slots__ = ('big',)
+
     def __init__(self, big=False):
         self.big = big
 
@@ -201,6 +256,8 @@ class SecondaryControl:
 class ReadCommand:
     """Base class for read commands."""
 
+    __slots__ = ()
+
     response_length = None
 
     def pack_outbound_frame(self):
@@ -212,6 +269,8 @@ class ReadCommand:
 class WriteCommand:
     """Base class for write commands."""
 
+    __slots__ = ()
+
     response_length = 1
 
     def pack_outbound_frame(self):
@@ -224,6 +283,8 @@ class WriteCommand:
 class Poll(ReadCommand):
     """POLL command."""
 
+    __slots__ = ('action',)
+
     response_length = 1
 
     def __init__(self, action=PollAction.NONE):
@@ -254,6 +315,8 @@ class Poll(ReadCommand):
 class PollAck(WriteCommand):
     """POLL_ACK command."""
 
+    __slots__ = ()
+
     def pack_outbound_frame(self):
         command_word = pack_command_word(Command.POLL_ACK)
 
@@ -262,6 +325,8 @@ class PollAck(WriteCommand):
 class ReadStatus(ReadCommand):
     """READ_STATUS command."""
 
+    __slots__ = ()
+
     response_length = 1
 
     def pack_outbound_frame(self):
@@ -278,6 +343,8 @@ class ReadStatus(ReadCommand):
 class ReadTerminalId(ReadCommand):
     """READ_TERMINAL_ID command."""
 
+    __slots__ = ()
+
     response_length = 1
 
     def pack_outbound_frame(self):
@@ -294,6 +361,8 @@ class ReadTerminalId(ReadCommand):
 class ReadExtendedId(ReadCommand):
     """READ_EXTENDED_ID command."""
 
+    __slots__ = ()
+
     response_length = 4
 
     def pack_outbound_frame(self):
@@ -313,6 +382,8 @@ class ReadExtendedId(ReadCommand):
 class ReadAddressCounterHi(ReadCommand):
     """READ_ADDRESS_COUNTER_HI command."""
 
+    __slots__ = ()
+
     response_length = 1
 
     def pack_outbound_frame(self):
@@ -329,6 +400,8 @@ class ReadAddressCounterHi(ReadCommand):
 class ReadAddressCounterLo(ReadCommand):
     """READ_ADDRESS_COUNTER_LO command."""
 
+    __slots__ = ()
+
     response_length = 1
 
     def pack_outbound_frame(self):
@@ -345,6 +418,8 @@ class ReadAddressCounterLo(ReadCommand):
 class ReadData(ReadCommand):
     """READ_DATA command."""
 
+    __slots__ = ()
+
     response_length = 1
 
     def pack_outbound_frame(self):
@@ -359,10 +434,19 @@ class ReadData(ReadCommand):
         return unpack_data_word(words[0])
 
 class ReadMultiple(ReadCommand):
-    """READ_MULTIPLE command."""
+    """READ_MULTIPLE command.
+
+    If lazy is True the response is DataWords, unpacked on access, rather than
+    bytes.
+    """
+
+    __slots__ = ('lazy',)
 
     response_length = 32
 
+    def __init__(self, lazy=False):
+        self.lazy = lazy
+
     def pack_outbound_frame(self):
         command_word = pack_command_word(Command.READ_MULTIPLE)
 
@@ -372,11 +456,16 @@ class ReadMultiple(ReadCommand):
         if len(words) == 0:
             raise ProtocolError(f'Expected 1 or more word READ_MULTIPLE response: {words}')
 
+        if self.lazy:
+            return DataWords(words)
+
         return unpack_data_words(words)
 
 class Reset(WriteCommand):
     """RESET command."""
 
+    __slots__ = ()
+
     def pack_outbound_frame(self):
         command_word = pack_command_word(Command.RESET)
 
@@ -385,6 +474,8 @@ class Reset(WriteCommand):
 class LoadControlRegister(WriteCommand):
     """LOAD_CONTROL_REGISTER command."""
 
+    __slots__ = ('control',)
+
     def __init__(self, control):
         self.control = control
 
@@ -396,6 +487,8 @@ class LoadControlRegister(WriteCommand):
 class LoadSecondaryControl(WriteCommand):
     """LOAD_SECONDARY_CONTROL command."""
 
+    __slots__ = ('control',)
+
     def __init__(self, control):
         self.control = control
 
@@ -407,6 +500,8 @@ class LoadSecondaryControl(WriteCommand):
 class LoadMask(WriteCommand):
     """LOAD_MASK command."""
 
+    __slots__ = ('mask',)
+
     def __init__(self, mask):
         self.mask = mask
 
@@ -418,6 +513,8 @@ class LoadMask(WriteCommand):
 class LoadAddressCounterHi(WriteCommand):
     """LOAD_ADDRESS_COUNTER_HI command."""
 
+    __slots__ = ('address',)
+
     def __init__(self, address):
         if address < 0 or address > 255:
             raise ValueError('Address is out of range')
@@ -432,6 +529,8 @@ class LoadAddressCounterHi(WriteCommand):
 class LoadAddressCounterLo(WriteCommand):
     """LOAD_ADDRESS_COUNTER_LO command."""
 
+    __slots__ = ('address',)
+
     def __init__(self, address):
         if address < 0 or address > 255:
             raise ValueError('Address is out of range')
@@ -446,6 +545,8 @@ class LoadAddressCounterLo(WriteCommand):
 class WriteData(WriteCommand):
     """WRITE_DATA command."""
 
+    __slots__ = ('data',)
+
     def __init__(self, data):
         self.data = data
 
@@ -454,9 +555,24 @@ class WriteData(WriteCommand):
 
         return (FrameFormat.WORD_DATA, command_word, self.data)
 
+    def pack_outbound_frames(self, max_length, repeat=False):
+        """Pack the command into frames of at most max_length data bytes.
+
+        If repeat is True, long runs of a single byte are packed as repeated
+        frames.
+        """
+        command_word = pack_command_word(Command.WRITE_DATA)
+
+        if repeat:
+            return [(FrameFormat.WORD_DATA, command_word, data) for data in _encode_data(self.data, max_length, 1)]
+
+        return [(FrameFormat.WORD_DATA, command_word, data) for data in _split_data(self.data, max_length)]
+
 class Clear(WriteCommand):
     """CLEAR command."""
 
+    __slots__ = ('pattern',)
+
     def __init__(self, pattern):
         self.pattern = pattern
 
@@ -468,6 +584,8 @@ class Clear(WriteCommand):
 class SearchForward(WriteCommand):
     """SEARCH_FORWARD command."""
 
+    __slots__ = ('pattern',)
+
     def __init__(self, pattern):
         self.pattern = pattern
 
@@ -479,6 +597,8 @@ class SearchForward(WriteCommand):
 class SearchBackward(WriteCommand):
     """SEARCH_BACKWARD command."""
 
+    __slots__ = ('pattern',)
+
     def __init__(self, pattern):
         self.pattern = pattern
 
@@ -490,6 +610,8 @@ class SearchBackward(WriteCommand):
 class InsertByte(WriteCommand):
     """INSERT_BYTE command."""
 
+    __slots__ = ('byte',)
+
     def __init__(self, byte):
         self.byte = byte
 
@@ -501,6 +623,8 @@ class InsertByte(WriteCommand):
 class StartOperation(WriteCommand):
     """START_OPERATION command."""
 
+    __slots__ = ()
+
     def pack_outbound_frame(self):
         raise NotImplementedError
 
@@ -510,6 +634,8 @@ class StartOperation(WriteCommand):
 class DiagnosticReset(WriteCommand):
     """DIAGNOSTIC_RESET command."""
 
+    __slots__ = ()
+
     def pack_outbound_frame(self):
         raise NotImplementedError
 
@@ -519,6 +645,8 @@ class DiagnosticReset(WriteCommand):
 class ReadFeatureId(ReadCommand):
     """READ_FEATURE_ID command."""
 
+    __slots__ = ('feature_address',)
+
     response_length = 1
 
     def __init__(self, feature_address):
@@ -541,6 +669,8 @@ class ReadFeatureId(ReadCommand):
 class EABReadData(ReadCommand):
     """EAB_READ_DATA command."""
 
+    __slots__ = ('feature_address',)
+
     response_length = 1
 
     def __init__(self, feature_address):
@@ -560,6 +690,8 @@ class EABReadData(ReadCommand):
 class EABLoadMask(WriteCommand):
     """EAB_LOAD_MASK command."""
 
+    __slots__ = ('feature_address', 'mask')
+
     def __init__(self, feature_address, mask):
         self.feature_address = feature_address
         self.mask = mask
@@ -572,6 +704,8 @@ class EABLoadMask(WriteCommand):
 class EABWriteAlternate(WriteCommand):
     """EAB_WRITE_ALTERNATE command."""
 
+    __slots__ = ('feature_address', 'data')
+
     def __init__(self, feature_address, data):
         self.feature_address = feature_address
         self.data = data
@@ -581,13 +715,34 @@ class EABWriteAlternate(WriteCommand):
 
         return (FrameFormat.WORD_DATA, command_word, self.data)
 
+    def pack_outbound_frames(self, max_length, repeat=False):
+        """Pack the command into frames of at most max_length data bytes.
+
+        If repeat is True, long runs of a single regen and EAB byte pair are
+        packed as repeated frames.
+        """
+        command_word = pack_command_word(Command.EAB_WRITE_ALTERNATE, self.feature_address)
+
+        # Regen and EAB bytes alternate, so a pair must not be split.
+        if repeat:
+            return [(FrameFormat.WORD_DATA, command_word, data) for data in _encode_data(self.data, max_length & ~1, 2)]
+
+        return [(FrameFormat.WORD_DATA, command_word, data) for data in _split_data(self.data, max_length & ~1)]
+
 class EABReadMultiple(ReadCommand):
-    """EAB_READ_MULTIPLE command."""
+    """EAB_READ_MULTIPLE command.
+
+    If lazy is True the response is DataWords, unpacked on access, rather than
+    bytes.
+    """
+
+    __slots__ = ('feature_address', 'lazy')
 
     response_length = 32
 
-    def __init__(self, feature_address):
+    def __init__(self, feature_address, lazy=False):
         self.feature_address = feature_address
+        self.lazy = lazy
 
     def pack_outbound_frame(self):
         command_word = pack_command_word(Command.EAB_READ_MULTIPLE, self.feature_address)
@@ -595,11 +750,16 @@ class EABReadMultiple(ReadCommand):
         return (FrameFormat.WORD_DATA, command_word)
 
     def unpack_inbound_frame(self, words):
+        if self.lazy:
+            return DataWords(words)
+
         return unpack_data_words(words)
 
 class EABWriteUnderMask(WriteCommand):
     """EAB_WRITE_UNDER_MASK command."""
 
+    __slots__ = ('feature_address', 'byte')
+
     def __init__(self, feature_address, byte):
         self.feature_address = feature_address
         self.byte = byte
@@ -612,6 +772,8 @@ class EABWriteUnderMask(WriteCommand):
 class EABReadStatus(ReadCommand):
     """EAB_READ_STATUS command."""
 
+    __slots__ = ('feature_address',)
+
     response_length = 1
 
     def __init__(self, feature_address):
@@ -631,12 +793,79 @@ class EABReadStatus(ReadCommand):
 class Data(WriteCommand):
     """Unaccompanied data."""
 
+    __slots__ = ('data',)
+
     def __init__(self, data):
         self.data = data
 
     def pack_outbound_frame(self):
         return (FrameFormat.DATA, self.data)
 
+def _split_data(data, max_length):
+    # Data with a repeat count is not split.
+    if isinstance(data, tuple) or len(data) <= max_length:
+        return [data]
+
+    return [data[index:index + max_length] for index in range(0, len(data), max_length)]
+
+def _encode_data(data, max_length, unit_length):
+    # Data that already has a repeat count is not encoded.
+    if isinstance(data, tuple):
+        return [data]
+
+    data = bytes(data)
+
+    pattern = _get_repeat_pattern(unit_length)
+
+    encoded_data = []
+    position = 0
+
+    match = pattern.search(data)
+
+    while match is not None:
+        # Align the run to a whole unit, the data repeats with a period of the
+        # unit length so the aligned run is also a run.
+        start = match.start() + (-match.start() % unit_length)
+
+        unit = data[start:start + unit_length]
+
+        end = start + (((match.end() - start) // unit_length) * unit_length)
+
+        while data[end:end + unit_length] == unit:
+            end += unit_length
+
+        count = (end - start) // unit_length
+
+        if count * unit_length >= _MIN_REPEAT_LENGTH:
+            if start > position:
+                encoded_data += _split_data(data[position:start], max_length)
+
+            # The interface expands the repeat in its message buffer, so the
+            # expanded data must not exceed the maximum length.
+            max_count = max_length // unit_length
+
+            encoded_data += [(unit, min(count - index, max_count)) for index in range(0, count, max_count)]
+
+            position = end
+
+        match = pattern.search(data, end)
+
+    if position < len(data) or not encoded_data:
+        encoded_data += _split_data(data[position:], max_length)
+
+    return encoded_data
+
+@lru_cache(maxsize=None)
+def _get_repeat_pattern(unit_length):
+    return re.compile(rb'(.{%d})\1{%d,}' % (unit_length, (_MIN_REPEAT_LENGTH // unit_length) - 1), re.DOTALL)
+
+# Minimum run length, in bytes, worth packing as a repeated frame - each
+# additional frame adds a TRANSMIT_RECEIVE message (13 bytes of overhead) and
+# a round trip, so only runs that save significantly more than this are
+# packed.
+_MIN_REPEAT_LENGTH = 64
+
+@lru_cache(maxsize=None)
 def pack_command_word(command, feature_address=None):
     """Pack a command into a 10-bit command word."""
     if feature_address is not None and (feature_address < 2 or feature_address > 15):
@@ -646,9 +875,10 @@ def pack_command_word(command, feature_address=None):
 
 def pack_data_word(byte, set_parity=True):
     """Pack a data byte into a 10-bit data word."""
-    parity = odd_parity(byte) if set_parity else 0
+    if byte < 0 or byte > 255:
+        raise ValueError('Input must be between 0 and 255')
 
-    return (byte << 2) | (parity << 1)
+    return _DATA_WORD_LOOKUP[byte] if set_parity else byte << 2
 
 def is_tt_ar(words):
     """Is the word a TT/AR (transmission turnaround / auto response)?"""
@@ -664,17 +894,83 @@ def unpack_data_word(word, check_parity=False):
         raise ProtocolError(f'Word does not have data bit set: {word}')
 
     byte = (word >> 2) & 0xff
-    parity = (word >> 1) & 0x1
 
-    if check_parity and parity != odd_parity(byte):
+    if check_parity and (word & 0x3fe) != _DATA_WORD_LOOKUP[byte]:
         raise ProtocolError(f'Parity error: {word}')
 
     return byte
 
 def pack_data_words(bytes_, set_parity=True):
     """Pack data bytes into 10-bit data words."""
-    return [pack_data_word(byte, set_parity=set_parity) for byte in bytes_]
+    bytes_ = bytes(bytes_)
+
+    # The low and high byte planes of the little-endian words are built using
+    # lookup tables, and then interleaved.
+    lo_lookup = _PACK_PARITY_LO_LOOKUP if set_parity else _PACK_LO_LOOKUP
+
+    buffer = bytearray(len(bytes_) * 2)
+
+    buffer[0::2] = bytes_.translate(lo_lookup)
+    buffer[1::2] = bytes_.translate(_PACK_HI_LOOKUP)
+
+    return _unpack_words(buffer)
 
 def unpack_data_words(words, check_parity=False):
     """Unpack the data bytes from 10-bit data words."""
-    return bytes([unpack_data_word(word, check_parity=check_parity) for word in words])
+    # Split the little-endian words into low and high byte planes, the data
+    # byte is then extracted from both planes using lookup tables.
+    bytes_ = _pack_words(words)
+
+    lo_bytes = bytes_[0::2]
+    hi_bytes = bytes_[1::2]
+
+    index = lo_bytes.translate(_CONTROL_BIT_LOOKUP).find(1)
+
+    if index != -1:
+        raise ProtocolError(f'Word does not have data bit set: {words[index]}')
+
+    data = _or_bytes(lo_bytes.translate(_DATA_LO_LOOKUP), hi_bytes.translate(_DATA_HI_LOOKUP))
+
+    if check_parity:
+        index = verify_odd_parity(data, lo_bytes.translate(_PARITY_BIT_LOOKUP))
+
+        if index != -1:
+            raise ProtocolError(f'Parity error: {words[index]}')
+
+    return data
+
+def _pack_words(words):
+    words = array('H', words)
+
+    if sys.byteorder != 'little':
+        words.byteswap()
+
+    return words.tobytes()
+
+def _unpack_words(bytes_):
+    words = array('H', bytes_)
+
+    if sys.byteorder != 'little':
+        words.byteswap()
+
+    return words.tolist()
+
+def _or_bytes(a, b):
+    length = len(a)
+
+    return (int.from_bytes(a, 'little') | int.from_bytes(b, 'little')).to_bytes(length, 'little')
+
+# Lookup tables for the low and high bytes of a 10-bit word.
+_CONTROL_BIT_LOOKUP = bytes([byte & 0x1 for byte in range(256)])
+_DATA_LO_LOOKUP = bytes([byte >> 2 for byte in range(256)])
+_DATA_HI_LOOKUP = bytes([(byte & 0x3) << 6 for byte in range(256)])
+_PARITY_BIT_LOOKUP = bytes([(byte >> 1) & 0x1 for byte in range(256)])
+
+# Lookup tables for packing a data byte into the low and high bytes of a
+# 10-bit word.
+_PACK_LO_LOOKUP = bytes([(byte << 2) & 0xff for byte in range(256)])
+_PACK_PARITY_LO_LOOKUP = bytes([((byte << 2) | (ODD_PARITY_TABLE[byte] << 1)) & 0xff for byte in range(256)])
+_PACK_HI_LOOKUP = bytes([byte >> 6 for byte in range(256)])
+
+# Data word, with parity, for each data byte.
+_DATA_WORD_LOOKUP = [(byte << 2) | (ODD_PARITY_TABLE[byte] << 1) for byte in range(256)]
@@ -0,0 +1,363 @@
+"""
+coax.screen
+~~~~~~~~~~~
+"""
+
+import re
+
+from .protocol import SecondaryControl, LoadAddressCounterHi, LoadAddressCounterLo, WriteData, \
+                      ReadMultiple, LoadSecondaryControl, EABWriteAlternate, EABLoadMask, \
+                      EABWriteUnderMask
+
+class ScreenBuffer:
+    """Shadow of a terminal regen buffer, and optionally EAB buffer.
+
+    Applications write into the shadow, and flush() sends only the changes to
+    the terminal. If the EAB feature address is provided, the EAB buffer is
+    also shadowed and written using EAB_WRITE_ALTERNATE.
+    """
+
+    def __init__(self, size, eab_address=None):
+        if size < 1 or size > 0xffff:
+            raise ValueError('Size must be between 1 and 65535')
+
+        self.size = size
+        self.eab_address = eab_address
+
+        self.regen = bytearray(size)
+        self.eab = bytearray(size) if eab_address is not None else None
+
+        # The buffers as last sent to the terminal, None if unknown.
+        self._terminal_regen = None
+        self._terminal_eab = None
+
+        self._dirty_ranges = [(0, size)]
+
+    def write(self, address, data, eab=None):
+        """Write data, and optionally EAB data, to the shadow at an address."""
+        end = self._check_range(address, len(data))
+
+        if eab is not None:
+            self._check_eab(eab, len(data))
+
+            self.eab[address:end] = eab
+
+        self.regen[address:end] = data
+
+        self._mark_dirty(address, end)
+
+    def write_eab(self, address, eab):
+        """Write EAB data to the shadow at an address."""
+        end = self._check_range(address, len(eab))
+
+        self._check_eab(eab, len(eab))
+
+        self.eab[address:end] = eab
+
+        self._mark_dirty(address, end)
+
+    def fill(self, address, length, byte, eab_byte=None):
+        """Fill the shadow with a byte, and optionally EAB byte, from an address."""
+        end = self._check_range(address, length)
+
+        if eab_byte is not None:
+            self._check_eab(None, length)
+
+            self.eab[address:end] = bytes([eab_byte]) * length
+
+        self.regen[address:end] = bytes([byte]) * length
+
+        self._mark_dirty(address, end)
+
+    def read(self, address, length):
+        """Read data from the shadow at an address."""
+        end = self._check_range(address, length)
+
+        return bytes(self.regen[address:end])
+
+    def read_eab(self, address, length):
+        """Read EAB data from the shadow at an address."""
+        end = self._check_range(address, length)
+
+        self._check_eab(None, length)
+
+        return bytes(self.eab[address:end])
+
+    def invalidate(self):
+        """Mark the terminal buffers as unknown, so that all is flushed."""
+        self._terminal_regen = None
+        self._terminal_eab = None
+
+        self._dirty_ranges = [(0, self.size)]
+
+    def get_commands(self):
+        """Get the commands required to update the terminal with the changes."""
+        changed_ranges = self._get_changed_ranges()
+
+        if self.eab is None:
+            return _get_write_commands(self.regen, changed_ranges)
+
+        return _get_eab_write_commands(self.regen, self.eab, self._terminal_regen, changed_ranges,
+                                       self.eab_address)
+
+    def flush(self, interface, address=None):
+        """Update the terminal with the changes."""
+        commands = self.get_commands()
+
+        if commands:
+            responses = interface.execute([(address, command) for command in commands])
+
+            for response in responses:
+                if isinstance(response, BaseException):
+                    raise response
+
+        self._terminal_regen = bytearray(self.regen)
+
+        if self.eab is not None:
+            self._terminal_eab = bytearray(self.eab)
+
+        self._dirty_ranges = []
+
+    def _check_range(self, address, length):
+        if address < 0 or address + length > self.size:
+            raise IndexError('Address is out of range')
+
+        return address + length
+
+    def _check_eab(self, eab, length):
+        if self.eab is None:
+            raise ValueError('EAB feature address is required')
+
+        if eab is not None and len(eab) != length:
+            raise ValueError('EAB data length must equal data length')
+
+    def _mark_dirty(self, start, end):
+        if start == end:
+            return
+
+        self._dirty_ranges.append((start, end))
+
+        if len(self._dirty_ranges) > 64:
+            self._dirty_ranges = _merge_ranges(self._dirty_ranges, 0)
+
+    def _get_changed_ranges(self):
+        dirty_ranges = _merge_ranges(self._dirty_ranges, 0)
+
+        if self._terminal_regen is None:
+            return dirty_ranges
+
+        changed_ranges = []
+
+        for (start, end) in dirty_ranges:
+            changed_ranges += [(start + match.start(), start + match.end()) for match in
+                               _find_differences(self.regen[start:end], self._terminal_regen[start:end])]
+
+            if self.eab is not None:
+                changed_ranges += [(start + match.start(), start + match.end()) for match in
+                                   _find_differences(self.eab[start:end], self._terminal_eab[start:end])]
+
+        if self.eab is not None:
+            changed_ranges = _merge_ranges(changed_ranges, 0)
+
+        return changed_ranges
+
+def read_buffer(interface, start, length, big=False, address=None):
+    """Read the terminal regen buffer using READ_MULTIPLE.
+
+    The READ_MULTIPLE commands are executed as a single batch, allowing the
+    interface to pipeline them. If big is True, the secondary control big
+    flag is set for the read, and cleared after.
+    """
+    buffer = bytearray(length)
+
+    # The number of bytes returned by each READ_MULTIPLE depends on the
+    # address and terminal, so this is only an estimate - the responses are
+    # assembled in order, and any remainder is read with another batch.
+    chunk_length = 32 if big else 16
+
+    commands = [LoadAddressCounterHi(start >> 8), LoadAddressCounterLo(start & 0xff)]
+
+    if big:
+        commands.append(LoadSecondaryControl(SecondaryControl(big=True)))
+
+    position = 0
+
+    try:
+        while position < length:
+            # The first read is to the next chunk boundary.
+            offset = (start + position) % chunk_length
+
+            count = -(-(offset + length - position) // chunk_length)
+
+            commands += [ReadMultiple()] * count
+
+            responses = interface.execute([(address, command) for command in commands])
+
+            for response in responses:
+                if isinstance(response, BaseException):
+                    raise response
+
+            for response in responses[len(responses) - count:]:
+                end = min(position + len(response), length)
+
+                buffer[position:end] = response[:end - position]
+
+                position = end
+
+            commands = []
+    finally:
+        if big:
+            interface.execute((address, LoadSecondaryControl(SecondaryControl(big=False))))
+
+    return buffer
+
+def interleave_eab(regen, eab):
+    """Interleave regen and EAB data, for EAB_WRITE_ALTERNATE."""
+    if len(regen) != len(eab):
+        raise ValueError('EAB data length must equal data length')
+
+    data = bytearray(len(regen) * 2)
+
+    data[0::2] = regen
+    data[1::2] = eab
+
+    return bytes(data)
+
+def deinterleave_eab(data):
+    """Split interleaved regen and EAB data into regen and EAB data."""
+    if len(data) % 2 != 0:
+        raise ValueError('Interleaved data length must be even')
+
+    return (bytes(data[0::2]), bytes(data[1::2]))
+
+# Approximate wire cost, in bytes, of a LOAD_ADDRESS_COUNTER_HI or LO command,
+# of the TRANSMIT_RECEIVE message for a WRITE_DATA command excluding data and
+# of a single data byte as a 10-bit data word.
+_LOAD_ADDRESS_COUNTER_COST = 17
+_WRITE_DATA_COST = 15
+_DATA_BYTE_COST = 2
+
+# Approximate wire cost, in bytes, of an EAB_LOAD_MASK command and the saving
+# of an EAB_WRITE_UNDER_MASK command over an EAB_WRITE_ALTERNATE command for a
+# single cell.
+_EAB_LOAD_MASK_COST = 17
+_EAB_WRITE_UNDER_MASK_SAVING = 2
+
+_NON_ZERO_PATTERN = re.compile(rb'[^\x00]+')
+
+def _find_differences(a, b):
+    length = len(a)
+
+    difference = (int.from_bytes(a, 'little') ^ int.from_bytes(b, 'little')).to_bytes(length, 'little')
+
+    return _NON_ZERO_PATTERN.finditer(difference)
+
+def _merge_ranges(ranges, max_gap):
+    merged_ranges = []
+
+    for (start, end) in sorted(ranges):
+        if merged_ranges and start - merged_ranges[-1][1] <= max_gap:
+            if end > merged_ranges[-1][1]:
+                merged_ranges[-1] = (merged_ranges[-1][0], end)
+        else:
+            merged_ranges.append((start, end))
+
+    return merged_ranges
+
+def _get_segment_cost(previous_end, start):
+    cost = _WRITE_DATA_COST + _LOAD_ADDRESS_COUNTER_COST
+
+    if (previous_end >> 8) != (start >> 8):
+        cost += _LOAD_ADDRESS_COUNTER_COST
+
+    return cost
+
+def _get_write_segments(changed_ranges, cell_cost):
+    # Unchanged cells between changed ranges are written when that costs less
+    # than starting a new write with address counter loads.
+    segments = []
+
+    for (start, end) in changed_ranges:
+        if segments:
+            (previous_start, previous_end) = segments[-1]
+
+            if (start - previous_end) * cell_cost <= _get_segment_cost(previous_end, start):
+                segments[-1] = (previous_start, end)
+                continue
+
+        segments.append((start, end))
+
+    return segments
+
+def _get_load_address_counter_commands(address_counter, address, address_counter_hi=None):
+    # The high byte may be known when the address counter is not.
+    if address_counter == address:
+        return []
+
+    if address_counter is not None:
+        address_counter_hi = address_counter >> 8
+
+    if address_counter_hi != (address >> 8):
+        return [LoadAddressCounterHi(address >> 8), LoadAddressCounterLo(address & 0xff)]
+
+    return [LoadAddressCounterLo(address & 0xff)]
+
+def _get_write_commands(regen, changed_ranges):
+    commands = []
+
+    # The address counter is unknown before the first write.
+    address_counter = None
+
+    for (start, end) in _get_write_segments(changed_ranges, _DATA_BYTE_COST):
+        commands += _get_load_address_counter_commands(address_counter, start)
+
+        commands.append(WriteData(bytes(regen[start:end])))
+
+        address_counter = end
+
+    return commands
+
+def _get_eab_write_commands(regen, eab, terminal_regen, changed_ranges, eab_address):
+    segments = _get_write_segments(changed_ranges, _DATA_BYTE_COST * 2)
+
+    # Single cells where only the EAB data has changed can be written with
+    # EAB_WRITE_UNDER_MASK, this requires the mask to be loaded first so is
+    # only used when there are enough cells. The address counter may not be
+    # incremented after the write, so only the high byte is known after - a
+    # cell at the end of a 256 byte block is excluded as that would require
+    # the high byte to be loaded again.
+    under_mask_addresses = set()
+
+    if terminal_regen is not None:
+        under_mask_addresses = {start for (start, end) in segments
+                                if end - start == 1 and (start & 0xff) != 0xff
+                                and regen[start] == terminal_regen[start]}
+
+        if len(under_mask_addresses) * _EAB_WRITE_UNDER_MASK_SAVING <= _EAB_LOAD_MASK_COST:
+            under_mask_addresses = set()
+
+    commands = []
+
+    if under_mask_addresses:
+        commands.append(EABLoadMask(eab_address, 0xff))
+
+    address_counter = None
+    address_counter_hi = None
+
+    for (start, end) in segments:
+        commands += _get_load_address_counter_commands(address_counter, start, address_counter_hi)
+
+        if start in under_mask_addresses:
+            commands.append(EABWriteUnderMask(eab_address, eab[start]))
+
+            # Do not assume that the address counter is incremented, it is
+            # either the address or the next address which has the same high
+            # byte.
+            address_counter = None
+            address_counter_hi = start >> 8
+        else:
+            commands.append(EABWriteAlternate(eab_address, interleave_eab(regen[start:end], eab[start:end])))
+
+            address_counter = end
+
+    return commands
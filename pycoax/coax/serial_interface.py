@@ -3,24 +3,32 @@ coax.serial_interface
 ~~~~~~~~~~~~~~~~~~~~~
 """
 
+import sys
 import time
 import os
 import struct
+from array import array
 from copy import copy
+from enum import Enum
+from collections import deque
 from contextlib import contextmanager
 from serial import Serial, SerialException
-from sliplib import SlipWrapper, ProtocolError
 
 from .interface import Interface, InterfaceFeature, normalize_frame
+from .protocol import FrameFormat
+from .slip import SlipDecoder, SlipError, encode
 from .exceptions import InterfaceError, InterfaceTimeout, ReceiveError, ReceiveTimeout
 
 class SerialInterface(Interface):
     """Serial attached 3270 coax interface."""
 
-    def __init__(self, serial):
+    def __init__(self, serial, pipeline_depth=1):
         if serial is None:
             raise ValueError('Serial port is required')
 
+        if pipeline_depth < 1:
+            raise ValueError('Pipeline depth must be at least 1')
+
         super().__init__()
 
         self.serial = serial
@@ -30,13 +38,29 @@ class SerialInterface(Interface):
         self.legacy_firmware_detected = None
         self.legacy_firmware_version = None
 
-    def reset(self):
+        # The maximum number of TRANSMIT_RECEIVE messages that will be sent before
+        # waiting for a response. The firmware must be able to queue messages in
+        # order to use a depth greater than 1.
+        self.pipeline_depth = pipeline_depth
+
+        # The size of the firmware message buffer, if known, this limits the
+        # number of message bytes in flight when pipelining and the length of
+        # write data frames.
+        self.message_buffer_size = None
+
+    @property
+    def max_data_length(self):
+        """Maximum number of data bytes in a single frame."""
+        return _get_max_data_length(self.message_buffer_size)
+
+    def reset(self, timeout=5):
         """Reset the interface."""
         original_serial_timeout = self.serial.timeout
 
-        self.serial.timeout = 5
+        self.serial.timeout = timeout
 
         self.serial.reset_input_buffer()
+        self.slip_serial.reset()
 
         self._write_message(bytes([0x01]))
 
@@ -46,28 +70,73 @@ class SerialInterface(Interface):
             self.serial.timeout = original_serial_timeout
 
             self.serial.reset_input_buffer()
+            self.slip_serial.reset()
 
-        if message[0] != 0x01:
-            raise _convert_error(message)
-
-        if message[1:] == b'\x32\x70':
-            self.legacy_firmware_detected = False
-            self.legacy_firmware_version = None
-        elif len(message) == 4:
-            (major, minor, patch) = struct.unpack('BBB', message[1:])
-
-            self.legacy_firmware_detected = True
-            self.legacy_firmware_version = f'{major}.{minor}.{patch}'
-        else:
-            raise InterfaceError(f'Invalid reset response: {message}')
+        (self.legacy_firmware_detected, self.legacy_firmware_version) = _parse_reset_response(message)
 
-        # Query features, if this is not a legacy firmware.
+        # Query features and message buffer size, if this is not a legacy firmware.
         if not self.legacy_firmware_detected:
             try:
                 self.features = self._get_features()
             except InterfaceError:
                 pass
 
+            try:
+                self.message_buffer_size = self._get_message_buffer_size()
+            except InterfaceError:
+                pass
+
+    def wait_for_ready(self, timeout=5):
+        """Wait for the interface firmware to start.
+
+        The interface is probed, with an increasing probe timeout, until it
+        responds or the timeout expires.
+        """
+        original_serial_timeout = self.serial.timeout
+
+        deadline = time.monotonic() + timeout
+
+        probe_timeout = 0.05
+        probe_count = 0
+
+        try:
+            while True:
+                self.serial.timeout = min(probe_timeout, max(deadline - time.monotonic(), 0.01))
+
+                probe_count += 1
+
+                if self._probe():
+                    break
+
+                if time.monotonic() >= deadline:
+                    raise InterfaceTimeout('Interface did not respond')
+
+                probe_timeout = min(probe_timeout * 2, 1)
+
+            # Consume any late responses to earlier probes.
+            if probe_count > 1:
+                self._discard_responses(probe_count - 1)
+        finally:
+            self.serial.timeout = original_serial_timeout
+
+            self.serial.reset_input_buffer()
+            self.slip_serial.reset()
+
+    def _probe(self):
+        self.serial.reset_input_buffer()
+        self.slip_serial.reset()
+
+        # Any valid response indicates that the firmware is running, including
+        # an error from legacy firmware that does not support INFO queries.
+        self._write_message(_PROBE_MESSAGE)
+
+        try:
+            self._read_message()
+        except (InterfaceError, InterfaceTimeout):
+            return False
+
+        return True
+
     def enter_dfu_mode(self):
         """Enter device firmware upgrade mode."""
         message = bytes([0xf2])
@@ -79,116 +148,333 @@ class SerialInterface(Interface):
         if message[0] != 0x01:
             raise _convert_error(message)
 
+    def get_info(self):
+        """Get interface information."""
+        queries = self._get_supported_queries()
+
+        info = InterfaceInfo()
+
+        if InfoQuery.HARDWARE_TYPE in queries:
+            info.hardware_type = self._get_info_string(InfoQuery.HARDWARE_TYPE)
+
+        if InfoQuery.HARDWARE_REVISION in queries:
+            info.hardware_revision = self._get_info_string(InfoQuery.HARDWARE_REVISION)
+
+        if InfoQuery.HARDWARE_SERIAL in queries:
+            info.hardware_serial = self._get_info_string(InfoQuery.HARDWARE_SERIAL)
+
+        if InfoQuery.FIRMWARE_VERSION in queries:
+            info.firmware_version = self._get_info_string(InfoQuery.FIRMWARE_VERSION)
+
+        if InfoQuery.MESSAGE_BUFFER_SIZE in queries:
+            info.message_buffer_size = self._get_message_buffer_size()
+
+        if InfoQuery.FEATURES in queries:
+            info.features = self._get_features()
+
+        return info
+
+    def _get_supported_queries(self):
+        """Get supported interface information queries."""
+        message = self._query_info(InfoQuery.SUPPORTED_QUERIES)
+
+        known_query_values = {query.value for query in InfoQuery}
+
+        return {InfoQuery(value) for value in message if value in known_query_values}
+
     def _get_features(self):
         """Get interface features."""
-        message = bytes([0xf0, 0x07])
+        return _parse_features(self._query_info(InfoQuery.FEATURES))
 
-        self._write_message(message)
+    def _get_message_buffer_size(self):
+        """Get interface message buffer size."""
+        return _parse_message_buffer_size(self._query_info(InfoQuery.MESSAGE_BUFFER_SIZE))
+
+    def _get_info_string(self, query):
+        message = self._query_info(query)
+
+        return bytes(message).decode('ascii')
+
+    def _query_info(self, query):
+        self._write_message(bytes([0xf0, query.value]))
 
         message = self._read_message()
 
         if message[0] != 0x01:
             raise _convert_error(message)
 
-        known_feature_values = {feature.value for feature in InterfaceFeature}
+        return message[1:]
 
-        features = {InterfaceFeature(value) for value in message[1:] if value in known_feature_values}
+    def _transmit_receive(self, outbound_frames, response_lengths, timeout):
+        messages = self._pack_messages(outbound_frames, response_lengths, timeout)
 
-        return features
+        return self._transmit_receive_messages(messages)
 
-    def _transmit_receive(self, outbound_frames, response_lengths, timeout):
-        if len(response_lengths) != len(outbound_frames):
-            raise ValueError('Response lengths length must equal outbound frames length')
+    def _pack_prepared_command(self, address, command, timeout):
+        (outbound_frames, response_lengths) = super()._pack_prepared_command(address, command, timeout)
+
+        messages = self._pack_messages(outbound_frames, response_lengths, timeout)
 
-        if any(address is not None for (address, _) in outbound_frames) and InterfaceFeature.PROTOCOL_3299 not in self.features:
-            raise NotImplementedError('Interface does not support 3299 protocol')
+        return (messages, response_lengths)
 
-        # Pack all messages before sending.
-        timeout_milliseconds = self._calculate_timeout_milliseconds(timeout)
+    def _transmit_receive_prepared(self, packed_frames, response_lengths, timeout):
+        return self._transmit_receive_messages(packed_frames)
 
-        messages = [_pack_transmit_receive_message(address, frame, response_length, timeout_milliseconds)
-                    for ((address, frame), response_length) in zip(outbound_frames, response_lengths)]
+    def _pack_messages(self, outbound_frames, response_lengths, timeout):
+        timeout_milliseconds = _calculate_timeout_milliseconds(timeout, self.serial.timeout)
 
+        return _get_transmit_receive_messages(outbound_frames, response_lengths, timeout_milliseconds,
+                                              self.features)
+
+    def _transmit_receive_messages(self, messages):
         responses = []
 
-        for message in messages:
-            self._write_message(message)
+        # Sizes of messages that have been sent but not yet responded to.
+        in_flight = deque()
 
-            message = self._read_message()
+        try:
+            for message in messages:
+                while in_flight and not self._can_pipeline(in_flight, message):
+                    in_flight.popleft()
 
-            if message[0] == 0x01:
-                response = _unpack_transmit_receive_response(message[1:])
-            else:
-                error = _convert_error(message)
+                    responses.append(self._read_transmit_receive_response())
+
+                self._write_message(message)
+
+                in_flight.append(len(message) + 4)
 
-                if not isinstance(error, (ReceiveError, ReceiveTimeout)):
-                    raise error
+            while in_flight:
+                in_flight.popleft()
 
-                response = error
+                responses.append(self._read_transmit_receive_response())
+        except InterfaceTimeout:
+            # Consume the responses to messages still in flight, including the
+            # message whose response timed out as it may arrive late, so that
+            # they are not mistaken for responses to subsequent messages.
+            self._discard_responses(len(in_flight) + 1)
 
-            responses.append(response)
+            raise
+        except InterfaceError:
+            # Consume the responses to messages still in flight so that they are
+            # not mistaken for responses to subsequent messages.
+            self._discard_responses(len(in_flight))
+
+            raise
 
         return responses
 
-    def _calculate_timeout_milliseconds(self, timeout):
-        milliseconds = 0
+    def _can_pipeline(self, in_flight, message):
+        if len(in_flight) >= self.pipeline_depth:
+            return False
+
+        if self.message_buffer_size is not None and sum(in_flight) + len(message) + 4 > self.message_buffer_size:
+            return False
 
-        if timeout:
-            if self.serial.timeout and timeout > self.serial.timeout:
-                raise ValueError('Timeout cannot be greater than serial timeout')
+        return True
 
-            milliseconds = int(timeout * 1000)
+    def _read_transmit_receive_response(self):
+        return _get_transmit_receive_response(self._read_message())
 
-        return milliseconds
+    def _discard_responses(self, count):
+        for _ in range(count):
+            try:
+                self._read_message()
+            except (InterfaceError, InterfaceTimeout):
+                return
 
     def _read_message(self):
         try:
             message = self.slip_serial.recv_msg()
-        except ProtocolError:
+        except SlipError:
             raise InterfaceError('SLIP protocol error')
 
-        if len(message) < 4:
-            raise InterfaceError(f'Invalid response message: {message}')
-
-        (length,) = struct.unpack('>H', message[:2])
-
-        if length != len(message) - 4:
-            raise InterfaceError('Response message length mismatch')
-
-        if length < 1:
-            raise InterfaceError('Empty response message')
-
-        return message[2:-2]
+        return _unpack_message(message)
 
     def _write_message(self, message):
         self.slip_serial.send_msg(struct.pack('>H', len(message)) + message +
                                   struct.pack('>H', 0))
 
+class InfoQuery(Enum):
+    """Interface information query."""
+
+    SUPPORTED_QUERIES = 0x01
+    HARDWARE_TYPE = 0x02
+    HARDWARE_REVISION = 0x03
+    HARDWARE_SERIAL = 0x04
+    FIRMWARE_VERSION = 0x05
+    MESSAGE_BUFFER_SIZE = 0x06
+    FEATURES = 0x07
+
+class InterfaceInfo:
+    """Interface information."""
+
+    def __init__(self, hardware_type=None, hardware_revision=None, hardware_serial=None,
+                 firmware_version=None, message_buffer_size=None, features=None):
+        self.hardware_type = hardware_type
+        self.hardware_revision = hardware_revision
+        self.hardware_serial = hardware_serial
+        self.firmware_version = firmware_version
+        self.message_buffer_size = message_buffer_size
+        self.features = features
+
+    def __repr__(self):
+        return (f'<InterfaceInfo hardware_type={self.hardware_type}, '
+                f'hardware_revision={self.hardware_revision}, '
+                f'hardware_serial={self.hardware_serial}, '
+                f'firmware_version={self.firmware_version}, '
+                f'message_buffer_size={self.message_buffer_size}, '
+                f'features={self.features}>')
+
 @contextmanager
-def open_serial_interface(serial_port, reset=True):
+def open_serial_interface(serial_port, reset=True, pipeline_depth=1, startup_timeout=5):
     """Opens serial port and initializes serial attached 3270 coax interface."""
     with WindowsSafeSerial(serial_port, 115200) as serial:
         serial.reset_input_buffer()
         serial.reset_output_buffer()
 
-        # Allow the interface firmware time to start, this is only required for the
-        # original Arduino Mega based interface.
-        if 'COAX_FAST_START' not in os.environ:
-            time.sleep(3)
+        interface = SerialInterface(serial, pipeline_depth=pipeline_depth)
 
-        interface = SerialInterface(serial)
+        # Wait for the interface firmware to start, this is only required for the
+        # original Arduino Mega based interface which restarts when the serial
+        # port is opened - others will respond to the first probe.
+        if 'COAX_FAST_START' not in os.environ:
+            interface.wait_for_ready(startup_timeout)
 
         if reset:
             interface.reset()
 
-        yield interface
+        try:
+            yield interface
+        finally:
+            interface.stop_io_thread()
+
+# The number of bytes in a TRANSMIT_RECEIVE message other than the words; the
+# message length, command, repeat count and offset, response length, timeout
+# and footer.
+MESSAGE_OVERHEAD = 2 + 1 + 2 + 2 + 2 + 2
+
+# INFO SUPPORTED_QUERIES message, used to probe for a running firmware.
+_PROBE_MESSAGE = bytes([0xf0, InfoQuery.SUPPORTED_QUERIES.value])
+
+def _get_max_data_length(message_buffer_size):
+    if message_buffer_size is None:
+        return None
+
+    return (message_buffer_size - MESSAGE_OVERHEAD - 4) // 2
+
+def _parse_reset_response(message):
+    # Returns whether legacy firmware was detected, and the legacy firmware
+    # version.
+    if message[0] != 0x01:
+        raise _convert_error(message)
+
+    if message[1:] == b'\x32\x70':
+        return (False, None)
+
+    if len(message) == 4:
+        (major, minor, patch) = struct.unpack('BBB', message[1:])
+
+        return (True, f'{major}.{minor}.{patch}')
+
+    raise InterfaceError(f'Invalid reset response: {bytes(message)}')
+
+def _parse_features(message):
+    known_feature_values = {feature.value for feature in InterfaceFeature}
+
+    return {InterfaceFeature(value) for value in message if value in known_feature_values}
+
+def _parse_message_buffer_size(message):
+    if len(message) != 4:
+        raise InterfaceError(f'Invalid message buffer size response: {bytes(message)}')
+
+    (size,) = struct.unpack('>I', message)
+
+    return size
+
+def _unpack_message(message):
+    if len(message) < 4:
+        raise InterfaceError(f'Invalid response message: {message}')
+
+    (length,) = struct.unpack('>H', message[:2])
+
+    if length != len(message) - 4:
+        raise InterfaceError('Response message length mismatch')
+
+    if length < 1:
+        raise InterfaceError('Empty response message')
+
+    return memoryview(message)[2:-2]
+
+def _calculate_timeout_milliseconds(timeout, max_timeout):
+    milliseconds = 0
+
+    if timeout:
+        if max_timeout and timeout > max_timeout:
+            raise ValueError('Timeout cannot be greater than interface timeout')
+
+        milliseconds = int(timeout * 1000)
+
+    return milliseconds
+
+def _get_transmit_receive_messages(outbound_frames, response_lengths, timeout_milliseconds, features):
+    if len(response_lengths) != len(outbound_frames):
+        raise ValueError('Response lengths length must equal outbound frames length')
+
+    if any(address is not None for (address, _) in outbound_frames) and InterfaceFeature.PROTOCOL_3299 not in features:
+        raise NotImplementedError('Interface does not support 3299 protocol')
+
+    # Pack all messages before sending.
+    return [_get_transmit_receive_message(address, frame, response_length, timeout_milliseconds)
+            for ((address, frame), response_length) in zip(outbound_frames, response_lengths)]
+
+def _get_transmit_receive_response(message):
+    if message[0] == 0x01:
+        return _unpack_transmit_receive_response(message[1:])
+
+    error = _convert_error(message)
+
+    if not isinstance(error, (ReceiveError, ReceiveTimeout)):
+        raise error
+
+    return error
+
+# Packed messages for frames without data, such as POLL, keyed by address,
+# frame, response length and timeout.
+_MESSAGE_CACHE = {}
+_MESSAGE_CACHE_MAX_SIZE = 1024
+
+def _get_transmit_receive_message(address, frame, response_length, timeout_milliseconds):
+    if len(frame) != 2 or frame[0] != FrameFormat.WORD_DATA:
+        return _pack_transmit_receive_message(address, frame, response_length, timeout_milliseconds)
+
+    key = (address, frame[1], response_length, timeout_milliseconds)
+
+    message = _MESSAGE_CACHE.get(key)
+
+    if message is None:
+        message = bytes(_pack_transmit_receive_message(address, frame, response_length, timeout_milliseconds))
+
+        if len(_MESSAGE_CACHE) >= _MESSAGE_CACHE_MAX_SIZE:
+            _MESSAGE_CACHE.clear()
+
+        _MESSAGE_CACHE[key] = message
+
+    return message
 
 def _pack_transmit_receive_message(address, frame, response_length, timeout_milliseconds):
     # Convert the three frame formats to a simple list of 10-bit words with
     # a repeat count and offset.
     (words, repeat_count, repeat_offset) = normalize_frame(address, frame)
 
-    message = bytes([0x06])
+    # Set the 3299 mode flag.
+    if address is not None:
+        words[0] |= 0x8000
+
+    # The message is packed into a single preallocated buffer, consisting of
+    # the command, repeat count and offset, words, response length and timeout.
+    words_end = 3 + (len(words) * 2)
+
+    message = bytearray(words_end + 4)
 
     # NOTE: Although the frame normalization routine may result in a repeat
     # offset greater than 1 if an addressed WORD_DATA frame has a repeat
@@ -196,21 +482,26 @@ def _pack_transmit_receive_message(address, frame, response_length, timeout_mill
     # unsigned short field here. Today, oec does not use a repeat with an
     # addressed WORD_DATA frame as the "jumbo write" function will always
     # expand addressed frames.
-    message += struct.pack('>H', (repeat_offset << 15) | repeat_count)
+    struct.pack_into('>BH', message, 0, 0x06, (repeat_offset << 15) | repeat_count)
 
-    # Set the 3299 mode flag.
-    if address is not None:
-        words[0] |= 0x8000
+    struct.pack_into(f'<{len(words)}H', message, 3, *words)
 
-    for word in words:
-        message += struct.pack('<H', word)
-
-    message += struct.pack('>HH', response_length, timeout_milliseconds)
+    struct.pack_into('>HH', message, words_end, response_length, timeout_milliseconds)
 
     return message
 
 def _unpack_transmit_receive_response(bytes_):
-    return [(hi << 8) | lo for (lo, hi) in zip(bytes_[::2], bytes_[1::2])]
+    # Cast the little-endian words directly, ignoring any trailing odd byte.
+    view = memoryview(bytes_)[:len(bytes_) & ~1]
+
+    if sys.byteorder == 'little':
+        return view.cast('H').tolist()
+
+    words = array('H', bytes(view))
+
+    words.byteswap()
+
+    return words.tolist()
 
 ERROR_MAP = {
     1: InterfaceError('Invalid request message'),
@@ -224,17 +515,17 @@ ERROR_MAP = {
 
 def _convert_error(message):
     if message[0] != 0x02:
-        return InterfaceError(f'Invalid response: {message}')
+        return InterfaceError(f'Invalid response: {bytes(message)}')
 
     if len(message) < 2:
-        return InterfaceError(f'Invalid error response: {message}')
+        return InterfaceError(f'Invalid error response: {bytes(message)}')
 
     if message[1] in ERROR_MAP:
         error = copy(ERROR_MAP[message[1]])
 
         # Append description if included.
         if len(message) > 2:
-            description = message[2:].decode('ascii')
+            description = bytes(message[2:]).decode('ascii')
 
             if error.args:
                 error.args = (f'{error.args[0]}: {description}', *error.args[1:])
@@ -245,8 +536,40 @@ def _convert_error(message):
 
     return InterfaceError(f'Unknown error: {message[1]}')
 
-class SlipSerial(SlipWrapper):
-    """sliplib wrapper for pySerial."""
+class SlipSerial:
+    """SLIP message transport for pySerial."""
+
+    def __init__(self, stream):
+        self.stream = stream
+
+        self._decoder = SlipDecoder()
+        self._messages = deque()
+
+    def send_msg(self, message):
+        """Send a message over the serial port."""
+        self.send_bytes(encode(message))
+
+    def recv_msg(self):
+        """Receive a message from the serial port."""
+        while not self._messages:
+            data = self.recv_bytes()
+
+            if not data:
+                return b''
+
+            self._messages.extend(self._decoder.decode(data))
+
+        message = self._messages.popleft()
+
+        if isinstance(message, SlipError):
+            raise message
+
+        return message
+
+    def reset(self):
+        """Discard any partially received or unread messages."""
+        self._decoder.reset()
+        self._messages.clear()
 
     def send_bytes(self, packet):
         """Sends a packet over the serial port."""
@@ -0,0 +1,78 @@
+"""
+coax.slip
+~~~~~~~~~
+
+SLIP message encoding and incremental decoding
+"""
+
+END = b'\xc0'
+ESC = b'\xdb'
+ESC_END = b'\xdc'
+ESC_ESC = b'\xdd'
+
+class SlipError(Exception):
+    """A SLIP protocol error occurred."""
+
+def encode(message):
+    """Encode a message into a SLIP packet."""
+    return END + message.replace(ESC, ESC + ESC_ESC).replace(END, ESC + ESC_END) + END
+
+def decode(packet):
+    """Decode a SLIP packet, without END delimiters, into a message."""
+    escape_count = packet.count(ESC)
+
+    if escape_count == 0:
+        return packet
+
+    if escape_count != packet.count(ESC + ESC_END) + packet.count(ESC + ESC_ESC):
+        raise SlipError(f'Invalid escape sequence: {packet}')
+
+    return packet.replace(ESC + ESC_END, END).replace(ESC + ESC_ESC, ESC)
+
+class SlipDecoder:
+    """Incremental SLIP decoder."""
+
+    def __init__(self):
+        self._buffer = bytearray()
+
+    def reset(self):
+        """Discard any partially received packet."""
+        self._buffer.clear()
+
+    def decode(self, data):
+        """Decode received data, returning a list of complete messages.
+
+        Invalid packets are returned as a SlipError in place of the message.
+        """
+        buffer = self._buffer
+
+        # Only the new data needs to be searched for END, the existing buffer
+        # is known to be a partial packet.
+        start = len(buffer)
+
+        buffer += data
+
+        index = buffer.find(END, start)
+
+        if index == -1:
+            return []
+
+        messages = []
+        position = 0
+
+        with memoryview(buffer) as view:
+            while index != -1:
+                # Consecutive END bytes delimit empty packets, which are ignored.
+                if index > position:
+                    try:
+                        messages.append(decode(bytes(view[position:index])))
+                    except SlipError as error:
+                        messages.append(error)
+
+                position = index + 1
+
+                index = buffer.find(END, position)
+
+        del buffer[:position]
+
+        return messages
@@ -0,0 +1,56 @@
+"""
+coax.status
+~~~~~~~~~~~
+"""
+
+import time
+
+from .protocol import ReadStatus
+from .exceptions import StatusTimeout
+
+def wait_for_status(interface, predicate=None, timeout=1, address=None, max_batch_size=8,
+                    max_interval=0.05):
+    """Wait for the terminal status to satisfy a predicate, by default not busy.
+
+    READ_STATUS commands are executed in batches that double in size up to
+    max_batch_size, then with an interval between batches that doubles up to
+    max_interval. Returns the status and the number of READ_STATUS commands
+    executed, or raises StatusTimeout if the timeout expires.
+    """
+    if predicate is None:
+        predicate = _is_not_busy
+
+    deadline = time.monotonic() + timeout
+
+    batch_size = 1
+    interval = 0.001
+
+    count = 0
+
+    while True:
+        responses = interface.execute([(address, ReadStatus())] * batch_size)
+
+        count += batch_size
+
+        for status in responses:
+            if isinstance(status, BaseException):
+                raise status
+
+            if predicate(status):
+                return (status, count)
+
+        remaining = deadline - time.monotonic()
+
+        if remaining <= 0:
+            raise StatusTimeout(f'Status not reached after {count} READ_STATUS commands: {status}',
+                                status, count)
+
+        if batch_size < max_batch_size:
+            batch_size = min(batch_size * 2, max_batch_size)
+        else:
+            time.sleep(min(interval, remaining))
+
+            interval = min(interval * 2, max_interval)
+
+def _is_not_busy(status):
+    return not status.busy
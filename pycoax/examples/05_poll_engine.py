@@ -0,0 +1,21 @@
+#!/usr/bin/env python
+
+from queue import Queue
+
+from common import open_example_serial_interface
+
+from coax import PollEngine
+
+with open_example_serial_interface() as interface:
+    events = Queue()
+
+    with PollEngine(interface, queue=events):
+        print('Press keys on the terminal, CTRL+C to exit...')
+
+        try:
+            while True:
+                event = events.get()
+
+                print(event)
+        except KeyboardInterrupt:
+            pass
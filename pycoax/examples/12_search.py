@@ -2,7 +2,7 @@
 
 from common import open_example_serial_interface
 
-from coax import ReadAddressCounterHi, ReadAddressCounterLo, ReadStatus, LoadAddressCounterHi, LoadAddressCounterLo, WriteData, LoadMask, SearchForward, SearchBackward
+from coax import ReadAddressCounterHi, ReadAddressCounterLo, LoadAddressCounterHi, LoadAddressCounterLo, WriteData, LoadMask, SearchForward, SearchBackward, wait_for_status
 
 with open_example_serial_interface() as interface:
     interface.execute([LoadAddressCounterHi(0), LoadAddressCounterLo(80)])
@@ -15,14 +15,9 @@ with open_example_serial_interface() as interface:
 
     interface.execute(SearchForward(0x83))
 
-    status = interface.execute(ReadStatus())
+    (status, count) = wait_for_status(interface)
 
-    print(status)
-
-    while status.busy:
-        status = interface.execute(ReadStatus())
-
-        print(status)
+    print(f'{status} after {count} READ_STATUS commands')
 
     [hi, lo] = interface.execute([ReadAddressCounterHi(), ReadAddressCounterLo()])
 
@@ -30,14 +25,9 @@ with open_example_serial_interface() as interface:
 
     interface.execute(SearchBackward(0x84))
 
-    status = interface.execute(ReadStatus())
-
-    print(status)
+    (status, count) = wait_for_status(interface)
 
-    while status.busy:
-        status = interface.execute(ReadStatus())
-
-        print(status)
+    print(f'{status} after {count} READ_STATUS commands')
 
     [hi, lo] = interface.execute([ReadAddressCounterHi(), ReadAddressCounterLo()])
 
@@ -47,14 +37,9 @@ with open_example_serial_interface() as interface:
 
     interface.execute(SearchForward(0x30))
 
-    status = interface.execute(ReadStatus())
-
-    print(status)
-
-    while status.busy:
-        status = interface.execute(ReadStatus())
+    (status, count) = wait_for_status(interface)
 
-        print(status)
+    print(f'{status} after {count} READ_STATUS commands')
 
     [hi, lo] = interface.execute([ReadAddressCounterHi(), ReadAddressCounterLo()])
 
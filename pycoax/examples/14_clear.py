@@ -2,20 +2,15 @@
 
 from common import open_example_serial_interface
 
-from coax import ReadAddressCounterHi, ReadAddressCounterLo, ReadStatus, LoadAddressCounterHi, LoadAddressCounterLo, WriteData, LoadMask, Clear
+from coax import ReadAddressCounterHi, ReadAddressCounterLo, LoadAddressCounterHi, LoadAddressCounterLo, WriteData, LoadMask, Clear, wait_for_status
 
 with open_example_serial_interface() as interface:
     # Clear the entire screen, except status line.
     interface.execute([LoadAddressCounterHi(0), LoadAddressCounterLo(80), LoadMask(0x00), Clear(0x00)])
 
-    status = interface.execute(ReadStatus())
+    (status, count) = wait_for_status(interface)
 
-    print(status)
-
-    while status.busy:
-        status = interface.execute(ReadStatus())
-
-        print(status)
+    print(f'{status} after {count} READ_STATUS commands')
 
     input('Press ENTER...')
 
@@ -28,14 +23,9 @@ with open_example_serial_interface() as interface:
 
     interface.execute([LoadAddressCounterHi(0), LoadAddressCounterLo(81), LoadMask(0xf0), Clear(0x30)])
 
-    status = interface.execute(ReadStatus())
-
-    print(status)
-
-    while status.busy:
-        status = interface.execute(ReadStatus())
+    (status, count) = wait_for_status(interface)
 
-        print(status)
+    print(f'{status} after {count} READ_STATUS commands')
 
     [hi, lo] = interface.execute([ReadAddressCounterHi(), ReadAddressCounterLo()])
 
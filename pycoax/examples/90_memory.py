@@ -0,0 +1,46 @@
+#!/usr/bin/env python
+
+# Measures the memory allocated per command and response object, compared to
+# equivalent objects with an instance dictionary. No interface is required.
+
+import sys
+import tracemalloc
+
+sys.path.append('..')
+
+from coax.protocol import Poll, PollAck, ReadStatus, WriteData, Status, TerminalId, KeystrokePollResponse, \
+                          Control
+
+COUNT = 10000
+
+FACTORIES = [
+    (Poll, ()),
+    (PollAck, ()),
+    (ReadStatus, ()),
+    (WriteData, (b'\x00',)),
+    (Status, (0x20,)),
+    (TerminalId, (0b00000100,)),
+    (KeystrokePollResponse, (0b0101_0000_10,)),
+    (Control, ())
+]
+
+def with_dictionary(class_):
+    # A subclass without __slots__ has an instance dictionary.
+    return type(class_.__name__, (class_,), {})
+
+def measure(factories):
+    tracemalloc.start()
+
+    objects = [class_(*args) for (class_, args) in factories for _ in range(COUNT)]
+
+    (size, _) = tracemalloc.get_traced_memory()
+
+    tracemalloc.stop()
+
+    return (size / len(objects), objects)
+
+(slots_size, _) = measure(FACTORIES)
+(dictionary_size, _) = measure([(with_dictionary(class_), args) for (class_, args) in FACTORIES])
+
+print(f'With instance dictionary: {dictionary_size:.0f} bytes per object')
+print(f'With __slots__:           {slots_size:.0f} bytes per object')
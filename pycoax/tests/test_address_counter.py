@@ -0,0 +1,220 @@
+import unittest
+from unittest.mock import Mock
+
+import context
+
+from coax.protocol import Control, Poll, ReadAddressCounterHi, ReadAddressCounterLo, ReadMultiple, LoadControlRegister, LoadAddressCounterHi, LoadAddressCounterLo, WriteData, Clear
+from coax.address_counter import AddressCounterSession
+from coax.exceptions import InterfaceError, ReceiveTimeout
+
+class AddressCounterSessionTestCase(unittest.TestCase):
+    def setUp(self):
+        self.interface = Mock()
+
+        self.interface.execute = Mock(side_effect=lambda commands, timeout: [None] * len(commands))
+
+        self.session = AddressCounterSession(self.interface)
+
+    def get_executed_commands(self):
+        return [command for (_, command) in self.interface.execute.call_args[0][0]]
+
+    def test_loads_are_executed_when_unknown(self):
+        # Act
+        responses = self.session.execute([LoadAddressCounterHi(0), LoadAddressCounterLo(80)])
+
+        # Assert
+        self.assertEqual(responses, [None, None])
+        self.assertEqual(len(self.get_executed_commands()), 2)
+        self.assertEqual(self.session.address_counter, 80)
+
+    def test_sequential_writes(self):
+        # Arrange
+        self.session.execute([LoadAddressCounterHi(0), LoadAddressCounterLo(80), WriteData(bytes(80))])
+
+        # Act
+        responses = self.session.execute([LoadAddressCounterHi(0), LoadAddressCounterLo(160), WriteData(bytes(80))])
+
+        # Assert
+        self.assertEqual(responses, [None, None, None])
+        self.assertEqual([type(command) for command in self.get_executed_commands()], [WriteData])
+        self.assertEqual(self.session.address_counter, 240)
+        self.assertEqual(self.session.dropped_count, 2)
+
+    def test_write_carries_to_hi(self):
+        # Arrange
+        self.session.execute([LoadAddressCounterHi(0), LoadAddressCounterLo(240), WriteData(bytes(80))])
+
+        # Act
+        self.session.execute([LoadAddressCounterHi(1), LoadAddressCounterLo(64)])
+
+        # Assert
+        self.interface.execute.assert_called_once()
+        self.assertEqual(self.session.address_counter, 320)
+
+    def test_repeated_write(self):
+        # Act
+        self.session.execute([LoadAddressCounterHi(0), LoadAddressCounterLo(0), WriteData((b'\x00', 80))])
+
+        # Assert
+        self.assertEqual(self.session.address_counter, 80)
+
+    def test_loads_after_write_in_same_batch_are_executed(self):
+        # Act
+        self.session.execute([LoadAddressCounterHi(0), LoadAddressCounterLo(80), WriteData(bytes(80)), LoadAddressCounterHi(0), LoadAddressCounterLo(160)])
+
+        # Assert
+        self.assertEqual(len(self.get_executed_commands()), 5)
+
+    def test_duplicate_loads_in_same_batch_are_dropped(self):
+        # Act
+        self.session.execute([LoadAddressCounterHi(0), LoadAddressCounterLo(80), LoadAddressCounterHi(0)])
+
+        # Assert
+        self.assertEqual(len(self.get_executed_commands()), 2)
+
+    def test_step_inhibit(self):
+        # Arrange
+        self.session.execute([LoadControlRegister(Control(step_inhibit=True)), LoadAddressCounterHi(0), LoadAddressCounterLo(80), WriteData(bytes(80))])
+
+        # Act
+        self.session.execute([LoadAddressCounterHi(0), LoadAddressCounterLo(80)])
+
+        # Assert
+        self.interface.execute.assert_called_once()
+        self.assertEqual(self.session.address_counter, 80)
+
+    def test_unknown_step_inhibit(self):
+        # Arrange
+        session = AddressCounterSession(self.interface, step_inhibit=None)
+
+        # Act
+        session.execute([LoadAddressCounterHi(0), LoadAddressCounterLo(80), WriteData(bytes(80))])
+
+        # Assert
+        self.assertIsNone(session.address_counter)
+
+    def test_read_multiple(self):
+        # Arrange
+        self.interface.execute.side_effect = lambda commands, timeout: [None, None, bytes(16)]
+
+        # Act
+        self.session.execute([LoadAddressCounterHi(0), LoadAddressCounterLo(80), ReadMultiple()])
+
+        # Assert
+        self.assertEqual(self.session.address_counter, 96)
+
+    def test_read_address_counter(self):
+        # Arrange
+        self.interface.execute.side_effect = lambda commands, timeout: [1, 64]
+
+        # Act
+        self.session.execute([ReadAddressCounterHi(), ReadAddressCounterLo()])
+
+        # Assert
+        self.assertEqual(self.session.address_counter, 320)
+
+    def test_unchanged_command(self):
+        # Arrange
+        self.session.execute([LoadAddressCounterHi(0), LoadAddressCounterLo(80)])
+
+        # Act
+        self.session.execute(Poll())
+
+        # Assert
+        self.assertEqual(self.session.address_counter, 80)
+
+    def test_unknown_command(self):
+        # Arrange
+        self.session.execute([LoadAddressCounterHi(0), LoadAddressCounterLo(80)])
+
+        # Act
+        self.session.execute(Clear(0x00))
+
+        # Assert
+        self.assertIsNone(self.session.address_counter)
+
+    def test_error_response(self):
+        # Arrange
+        self.interface.execute.side_effect = lambda commands, timeout: [None, None, ReceiveTimeout()]
+
+        # Act
+        responses = self.session.execute([LoadAddressCounterHi(0), LoadAddressCounterLo(80), WriteData(bytes(80))])
+
+        # Assert
+        self.assertIsInstance(responses[2], ReceiveTimeout)
+        self.assertIsNone(self.session.address_counter)
+
+    def test_error_response_single_command(self):
+        # Arrange
+        self.interface.execute.side_effect = lambda commands, timeout: [ReceiveTimeout()]
+
+        # Act and assert
+        with self.assertRaises(ReceiveTimeout):
+            self.session.execute(Poll())
+
+    def test_interface_error(self):
+        # Arrange
+        self.session.execute([LoadAddressCounterHi(0), LoadAddressCounterLo(80)])
+
+        self.interface.execute.side_effect = InterfaceError()
+
+        # Act and assert
+        with self.assertRaises(InterfaceError):
+            self.session.execute(WriteData(bytes(80)))
+
+        self.assertIsNone(self.session.address_counter)
+
+    def test_all_commands_dropped(self):
+        # Arrange
+        self.session.execute([LoadAddressCounterHi(0), LoadAddressCounterLo(80)])
+
+        # Act
+        response = self.session.execute(LoadAddressCounterLo(80))
+
+        # Assert
+        self.assertIsNone(response)
+        self.interface.execute.assert_called_once()
+
+    def test_tuple(self):
+        # Act
+        responses = self.session.execute((LoadAddressCounterHi(0), LoadAddressCounterLo(80)))
+
+        # Assert
+        self.assertEqual(responses, [None, None])
+        self.assertEqual(self.session.address_counter, 80)
+
+    def test_generator(self):
+        # Act
+        responses = self.session.execute(LoadAddressCounterLo(address) for address in [80, 160])
+
+        # Assert
+        self.assertEqual(responses, [None, None])
+
+    def test_addressed_command(self):
+        # Arrange
+        session = AddressCounterSession(self.interface, address=0b111000)
+
+        # Act
+        response = session.execute((0b111000, LoadAddressCounterLo(80)))
+
+        # Assert
+        self.assertIsNone(response)
+
+        self.interface.execute.assert_called_once_with([(0b111000, unittest.mock.ANY)], None)
+
+    def test_addressed_command_for_other_address(self):
+        with self.assertRaises(ValueError):
+            self.session.execute((0b111000, LoadAddressCounterLo(80)))
+
+    def test_address(self):
+        # Arrange
+        session = AddressCounterSession(self.interface, address=0b111000)
+
+        # Act
+        session.execute(Poll())
+
+        # Assert
+        self.interface.execute.assert_called_once_with([(0b111000, unittest.mock.ANY)], None)
+
+if __name__ == '__main__':
+    unittest.main()
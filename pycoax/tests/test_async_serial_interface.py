@@ -0,0 +1,430 @@
+import unittest
+import asyncio
+from unittest.mock import Mock, AsyncMock, create_autospec
+from serial import Serial, SerialException
+
+import context
+
+from coax.interface import InterfaceFeature
+from coax.protocol import Poll, PollAck, ReadAddressCounterHi, ReadAddressCounterLo, KeystrokePollResponse
+from coax.async_serial_interface import AsyncSerialInterface
+from coax.exceptions import InterfaceError, InterfaceTimeout, ReceiveTimeout
+
+class AsyncSerialInterfaceResetTestCase(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.serial = create_autospec(Serial, instance=True)
+
+        self.interface = AsyncSerialInterface(self.serial)
+
+        self.interface._loop = asyncio.get_running_loop()
+        self.interface._lock = asyncio.Lock()
+
+        self.interface._write_message = Mock()
+        self.interface._read_message = AsyncMock(side_effect=[bytes.fromhex('01 32 70'), bytes.fromhex('01 10'), bytes.fromhex('01 00 00 39 e2')])
+
+    async def test_non_legacy_response_is_handled_correctly(self):
+        # Act
+        await self.interface.reset()
+
+        # Assert
+        self.interface._write_message.assert_any_call(bytes.fromhex('01'))
+
+        self.assertFalse(self.interface.legacy_firmware_detected)
+        self.assertEqual(self.interface.features, {InterfaceFeature.PROTOCOL_3299})
+        self.assertEqual(self.interface.message_buffer_size, 14818)
+        self.assertEqual(self.interface.max_data_length, 7401)
+
+    async def test_message_buffer_size_query_error_is_ignored(self):
+        # Arrange
+        self.interface._read_message.side_effect=[bytes.fromhex('01 32 70'), bytes.fromhex('01 10'), bytes.fromhex('02 02')]
+
+        # Act
+        await self.interface.reset()
+
+        # Assert
+        self.assertIsNone(self.interface.message_buffer_size)
+
+    async def test_legacy_response_is_handled_correctly(self):
+        # Arrange
+        self.interface._read_message.side_effect=[bytes.fromhex('01 01 02 03')]
+
+        # Act
+        await self.interface.reset()
+
+        # Assert
+        self.assertTrue(self.interface.legacy_firmware_detected)
+        self.assertEqual(self.interface.legacy_firmware_version, '1.2.3')
+
+    async def test_error_is_handled_correctly(self):
+        # Arrange
+        self.interface._read_message.side_effect=[bytes.fromhex('02 01')]
+
+        # Act and assert
+        with self.assertRaisesRegex(InterfaceError, 'Invalid request message'):
+            await self.interface.reset()
+
+class AsyncSerialInterfaceWaitForReadyTestCase(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.serial = create_autospec(Serial, instance=True)
+
+        self.interface = AsyncSerialInterface(self.serial)
+
+        self.interface._loop = asyncio.get_running_loop()
+        self.interface._lock = asyncio.Lock()
+
+        self.interface._write_message = Mock()
+        self.interface._read_message = AsyncMock()
+
+    async def test_first_probe_response(self):
+        # Arrange
+        self.interface._read_message.side_effect=[bytes.fromhex('01 01 02 03 04 05 06 07')]
+
+        # Act
+        await self.interface.wait_for_ready()
+
+        # Assert
+        self.interface._write_message.assert_called_once_with(bytes.fromhex('f0 01'))
+
+    async def test_legacy_error_response(self):
+        # Arrange
+        self.interface._read_message.side_effect=[InterfaceTimeout(), bytes.fromhex('02 02'), InterfaceTimeout()]
+
+        # Act
+        await self.interface.wait_for_ready()
+
+        # Assert
+        self.assertEqual(self.interface._write_message.call_count, 2)
+        self.assertEqual(self.interface._read_message.call_count, 3)
+
+    async def test_timeout(self):
+        # Arrange
+        self.interface._read_message.side_effect=InterfaceTimeout()
+
+        # Act and assert
+        with self.assertRaises(InterfaceTimeout):
+            await self.interface.wait_for_ready(timeout=0.1)
+
+class AsyncSerialInterfaceExecuteTestCase(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.serial = create_autospec(Serial, instance=True)
+
+        self.interface = AsyncSerialInterface(self.serial)
+
+        self.interface._loop = asyncio.get_running_loop()
+        self.interface._lock = asyncio.Lock()
+
+        self.interface._write_message = Mock()
+        self.interface._read_message = AsyncMock()
+
+    async def test_single_command(self):
+        # Arrange
+        self.interface._read_message.side_effect=[bytes.fromhex('01 08 00')]
+
+        # Act
+        response = await self.interface.execute(ReadAddressCounterHi())
+
+        # Assert
+        self.assertEqual(response, 0x02)
+
+        self.interface._write_message.assert_called_with(bytes.fromhex('06 00 00 15 00 00 01 00 00'))
+
+    async def test_multiple_commands(self):
+        # Arrange
+        self.interface._read_message.side_effect=[bytes.fromhex('01 08 00'), bytes.fromhex('02 66')]
+
+        # Act
+        responses = await self.interface.execute([ReadAddressCounterHi(), ReadAddressCounterLo()], timeout=0.5)
+
+        # Assert
+        self.assertEqual(responses[0], 0x02)
+        self.assertIsInstance(responses[1], ReceiveTimeout)
+
+        self.interface._write_message.assert_called_with(bytes.fromhex('06 00 00 55 00 00 01 01 f4'))
+
+    async def test_single_command_receive_timeout(self):
+        # Arrange
+        self.interface._read_message.side_effect=[bytes.fromhex('02 66')]
+
+        # Act and assert
+        with self.assertRaises(ReceiveTimeout):
+            await self.interface.execute(ReadAddressCounterHi())
+
+    async def test_interface_error(self):
+        # Arrange
+        self.interface._read_message.side_effect=[bytes.fromhex('02 65')]
+
+        # Act and assert
+        with self.assertRaises(InterfaceError):
+            await self.interface.execute([ReadAddressCounterHi(), ReadAddressCounterLo()])
+
+class AsyncSerialInterfaceEventsTestCase(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.serial = create_autospec(Serial, instance=True)
+
+        self.interface = AsyncSerialInterface(self.serial)
+
+        self.interface.execute = AsyncMock(return_value=[None])
+
+    async def test_events(self):
+        # Arrange
+        self.interface.execute.side_effect = [[None], [KeystrokePollResponse(0b0101_0000_10)],
+                                              [None, KeystrokePollResponse(0b0101_0001_10)],
+                                              [None, None]] + [[None]] * 100
+
+        events = self.interface.events(min_interval=0.001, max_interval=0.001)
+
+        # Act
+        first_event = await events.__anext__()
+        second_event = await events.__anext__()
+
+        await events.aclose()
+
+        # Assert
+        self.assertEqual(first_event.response.scan_code, 0b0101_0000)
+        self.assertEqual(second_event.response.scan_code, 0b0101_0001)
+
+        commands = [[type(command) for (_, command) in call[0][0]] for call in self.interface.execute.call_args_list[:3]]
+
+        self.assertEqual(commands, [[Poll], [Poll], [PollAck, Poll]])
+
+    async def test_backpressure(self):
+        # Arrange
+        self.interface.execute.return_value = [KeystrokePollResponse(0b0101_0000_10)]
+
+        events = self.interface.events(min_interval=0.001, max_interval=0.001, max_events=2)
+
+        # Act
+        await events.__anext__()
+
+        await asyncio.sleep(0.05)
+
+        # Assert
+        self.assertEqual(self.interface.execute.call_count, 4)
+
+        await events.aclose()
+
+    async def test_polling_stops_when_closed(self):
+        # Arrange
+        self.interface.execute.return_value = [KeystrokePollResponse(0b0101_0000_10)]
+
+        events = self.interface.events(min_interval=0.001, max_interval=0.001)
+
+        async for _ in events:
+            break
+
+        # Act
+        await events.aclose()
+
+        call_count = self.interface.execute.call_count
+
+        await asyncio.sleep(0.02)
+
+        # Assert
+        self.assertEqual(self.interface.execute.call_count, call_count)
+
+    async def test_interface_error(self):
+        # Arrange
+        self.interface.execute.side_effect = InterfaceError()
+
+        # Act and assert
+        with self.assertRaises(InterfaceError):
+            async for _ in self.interface.events():
+                pass
+
+class AsyncSerialInterfaceReadMessageTestCase(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.serial = create_autospec(Serial, instance=True)
+
+        self.serial.in_waiting = 0
+
+        self.interface = AsyncSerialInterface(self.serial)
+
+        self.interface._loop = asyncio.get_running_loop()
+        self.interface._lock = asyncio.Lock()
+
+    async def test(self):
+        # Arrange
+        self.serial.read.return_value = bytes.fromhex('c0 00 04 01 02 03 04 00 00 c0')
+
+        self.interface._handle_readable()
+
+        # Act
+        message = await self.interface._read_message()
+
+        # Assert
+        self.assertEqual(message, bytes.fromhex('01 02 03 04'))
+
+    async def test_timeout(self):
+        # Act and assert
+        with self.assertRaises(InterfaceTimeout):
+            await self.interface._read_message(timeout=0.01)
+
+    async def test_protocol_error_is_handled_correctly(self):
+        # Arrange
+        self.serial.read.return_value = bytes.fromhex('c0 db 00 c0')
+
+        self.interface._handle_readable()
+
+        # Act and assert
+        with self.assertRaisesRegex(InterfaceError, 'SLIP protocol error'):
+            await self.interface._read_message()
+
+    async def test_message_length_mismatch_is_handled_correctly(self):
+        # Arrange
+        self.serial.read.return_value = bytes.fromhex('c0 00 05 01 02 03 04 00 00 c0')
+
+        self.interface._handle_readable()
+
+        # Act and assert
+        with self.assertRaisesRegex(InterfaceError, 'Response message length mismatch'):
+            await self.interface._read_message()
+
+class AsyncSerialInterfaceWriteMessageTestCase(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.serial = create_autospec(Serial, instance=True)
+
+        self.serial.fileno.return_value = 3
+
+        self.interface = AsyncSerialInterface(self.serial)
+
+        self.interface._loop = Mock()
+
+    async def test(self):
+        # Arrange
+        self.serial.write.side_effect = lambda data: len(data)
+
+        # Act
+        self.interface._write_message(bytes.fromhex('01'))
+
+        # Assert
+        self.serial.write.assert_called_once_with(bytearray.fromhex('c0 00 01 01 00 00 c0'))
+        self.serial.flush.assert_not_called()
+
+        self.interface._loop.add_writer.assert_not_called()
+
+    async def test_partial_write(self):
+        # Arrange
+        self.serial.write.side_effect = [3, 0, 4]
+
+        # Act
+        self.interface._write_message(bytes.fromhex('01'))
+
+        # Assert
+        self.interface._loop.add_writer.assert_called_once_with(3, self.interface._handle_writable)
+
+        # Act
+        self.interface._handle_writable()
+
+        # Assert
+        self.interface._loop.remove_writer.assert_not_called()
+
+        # Act
+        self.interface._handle_writable()
+
+        # Assert
+        self.assertEqual(self.serial.write.call_args_list[2][0][0], bytearray.fromhex('01 00 00 c0'))
+
+        self.interface._loop.remove_writer.assert_called_once_with(3)
+
+class AsyncSerialInterfaceTransmitReceiveTestCase(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.serial = create_autospec(Serial, instance=True)
+
+        self.serial.fileno.return_value = 3
+        self.serial.in_waiting = 0
+        self.serial.write.side_effect = self._write
+
+        self.interface = AsyncSerialInterface(self.serial)
+
+        self.interface.timeout = 0.05
+
+        self.interface._loop = asyncio.get_running_loop()
+        self.interface._lock = asyncio.Lock()
+
+        # Response for each message written, or None if there is no response.
+        self.responses = []
+
+    async def test_interface_timeout_late_response_is_discarded(self):
+        # Arrange
+        self.responses = [None, bytes.fromhex('c0 00 03 01 0c 00 00 00 c0')]
+
+        with self.assertRaises(InterfaceTimeout):
+            await self.interface.execute(ReadAddressCounterHi())
+
+        self._receive(bytes.fromhex('c0 00 03 01 08 00 00 00 c0'))
+
+        # Act
+        response = await self.interface.execute(ReadAddressCounterLo())
+
+        # Assert
+        self.assertEqual(response, 0x03)
+
+    async def test_interface_timeout_lost_response(self):
+        # Arrange
+        self.responses = [None, bytes.fromhex('c0 00 03 01 0c 00 00 00 c0')]
+
+        with self.assertRaises(InterfaceTimeout):
+            await self.interface.execute(ReadAddressCounterHi())
+
+        # Act
+        response = await self.interface.execute(ReadAddressCounterLo())
+
+        # Assert
+        self.assertEqual(response, 0x03)
+
+    async def test_cancelled_late_response_is_discarded(self):
+        # Arrange
+        self.interface.timeout = None
+
+        self.responses = [None, bytes.fromhex('c0 00 03 01 0c 00 00 00 c0')]
+
+        task = asyncio.create_task(self.interface.execute(ReadAddressCounterHi()))
+
+        await asyncio.sleep(0.01)
+
+        task.cancel()
+
+        with self.assertRaises(asyncio.CancelledError):
+            await task
+
+        self._receive(bytes.fromhex('c0 00 03 01 08 00 00 00 c0'))
+
+        # Act
+        response = await self.interface.execute(ReadAddressCounterLo())
+
+        # Assert
+        self.assertEqual(response, 0x03)
+
+    async def test_serial_error(self):
+        # Arrange
+        self.interface.timeout = None
+
+        self.responses = [None]
+
+        self.serial.read.side_effect = SerialException('Device disconnected')
+
+        self.interface._loop = Mock(wraps=self.interface._loop)
+
+        self.interface._loop.call_soon(self.interface._handle_readable)
+
+        # Act and assert
+        with self.assertRaisesRegex(InterfaceError, 'Device disconnected'):
+            await asyncio.wait_for(self.interface.execute(ReadAddressCounterHi()), 1)
+
+        self.interface._loop.remove_reader.assert_called_once_with(3)
+
+    def _write(self, data):
+        response = self.responses.pop(0)
+
+        if response is not None:
+            self.interface._loop.call_soon(self._receive, response)
+
+        return len(data)
+
+    def _receive(self, data):
+        self.serial.read.return_value = data
+
+        self.interface._handle_readable()
+
+if __name__ == '__main__':
+    unittest.main()
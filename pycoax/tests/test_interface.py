@@ -1,10 +1,12 @@
 import unittest
-from unittest.mock import Mock
+import threading
+from unittest.mock import Mock, patch
 
 import context
 
-from coax.interface import Interface, normalize_frame
-from coax.protocol import FrameFormat, ReadAddressCounterHi, ReadAddressCounterLo
+from coax.interface import Interface, InterfaceFeature, normalize_frame, _get_frame_length
+from coax.protocol import FrameFormat, ReadAddressCounterHi, ReadAddressCounterLo, LoadAddressCounterHi, WriteData
+from coax.optimizer import CommandOptimizer
 from coax.exceptions import InterfaceError, ReceiveTimeout, ProtocolError
 
 class InterfaceExecuteTestCase(unittest.TestCase):
@@ -95,6 +97,62 @@ class InterfaceExecuteTestCase(unittest.TestCase):
 
         self.assertEqual(timeout, 0.1)
 
+    def test_write_data_is_split_into_max_data_length_frames(self):
+        # Arrange
+        self.interface._transmit_receive.return_value=[[0b0000000000], [0b0000000000]]
+
+        with patch.object(Interface, 'max_data_length', 2):
+            # Act
+            response = self.interface.execute(WriteData(bytes.fromhex('01 02 03')))
+
+        # Assert
+        self.assertIsNone(response)
+
+        (outbound_frames, response_lengths, _) = self.interface._transmit_receive.call_args[0]
+
+        self.assertEqual(outbound_frames, [(None, (FrameFormat.WORD_DATA, 0b000_01100_01, bytes.fromhex('01 02'))), (None, (FrameFormat.WORD_DATA, 0b000_01100_01, bytes.fromhex('03')))])
+        self.assertEqual(response_lengths, [1, 1])
+
+    def test_write_data_runs_are_repeated(self):
+        # Arrange
+        self.interface._transmit_receive.return_value=[[0b0000000000], [0b0000000000]]
+
+        with patch.object(Interface, 'max_data_length', 100):
+            # Act
+            self.interface.execute(WriteData(b'\x01' + (b'\x00' * 80)))
+
+        # Assert
+        (outbound_frames, _, _) = self.interface._transmit_receive.call_args[0]
+
+        self.assertEqual(outbound_frames, [(None, (FrameFormat.WORD_DATA, 0b000_01100_01, b'\x01')), (None, (FrameFormat.WORD_DATA, 0b000_01100_01, (b'\x00', 80)))])
+
+    def test_addressed_write_data_runs_are_not_repeated(self):
+        # Arrange
+        self.interface.features = {InterfaceFeature.PROTOCOL_3299}
+
+        self.interface._transmit_receive.return_value=[[0b0000000000]]
+
+        with patch.object(Interface, 'max_data_length', 100):
+            # Act
+            self.interface.execute((1, WriteData(b'\x01' + (b'\x00' * 80))))
+
+        # Assert
+        (outbound_frames, _, _) = self.interface._transmit_receive.call_args[0]
+
+        self.assertEqual(outbound_frames, [(1, (FrameFormat.WORD_DATA, 0b000_01100_01, b'\x01' + (b'\x00' * 80)))])
+
+    def test_split_command_error(self):
+        # Arrange
+        self.interface._transmit_receive.return_value=[ReceiveTimeout(), [0b0000000000], [0b00000010_00]]
+
+        with patch.object(Interface, 'max_data_length', 2):
+            # Act
+            response = self.interface.execute([WriteData(bytes.fromhex('01 02 03')), ReadAddressCounterHi()])
+
+        # Assert
+        self.assertIsInstance(response[0], ReceiveTimeout)
+        self.assertEqual(response[1], 0x02)
+
     def test_single_command_interface_error(self):
         # Arrange
         self.interface._transmit_receive.side_effect=InterfaceError()
@@ -153,6 +211,276 @@ class InterfaceExecuteTestCase(unittest.TestCase):
         self.assertEqual(response[0], 0x02)
         self.assertIsInstance(response[1], ProtocolError)
 
+    def test_optimizer(self):
+        # Arrange
+        self.interface.optimizer = CommandOptimizer()
+
+        self.interface._transmit_receive.return_value=[[0b00000000_00], [0b00000000_00], [0b00000010_00]]
+
+        # Act
+        response = self.interface.execute([LoadAddressCounterHi(2), LoadAddressCounterHi(2), WriteData(b'\x01'), WriteData(b'\x02'), ReadAddressCounterHi()])
+
+        # Assert
+        self.assertEqual(response, [None, None, None, None, 0x02])
+
+        (outbound_frames, _, _) = self.interface._transmit_receive.call_args[0]
+
+        self.assertEqual(outbound_frames, [(None, LoadAddressCounterHi(2).pack_outbound_frame()),
+                                           (None, WriteData(b'\x01\x02').pack_outbound_frame()),
+                                           (None, ReadAddressCounterHi().pack_outbound_frame())])
+
+class InterfaceExecuteAsyncTestCase(unittest.TestCase):
+    def setUp(self):
+        self.interface = Interface()
+
+        self.interface._transmit_receive = Mock()
+
+    def tearDown(self):
+        self.interface.stop_io_thread()
+
+    def test_single_command(self):
+        # Arrange
+        self.interface._transmit_receive.return_value=[[0b00000010_00]]
+
+        # Act
+        future = self.interface.execute_async(ReadAddressCounterHi())
+
+        # Assert
+        self.assertEqual(future.result(timeout=1), 0x02)
+
+    def test_single_command_receive_timeout(self):
+        # Arrange
+        self.interface._transmit_receive.return_value=[ReceiveTimeout()]
+
+        # Act
+        future = self.interface.execute_async(ReadAddressCounterHi())
+
+        # Assert
+        self.assertIsInstance(future.exception(timeout=1), ReceiveTimeout)
+
+    def test_interface_error(self):
+        # Arrange
+        self.interface._transmit_receive.side_effect=InterfaceError()
+
+        # Act
+        future = self.interface.execute_async([ReadAddressCounterHi(), ReadAddressCounterLo()])
+
+        # Assert
+        self.assertIsInstance(future.exception(timeout=1), InterfaceError)
+
+    def test_concurrent_submissions_are_combined(self):
+        # Arrange
+        started = threading.Event()
+        release = threading.Event()
+
+        def transmit_receive(outbound_frames, response_lengths, timeout):
+            started.set()
+            release.wait(1)
+
+            return [[0b00000010_00] for _ in outbound_frames]
+
+        self.interface._transmit_receive.side_effect=transmit_receive
+
+        # Act
+        future1 = self.interface.execute_async(ReadAddressCounterHi())
+
+        started.wait(1)
+
+        future2 = self.interface.execute_async(ReadAddressCounterHi())
+        future3 = self.interface.execute_async([ReadAddressCounterHi(), ReadAddressCounterLo()])
+
+        release.set()
+
+        # Assert
+        self.assertEqual(future1.result(timeout=1), 0x02)
+        self.assertEqual(future2.result(timeout=1), 0x02)
+        self.assertEqual(future3.result(timeout=1), [0x02, 0x02])
+
+        self.assertEqual(self.interface._transmit_receive.call_count, 2)
+
+        (outbound_frames, _, _) = self.interface._transmit_receive.call_args[0]
+
+        self.assertEqual(len(outbound_frames), 3)
+
+    def test_execute_uses_io_thread(self):
+        # Arrange
+        self.interface.start_io_thread()
+
+        threads = []
+
+        self.interface._transmit_receive.side_effect=lambda *args: threads.append(threading.current_thread()) or [[0b00000010_00]]
+
+        # Act
+        response = self.interface.execute(ReadAddressCounterHi())
+
+        # Assert
+        self.assertEqual(response, 0x02)
+
+        self.assertIsNot(threads[0], threading.current_thread())
+
+class InterfaceExecutePreparedTestCase(unittest.TestCase):
+    def setUp(self):
+        self.interface = Interface()
+
+        self.interface._transmit_receive = Mock()
+
+    def test_single_command(self):
+        # Arrange
+        self.interface._transmit_receive.return_value=[[0b00000010_00]]
+
+        prepared_commands = self.interface.prepare(ReadAddressCounterHi(), timeout=0.1)
+
+        # Act
+        response = self.interface.execute_prepared(prepared_commands)
+
+        # Assert
+        self.assertEqual(response, 0x02)
+
+        self.interface._transmit_receive.assert_called_once_with([(None, (FrameFormat.WORD_DATA, 0b000_00101_01))], [1], 0.1)
+
+    def test_multiple_commands(self):
+        # Arrange
+        self.interface._transmit_receive.return_value=[[0b00000010_00], [0b00000000_00]]
+
+        prepared_commands = self.interface.prepare([ReadAddressCounterHi(), WriteData(bytes.fromhex('01 02'))])
+
+        # Act
+        responses = self.interface.execute_prepared(prepared_commands)
+
+        # Assert
+        self.assertEqual(responses, [0x02, None])
+
+    def test_repeated_execution(self):
+        # Arrange
+        self.interface._transmit_receive.return_value=[[0b00000010_00]]
+
+        prepared_commands = self.interface.prepare(ReadAddressCounterHi())
+
+        # Act
+        self.interface.execute_prepared(prepared_commands)
+        self.interface.execute_prepared(prepared_commands)
+
+        # Assert
+        self.assertEqual(self.interface._transmit_receive.call_count, 2)
+
+    def test_rebind(self):
+        # Arrange
+        self.interface._transmit_receive.return_value=[[0b00000010_00], [0b00000000_00]]
+
+        write_data = WriteData(bytes.fromhex('01 02'))
+
+        prepared_commands = self.interface.prepare([ReadAddressCounterHi(), write_data])
+
+        # Act
+        prepared_commands.rebind(1, bytes.fromhex('03 04'))
+
+        self.interface.execute_prepared(prepared_commands)
+
+        # Assert
+        (outbound_frames, _, _) = self.interface._transmit_receive.call_args[0]
+
+        self.assertEqual(outbound_frames[1], (None, (FrameFormat.WORD_DATA, 0b000_01100_01, bytes.fromhex('03 04'))))
+
+        self.assertEqual(write_data.data, bytes.fromhex('01 02'))
+
+    def test_rebind_split_command(self):
+        # Arrange
+        self.interface._transmit_receive.return_value=[[0b00000000_00], [0b00000000_00], [0b00000010_00]]
+
+        with patch.object(Interface, 'max_data_length', 2):
+            prepared_commands = self.interface.prepare([WriteData(bytes.fromhex('01')), ReadAddressCounterHi()])
+
+            # Act
+            prepared_commands.rebind(0, bytes.fromhex('01 02 03'))
+
+            responses = self.interface.execute_prepared(prepared_commands)
+
+        # Assert
+        self.assertEqual(responses, [None, 0x02])
+
+        (outbound_frames, response_lengths, _) = self.interface._transmit_receive.call_args[0]
+
+        self.assertEqual(len(outbound_frames), 3)
+        self.assertEqual(response_lengths, [1, 1, 1])
+
+    def test_rebind_command_without_data(self):
+        # Arrange
+        prepared_commands = self.interface.prepare(ReadAddressCounterHi())
+
+        # Act and assert
+        with self.assertRaises(TypeError):
+            prepared_commands.rebind(0, bytes.fromhex('01'))
+
+    def test_different_interface(self):
+        # Arrange
+        prepared_commands = Interface().prepare(ReadAddressCounterHi())
+
+        # Act and assert
+        with self.assertRaises(ValueError):
+            self.interface.execute_prepared(prepared_commands)
+
+    def test_io_thread(self):
+        # Arrange
+        self.interface._transmit_receive.return_value=[[0b00000010_00]]
+
+        prepared_commands = self.interface.prepare(ReadAddressCounterHi())
+
+        self.interface.start_io_thread()
+
+        # Act
+        try:
+            response = self.interface.execute_prepared(prepared_commands)
+        finally:
+            self.interface.stop_io_thread()
+
+        # Assert
+        self.assertEqual(response, 0x02)
+
+    def test_io_thread_does_not_pack_again(self):
+        # Arrange
+        self.interface._transmit_receive.return_value=[[0b00000010_00], [0b00000000_00]]
+
+        prepared_commands = self.interface.prepare([ReadAddressCounterHi(), WriteData(bytes.fromhex('01 02'))])
+
+        self.interface.start_io_thread()
+
+        # Act
+        try:
+            with patch.object(self.interface, '_pack_prepared_command') as pack_prepared_command, \
+                 patch('coax.interface._pack_outbound_frames') as pack_outbound_frames:
+                responses = self.interface.execute_prepared(prepared_commands)
+        finally:
+            self.interface.stop_io_thread()
+
+        # Assert
+        self.assertEqual(responses, [0x02, None])
+
+        pack_prepared_command.assert_not_called()
+        pack_outbound_frames.assert_not_called()
+
+    def test_io_thread_is_not_combined(self):
+        # Arrange
+        self.interface._transmit_receive.return_value=[[0b00000010_00]]
+
+        prepared_commands = self.interface.prepare(ReadAddressCounterHi())
+
+        self.interface.start_io_thread()
+
+        # Act
+        try:
+            with self.interface._io_thread._condition:
+                futures = [self.interface.execute_async(ReadAddressCounterHi()),
+                           self.interface._io_thread.submit_prepared(prepared_commands),
+                           self.interface.execute_async(ReadAddressCounterHi())]
+
+            responses = [future.result(timeout=1) for future in futures]
+        finally:
+            self.interface.stop_io_thread()
+
+        # Assert
+        self.assertEqual(responses, [0x02, 0x02, 0x02])
+        self.assertEqual(self.interface._transmit_receive.call_count, 3)
+
 class NormalizeFrameTestCase(unittest.TestCase):
     def test_words_with_no_address_no_repeat(self):
         # Arrange
@@ -298,5 +626,22 @@ class NormalizeFrameTestCase(unittest.TestCase):
         self.assertEqual(repeat_count, 9)
         self.assertEqual(repeat_offset, 1)
 
+class GetFrameLengthTestCase(unittest.TestCase):
+    def test(self):
+        frames = [(FrameFormat.WORDS, [0b1111111111, 0b0000000000]),
+                  (FrameFormat.WORDS, ([0b1111111111, 0b0000000000], 2)),
+                  (FrameFormat.WORD_DATA, 0b1111111111),
+                  (FrameFormat.WORD_DATA, 0b1111111111, b'\x01\x02\x03'),
+                  (FrameFormat.WORD_DATA, 0b1111111111, (b'\x01\x02', 8)),
+                  (FrameFormat.DATA, b'\x01\x02\x03'),
+                  (FrameFormat.DATA, (b'\x01', 8))]
+
+        for address in [None, 0b111000]:
+            for frame in frames:
+                with self.subTest(address=address, frame=frame):
+                    (words, _, _) = normalize_frame(address, frame)
+
+                    self.assertEqual(_get_frame_length(address, frame), len(words))
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,205 @@
+import unittest
+
+import context
+
+from coax.protocol import Control, Poll, ReadStatus, ReadData, LoadControlRegister, LoadMask, LoadAddressCounterHi, LoadAddressCounterLo, WriteData, EABLoadMask, EABWriteAlternate
+from coax.optimizer import CommandOptimizer
+
+def describe(commands):
+    return [(address, type(command).__name__) for (address, command) in commands]
+
+class CommandOptimizerTestCase(unittest.TestCase):
+    def setUp(self):
+        self.optimizer = CommandOptimizer()
+
+    def test_no_change(self):
+        # Arrange
+        commands = [(None, Poll()), (None, ReadStatus())]
+
+        # Act
+        (optimized_commands, indexes) = self.optimizer.optimize(commands)
+
+        # Assert
+        self.assertEqual(optimized_commands, commands)
+        self.assertEqual(indexes, [0, 1])
+        self.assertEqual(self.optimizer.commands_saved, 0)
+        self.assertEqual(self.optimizer.bytes_saved, 0)
+
+    def test_duplicate_address_counter_load(self):
+        # Arrange
+        commands = [(None, LoadAddressCounterHi(0)), (None, LoadAddressCounterLo(80)), (None, LoadAddressCounterHi(0))]
+
+        # Act
+        (optimized_commands, indexes) = self.optimizer.optimize(commands)
+
+        # Assert
+        self.assertEqual(describe(optimized_commands), [(None, 'LoadAddressCounterHi'), (None, 'LoadAddressCounterLo')])
+        self.assertEqual(indexes, [0, 1, None])
+
+    def test_dead_address_counter_load(self):
+        # Arrange
+        commands = [(None, LoadAddressCounterLo(80)), (None, ReadStatus()), (None, LoadAddressCounterLo(160)), (None, ReadData())]
+
+        # Act
+        (optimized_commands, indexes) = self.optimizer.optimize(commands)
+
+        # Assert
+        self.assertEqual(describe(optimized_commands), [(None, 'ReadStatus'), (None, 'LoadAddressCounterLo'), (None, 'ReadData')])
+        self.assertEqual(optimized_commands[1][1].address, 160)
+        self.assertEqual(indexes, [None, 0, 1, 2])
+
+    def test_used_address_counter_load(self):
+        # Arrange
+        commands = [(None, LoadAddressCounterLo(80)), (None, ReadData()), (None, LoadAddressCounterLo(80)), (None, ReadData())]
+
+        # Act
+        (optimized_commands, indexes) = self.optimizer.optimize(commands)
+
+        # Assert
+        self.assertEqual(indexes, [0, 1, 2, 3])
+
+    def test_duplicate_register_load(self):
+        # Arrange
+        commands = [(None, LoadMask(0xf0)), (None, LoadMask(0xf0)), (None, LoadMask(0x0f)), (None, EABLoadMask(7, 0xf0))]
+
+        # Act
+        (optimized_commands, indexes) = self.optimizer.optimize(commands)
+
+        # Assert
+        self.assertEqual(describe(optimized_commands), [(None, 'LoadMask'), (None, 'LoadMask'), (None, 'EABLoadMask')])
+        self.assertEqual(indexes, [0, None, 1, 2])
+
+    def test_register_load_after_poll(self):
+        # Arrange
+        commands = [(None, LoadMask(0xf0)), (None, Poll()), (None, LoadMask(0xf0))]
+
+        # Act
+        (optimized_commands, indexes) = self.optimizer.optimize(commands)
+
+        # Assert
+        self.assertEqual(indexes, [0, 1, 2])
+
+    def test_contiguous_writes(self):
+        # Arrange
+        commands = [(None, LoadAddressCounterHi(0)), (None, LoadAddressCounterLo(240)), (None, WriteData(b'\x01' * 16)),
+                    (None, LoadAddressCounterHi(1)), (None, LoadAddressCounterLo(0)), (None, WriteData(b'\x02' * 16))]
+
+        # Act
+        (optimized_commands, indexes) = self.optimizer.optimize(commands)
+
+        # Assert
+        self.assertEqual(describe(optimized_commands), [(None, 'LoadAddressCounterHi'), (None, 'LoadAddressCounterLo'), (None, 'WriteData')])
+        self.assertEqual(optimized_commands[2][1].data, b'\x01' * 16 + b'\x02' * 16)
+        self.assertEqual(indexes, [0, 1, 2, None, None, 2])
+
+        self.assertEqual(commands[2][1].data, b'\x01' * 16)
+
+        self.assertEqual(self.optimizer.commands_saved, 3)
+        self.assertEqual(self.optimizer.bytes_saved, 3 * 11 - 2)
+
+    def test_repeated_writes(self):
+        # Arrange
+        commands = [(None, LoadAddressCounterHi(0)), (None, LoadAddressCounterLo(240)), (None, WriteData((b'\x01', 16))),
+                    (None, LoadAddressCounterHi(1)), (None, LoadAddressCounterLo(0)), (None, WriteData(b'\x02' * 16))]
+
+        # Act
+        (optimized_commands, indexes) = self.optimizer.optimize(commands)
+
+        # Assert
+        self.assertEqual(indexes, [0, 1, 2, None, None, 3])
+
+    def test_contiguous_eab_writes(self):
+        # Arrange
+        commands = [(None, EABWriteAlternate(7, b'\x01\x02')), (None, EABWriteAlternate(7, b'\x03\x04')),
+                    (None, EABWriteAlternate(6, b'\x05\x06'))]
+
+        # Act
+        (optimized_commands, indexes) = self.optimizer.optimize(commands)
+
+        # Assert
+        self.assertEqual(indexes, [0, 0, 1])
+        self.assertEqual(optimized_commands[0][1].data, b'\x01\x02\x03\x04')
+
+    def test_non_contiguous_writes(self):
+        # Arrange
+        commands = [(None, LoadAddressCounterHi(0)), (None, LoadAddressCounterLo(80)), (None, WriteData(b'\x01' * 16)),
+                    (None, LoadAddressCounterLo(160)), (None, WriteData(b'\x02' * 16))]
+
+        # Act
+        (optimized_commands, indexes) = self.optimizer.optimize(commands)
+
+        # Assert
+        self.assertEqual(indexes, [0, 1, 2, 3, 4])
+
+    def test_writes_to_different_addresses(self):
+        # Arrange
+        commands = [(0b111000, WriteData(b'\x01')), (0b111001, WriteData(b'\x02'))]
+
+        # Act
+        (optimized_commands, indexes) = self.optimizer.optimize(commands)
+
+        # Assert
+        self.assertEqual(indexes, [0, 1])
+
+    def test_writes_with_step_inhibit(self):
+        # Arrange
+        commands = [(None, LoadControlRegister(Control(step_inhibit=True))), (None, WriteData(b'\x01')), (None, WriteData(b'\x02'))]
+
+        # Act
+        (optimized_commands, indexes) = self.optimizer.optimize(commands)
+
+        # Assert
+        self.assertEqual(indexes, [0, 1, 2])
+
+    def test_writes_with_unknown_step_inhibit(self):
+        # Arrange
+        optimizer = CommandOptimizer(step_inhibit=None)
+
+        commands = [(None, WriteData(b'\x01')), (None, WriteData(b'\x02'))]
+
+        # Act
+        (optimized_commands, indexes) = optimizer.optimize(commands)
+
+        # Assert
+        self.assertEqual(indexes, [0, 1])
+
+    def test_writes_with_step_inhibit_from_previous_batch(self):
+        # Arrange
+        self.optimizer.optimize([(None, LoadControlRegister(Control(step_inhibit=True)))])
+
+        commands = [(None, LoadAddressCounterHi(0)), (None, LoadAddressCounterLo(0)), (None, WriteData(b'\x01\x01')), (None, LoadAddressCounterLo(2)), (None, WriteData(b'\x02'))]
+
+        # Act
+        (optimized_commands, indexes) = self.optimizer.optimize(commands)
+
+        # Assert
+        self.assertEqual(optimized_commands, commands)
+        self.assertEqual(indexes, [0, 1, 2, 3, 4])
+
+    def test_writes_with_step_inhibit_from_previous_batch_after_poll(self):
+        # Arrange
+        self.optimizer.optimize([(None, LoadControlRegister(Control(step_inhibit=True)))])
+
+        commands = [(None, Poll()), (None, WriteData(b'\x01')), (None, WriteData(b'\x02'))]
+
+        # Act
+        (optimized_commands, indexes) = self.optimizer.optimize(commands)
+
+        # Assert
+        self.assertEqual(indexes, [0, 1, 2])
+
+    def test_writes_with_step_inhibit_cleared_in_previous_batch(self):
+        # Arrange
+        self.optimizer.optimize([(None, LoadControlRegister(Control(step_inhibit=True)))])
+        self.optimizer.optimize([(None, LoadControlRegister(Control(step_inhibit=False)))])
+
+        commands = [(None, WriteData(b'\x01')), (None, WriteData(b'\x02'))]
+
+        # Act
+        (optimized_commands, indexes) = self.optimizer.optimize(commands)
+
+        # Assert
+        self.assertEqual(indexes, [0, 0])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -2,7 +2,7 @@ import unittest
 
 import context
 
-from coax.parity import even_parity, odd_parity
+from coax.parity import even_parity, odd_parity, even_parity_bytes, odd_parity_bytes, verify_odd_parity, EVEN_PARITY_TABLE, ODD_PARITY_TABLE
 
 class EvenParityTestCase(unittest.TestCase):
     def test_with_even_input(self):
@@ -30,5 +30,45 @@ class OddParityTestCase(unittest.TestCase):
                 with self.assertRaises(ValueError):
                     odd_parity(input)
 
+class ParityTableTestCase(unittest.TestCase):
+    def test_even_parity(self):
+        self.assertEqual(list(EVEN_PARITY_TABLE), [even_parity(byte) for byte in range(256)])
+
+    def test_odd_parity(self):
+        self.assertEqual(list(ODD_PARITY_TABLE), [1 - even_parity(byte) for byte in range(256)])
+
+class EvenParityBytesTestCase(unittest.TestCase):
+    def test(self):
+        self.assertEqual(even_parity_bytes(bytes([0b00000000, 0b00000001, 0b00000011])), bytes([0, 1, 0]))
+
+    def test_bytes_like_input(self):
+        for input in [bytearray([0b00000001]), memoryview(bytes([0b00000001])), [0b00000001]]:
+            with self.subTest(input=input):
+                self.assertEqual(even_parity_bytes(input), bytes([1]))
+
+    def test_empty(self):
+        self.assertEqual(even_parity_bytes(b''), b'')
+
+class OddParityBytesTestCase(unittest.TestCase):
+    def test(self):
+        self.assertEqual(odd_parity_bytes(bytes([0b00000000, 0b00000001, 0b00000011])), bytes([1, 0, 1]))
+
+    def test_all_bytes(self):
+        self.assertEqual(list(odd_parity_bytes(bytes(range(256)))), [odd_parity(byte) for byte in range(256)])
+
+class VerifyOddParityTestCase(unittest.TestCase):
+    def test_match(self):
+        self.assertEqual(verify_odd_parity(bytes([0b00000000, 0b00000001]), bytes([1, 0])), -1)
+
+    def test_mismatch(self):
+        self.assertEqual(verify_odd_parity(bytes([0b00000000, 0b00000001, 0b00000011]), bytearray([1, 0, 0])), 2)
+
+    def test_memoryview_input(self):
+        self.assertEqual(verify_odd_parity(memoryview(bytes([0b00000001])), memoryview(bytes([1]))), 0)
+
+    def test_length_mismatch(self):
+        with self.assertRaises(ValueError):
+            verify_odd_parity(bytes([0b00000000]), bytes([1, 0]))
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,303 @@
+import unittest
+import threading
+from queue import Queue
+from unittest.mock import Mock, patch
+
+import context
+
+from coax.protocol import Poll, PollAck, KeystrokePollResponse, PowerOnResetCompletePollResponse
+from coax.poll import PollEngine, PollScheduler
+from coax.exceptions import InterfaceError, ReceiveTimeout
+
+class PollEngineTestCase(unittest.TestCase):
+    def setUp(self):
+        self.interface = Mock()
+
+        self.queue = Queue()
+
+        self.engine = PollEngine(self.interface, queue=self.queue, min_interval=0.01, max_interval=0.08)
+
+    def get_executed_commands(self):
+        return [type(command) for (_, command) in self.interface.execute.call_args[0][0]]
+
+    def test_no_response(self):
+        # Arrange
+        self.interface.execute.return_value = [None]
+
+        # Act
+        event = self.engine.poll()
+
+        # Assert
+        self.assertIsNone(event)
+        self.assertTrue(self.queue.empty())
+        self.assertEqual(self.get_executed_commands(), [Poll])
+
+    def test_keystroke(self):
+        # Arrange
+        self.interface.execute.return_value = [KeystrokePollResponse(0b0101_0000_10)]
+
+        # Act
+        event = self.engine.poll()
+
+        # Assert
+        self.assertIsInstance(event.response, KeystrokePollResponse)
+        self.assertIsNone(event.address)
+        self.assertIs(self.queue.get_nowait(), event)
+        self.assertEqual(self.engine.interval, 0.01)
+
+    def test_acknowledgement_is_sent_with_next_poll(self):
+        # Arrange
+        self.interface.execute.return_value = [PowerOnResetCompletePollResponse(0xa)]
+
+        self.engine.poll()
+
+        self.interface.execute.return_value = [None, None]
+
+        # Act
+        event = self.engine.poll()
+
+        # Assert
+        self.assertIsNone(event)
+        self.assertEqual(self.get_executed_commands(), [PollAck, Poll])
+
+        # Act
+        self.interface.execute.return_value = [None]
+
+        self.engine.poll()
+
+        # Assert
+        self.assertEqual(self.get_executed_commands(), [Poll])
+
+    def test_acknowledgement_error(self):
+        # Arrange
+        self.interface.execute.return_value = [KeystrokePollResponse(0b0101_0000_10)]
+
+        self.engine.poll()
+
+        self.queue.get_nowait()
+
+        self.interface.execute.return_value = [ReceiveTimeout(), KeystrokePollResponse(0b0101_0000_10)]
+
+        # Act
+        event = self.engine.poll()
+
+        # Assert
+        self.assertIsNone(event)
+        self.assertTrue(self.queue.empty())
+
+        self.engine.poll()
+
+        self.assertEqual(self.get_executed_commands(), [PollAck, Poll])
+
+    def test_receive_error(self):
+        # Arrange
+        self.interface.execute.return_value = [ReceiveTimeout()]
+
+        # Act
+        first_event = self.engine.poll()
+        second_event = self.engine.poll()
+
+        # Assert
+        self.assertIsInstance(first_event.response, ReceiveTimeout)
+        self.assertIsNone(second_event)
+        self.assertEqual(self.get_executed_commands(), [Poll])
+
+    def test_interval_backs_off_when_idle(self):
+        # Arrange
+        self.engine.active_time = 0
+
+        self.interface.execute.return_value = [KeystrokePollResponse(0b0101_0000_10)]
+
+        self.engine.poll()
+
+        self.interface.execute.return_value = [None, None]
+
+        intervals = []
+
+        # Act
+        for _ in range(5):
+            self.engine.poll()
+
+            intervals.append(self.engine.interval)
+
+        # Assert
+        self.assertEqual(intervals, [0.02, 0.04, 0.08, 0.08, 0.08])
+
+    def test_callback(self):
+        # Arrange
+        callback = Mock()
+
+        engine = PollEngine(self.interface, callback=callback)
+
+        self.interface.execute.return_value = [KeystrokePollResponse(0b0101_0000_10)]
+
+        # Act
+        event = engine.poll()
+
+        # Assert
+        callback.assert_called_once_with(event)
+
+    def test_callback_or_queue_is_required(self):
+        with self.assertRaises(ValueError):
+            PollEngine(self.interface)
+
+    def test_thread(self):
+        # Arrange
+        responses = [[KeystrokePollResponse(0b0101_0000_10)], [None, KeystrokePollResponse(0b0101_0001_10)]]
+
+        executed = threading.Event()
+
+        def execute(commands, timeout):
+            if not responses:
+                executed.set()
+
+                return [None] * len(commands)
+
+            return responses.pop(0)
+
+        self.interface.execute.side_effect = execute
+
+        # Act
+        with self.engine:
+            self.assertTrue(executed.wait(1))
+
+        # Assert
+        self.interface.start_io_thread.assert_called_once()
+
+        self.assertEqual(self.queue.get_nowait().response.scan_code, 0b0101_0000)
+        self.assertEqual(self.queue.get_nowait().response.scan_code, 0b0101_0001)
+
+    def test_thread_interface_error(self):
+        # Arrange
+        self.interface.execute.side_effect = InterfaceError()
+
+        # Act
+        self.engine.start()
+
+        event = self.queue.get(timeout=1)
+
+        self.engine.stop()
+
+        # Assert
+        self.assertIsInstance(event.response, InterfaceError)
+        self.assertIs(self.engine.error, event.response)
+
+class PollSchedulerTestCase(unittest.TestCase):
+    def setUp(self):
+        self.interface = Mock()
+
+        self.scheduler = PollScheduler(self.interface, ports=[0, 1, 2], max_interval=0.1, max_absent_interval=0.4)
+
+        patcher = patch('coax.poll.time.monotonic')
+
+        self.monotonic = patcher.start()
+
+        self.monotonic.return_value = 100
+
+        self.addCleanup(patch.stopall)
+
+    def get_executed_commands(self):
+        return [(address, type(command)) for (address, command) in self.interface.execute.call_args[0][0]]
+
+    def test_single_batch(self):
+        # Arrange
+        self.interface.execute.return_value = [None, KeystrokePollResponse(0b0101_0000_10), ReceiveTimeout()]
+
+        # Act
+        events = self.scheduler.poll()
+
+        # Assert
+        self.interface.execute.assert_called_once()
+
+        self.assertEqual(self.get_executed_commands(), [(0b000000, Poll), (0b100000, Poll), (0b010000, Poll)])
+
+        self.assertEqual([port for (port, _) in events], [1, 2])
+
+        self.assertTrue(self.scheduler.queues[0].empty())
+        self.assertEqual(self.scheduler.queues[1].get_nowait().response.scan_code, 0b0101_0000)
+        self.assertIsInstance(self.scheduler.queues[2].get_nowait().response, ReceiveTimeout)
+
+    def test_active_ports_are_first(self):
+        # Arrange
+        self.interface.execute.return_value = [None, None, KeystrokePollResponse(0b0101_0000_10)]
+
+        self.scheduler.poll()
+
+        self.monotonic.return_value = 101
+
+        self.interface.execute.return_value = [None, None, None, None]
+
+        # Act
+        self.scheduler.poll()
+
+        # Assert
+        self.assertEqual(self.get_executed_commands(), [(0b010000, PollAck), (0b010000, Poll), (0b000000, Poll), (0b100000, Poll)])
+
+    def test_only_due_ports_are_polled(self):
+        # Arrange
+        self.interface.execute.return_value = [None, None, KeystrokePollResponse(0b0101_0000_10)]
+
+        self.scheduler.poll()
+
+        self.interface.execute.return_value = [None, None]
+
+        # Act
+        self.scheduler.poll()
+
+        # Assert
+        self.assertEqual(self.get_executed_commands(), [(0b010000, PollAck), (0b010000, Poll)])
+
+    def test_absent_port_backoff(self):
+        # Arrange
+        self.interface.execute.side_effect = lambda commands, timeout: [None] * (len(commands) - 1) + [ReceiveTimeout()]
+
+        intervals = []
+
+        # Act
+        for _ in range(4):
+            self.monotonic.return_value = self.scheduler._next_poll_times[2]
+
+            self.scheduler.poll()
+
+            intervals.append(round(self.scheduler._next_poll_times[2] - self.monotonic.return_value, 3))
+
+        # Assert
+        self.assertTrue(self.scheduler.is_absent(2))
+        self.assertFalse(self.scheduler.is_absent(0))
+
+        self.assertEqual(intervals, [0.1, 0.2, 0.4, 0.4])
+
+    def test_absent_port_returns(self):
+        # Arrange
+        self.interface.execute.return_value = [ReceiveTimeout(), None, None]
+
+        self.scheduler.poll()
+
+        self.monotonic.return_value = 101
+
+        self.interface.execute.return_value = [None, None, None]
+
+        # Act
+        self.scheduler.poll()
+
+        # Assert
+        self.assertFalse(self.scheduler.is_absent(0))
+
+    def test_nothing_due(self):
+        # Arrange
+        self.interface.execute.return_value = [None, None, None]
+
+        self.scheduler.poll()
+
+        self.interface.execute.reset_mock()
+
+        # Act
+        events = self.scheduler.poll()
+
+        # Assert
+        self.assertEqual(events, [])
+
+        self.interface.execute.assert_not_called()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,89 @@
+import unittest
+from unittest.mock import Mock, patch
+from contextlib import contextmanager
+
+import context
+
+from coax.interface import Interface, InterfaceFeature
+from coax.protocol import TerminalType, ReadAddressCounterHi, ReadAddressCounterLo
+from coax.pool import InterfacePool
+from coax.exceptions import ReceiveTimeout
+
+def create_interface(features, responses):
+    interface = Interface()
+
+    interface.features = features
+
+    interface._transmit_receive = Mock(side_effect=responses)
+
+    return interface
+
+class InterfacePoolTestCase(unittest.TestCase):
+    def setUp(self):
+        self.interface1 = create_interface(set(), [[[0b0000_010_0_00]]])
+        self.interface2 = create_interface({InterfaceFeature.PROTOCOL_3299}, [[ReceiveTimeout(), [0b0000_010_0_00]] + [ReceiveTimeout()] * 6 + [[0b0000_000_1_00]]])
+
+        interfaces = { '/dev/ttyACM0': self.interface1, '/dev/ttyACM1': self.interface2 }
+
+        @contextmanager
+        def open_serial_interface(serial_port):
+            yield interfaces[serial_port]
+
+            interfaces[serial_port].stop_io_thread()
+
+        patcher = patch('coax.pool.open_serial_interface', side_effect=open_serial_interface)
+
+        patcher.start()
+
+        self.addCleanup(patcher.stop)
+
+        self.pool = InterfacePool(['/dev/ttyACM0', '/dev/ttyACM1'])
+
+        self.pool.open()
+
+        self.addCleanup(self.pool.close)
+
+    def test_probe(self):
+        # Assert
+        self.assertEqual(set(self.pool.terminals.keys()), {('/dev/ttyACM0', None), ('/dev/ttyACM1', 0), ('/dev/ttyACM1', 7)})
+
+        self.assertEqual(self.pool.terminals[('/dev/ttyACM0', None)].type, TerminalType.CUT)
+        self.assertEqual(self.pool.terminals[('/dev/ttyACM1', 7)].type, TerminalType.DFT)
+
+        (outbound_frames, _, timeout) = self.interface2._transmit_receive.call_args[0]
+
+        self.assertEqual([address for (address, _) in outbound_frames], [None, 0b000000, 0b100000, 0b010000, 0b110000, 0b001000, 0b101000, 0b011000, 0b111000])
+        self.assertEqual(timeout, 0.1)
+
+    def test_execute(self):
+        # Arrange
+        self.interface2._transmit_receive.side_effect=[[[0b00000010_00], [0b11111111_00]]]
+
+        # Act
+        response = self.pool.execute(('/dev/ttyACM1', 7), [ReadAddressCounterHi(), ReadAddressCounterLo()])
+
+        # Assert
+        self.assertEqual(response, [0x02, 0xff])
+
+        (outbound_frames, _, _) = self.interface2._transmit_receive.call_args[0]
+
+        self.assertEqual([address for (address, _) in outbound_frames], [0b111000, 0b111000])
+
+    def test_execute_unknown_serial_port(self):
+        with self.assertRaises(KeyError):
+            self.pool.execute(('/dev/ttyACM2', None), ReadAddressCounterHi())
+
+    def test_execute_many(self):
+        # Arrange
+        self.interface1._transmit_receive.side_effect=[[[0b00000010_00]]]
+        self.interface2._transmit_receive.side_effect=[[ReceiveTimeout()]]
+
+        # Act
+        responses = self.pool.execute_many({ ('/dev/ttyACM0', None): ReadAddressCounterHi(), ('/dev/ttyACM1', 0): ReadAddressCounterHi() })
+
+        # Assert
+        self.assertEqual(responses[('/dev/ttyACM0', None)], 0x02)
+        self.assertIsInstance(responses[('/dev/ttyACM1', 0)], ReceiveTimeout)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,10 +1,43 @@
 import unittest
+import tracemalloc
+from enum import Enum
 
 import context
 
 from coax.interface import FrameFormat
-from coax.protocol import PollAction, PowerOnResetCompletePollResponse, KeystrokePollResponse, TerminalId, TerminalType, Control, SecondaryControl, Poll, PollAck, ReadStatus, ReadTerminalId, ReadExtendedId, ReadAddressCounterHi, ReadAddressCounterLo, ReadData, ReadMultiple, Reset, LoadControlRegister, LoadSecondaryControl, LoadMask, LoadAddressCounterHi, LoadAddressCounterLo, WriteData, Clear, SearchForward, SearchBackward, InsertByte, StartOperation, DiagnosticReset, ReadFeatureId, pack_data_word, unpack_data_word, pack_data_words, unpack_data_words
+from coax.protocol import PollAction, PowerOnResetCompletePollResponse, KeystrokePollResponse, TerminalId, TerminalType, Control, SecondaryControl, Poll, PollAck, ReadStatus, ReadTerminalId, ReadExtendedId, ReadAddressCounterHi, ReadAddressCounterLo, ReadData, ReadMultiple, Reset, LoadControlRegister, LoadSecondaryControl, LoadMask, LoadAddressCounterHi, LoadAddressCounterLo, WriteData, Clear, SearchForward, SearchBackward, InsertByte, StartOperation, DiagnosticReset, ReadFeatureId, EABWriteAlternate, EABReadMultiple, DataWords, pack_data_word, unpack_data_word, pack_data_words, unpack_data_words
 from coax.exceptions import ProtocolError
+import coax.protocol
+
+class SlotsTestCase(unittest.TestCase):
+    def test_commands_and_responses_have_no_instance_dictionary(self):
+        classes = [value for value in vars(coax.protocol).values() if isinstance(value, type) and value.__module__ == 'coax.protocol' and not issubclass(value, Enum)]
+
+        for class_ in classes:
+            with self.subTest(class_=class_.__name__):
+                self.assertEqual(class_.__dictoffset__, 0)
+
+    def test_commands_use_less_memory_than_with_instance_dictionary(self):
+        # Arrange
+        dictionary_class = type('WriteData', (WriteData,), {})
+
+        def measure(class_):
+            tracemalloc.start()
+
+            objects = [class_(b'\x00') for _ in range(1000)]
+
+            (size, _) = tracemalloc.get_traced_memory()
+
+            tracemalloc.stop()
+
+            return size
+
+        # Act
+        slots_size = measure(WriteData)
+        dictionary_size = measure(dictionary_class)
+
+        # Assert
+        self.assertLess(slots_size, dictionary_size * 0.8)
 
 class TerminalIdTestCase(unittest.TestCase):
     def test_cut_model_2(self):
@@ -239,6 +272,75 @@ class ReadMultipleTestCase(unittest.TestCase):
                 with self.assertRaises(ProtocolError):
                     ReadMultiple().unpack_inbound_frame(words)
 
+    def test_unpack_data_lazy(self):
+        response = ReadMultiple(lazy=True).unpack_inbound_frame([0b00000000_00, 0b11111111_00])
+
+        self.assertIsInstance(response, DataWords)
+        self.assertEqual(bytes(response), bytes.fromhex('00 ff'))
+
+class EABWriteAlternateTestCase(unittest.TestCase):
+    def test_pack(self):
+        self.assertEqual(EABWriteAlternate(7, bytes.fromhex('00 ff')).pack_outbound_frame(), (FrameFormat.WORD_DATA, 0b0111_1010_01, bytes.fromhex('00 ff')))
+
+    def test_pack_frames(self):
+        self.assertEqual(EABWriteAlternate(7, bytes.fromhex('00 01 02 03 04')).pack_outbound_frames(3), [(FrameFormat.WORD_DATA, 0b0111_1010_01, bytes.fromhex('00 01')), (FrameFormat.WORD_DATA, 0b0111_1010_01, bytes.fromhex('02 03')), (FrameFormat.WORD_DATA, 0b0111_1010_01, bytes.fromhex('04'))])
+
+    def test_pack_frames_repeat(self):
+        frames = EABWriteAlternate(7, b'\x01\x02' + (b'\x00\x20' * 50)).pack_outbound_frames(7400, repeat=True)
+
+        self.assertEqual(frames, [(FrameFormat.WORD_DATA, 0b0111_1010_01, b'\x01\x02'), (FrameFormat.WORD_DATA, 0b0111_1010_01, (b'\x00\x20', 50))])
+
+    def test_pack_frames_repeat_is_aligned_to_pairs(self):
+        frames = EABWriteAlternate(7, b'\x01\x00' + (b'\x20\x00' * 50)).pack_outbound_frames(7400, repeat=True)
+
+        self.assertEqual(frames, [(FrameFormat.WORD_DATA, 0b0111_1010_01, b'\x01\x00'), (FrameFormat.WORD_DATA, 0b0111_1010_01, (b'\x20\x00', 50))])
+
+class EABReadMultipleTestCase(unittest.TestCase):
+    def test_pack(self):
+        self.assertEqual(EABReadMultiple(7).pack_outbound_frame(), (FrameFormat.WORD_DATA, 0b0111_1011_01))
+
+    def test_unpack_data(self):
+        self.assertEqual(EABReadMultiple(7).unpack_inbound_frame([0b00000000_00, 0b11111111_00]), bytes.fromhex('00 ff'))
+
+    def test_unpack_data_lazy(self):
+        response = EABReadMultiple(7, lazy=True).unpack_inbound_frame([0b00000000_00, 0b11111111_00])
+
+        self.assertIsInstance(response, DataWords)
+        self.assertEqual(bytes(response), bytes.fromhex('00 ff'))
+
+class DataWordsTestCase(unittest.TestCase):
+    def setUp(self):
+        self.data = DataWords([0b00000000_00, 0b00000001_00, 0b11111111_00])
+
+    def test_len(self):
+        self.assertEqual(len(self.data), 3)
+
+    def test_index(self):
+        self.assertEqual(self.data[1], 0x01)
+        self.assertEqual(self.data[-1], 0xff)
+
+    def test_slice(self):
+        self.assertEqual(self.data[1:], bytes.fromhex('01 ff'))
+
+    def test_iter(self):
+        self.assertEqual(list(self.data), [0x00, 0x01, 0xff])
+
+    def test_bytes(self):
+        self.assertEqual(bytes(self.data), bytes.fromhex('00 01 ff'))
+
+    def test_eq(self):
+        self.assertEqual(self.data, bytes.fromhex('00 01 ff'))
+        self.assertEqual(self.data, DataWords([0b00000000_00, 0b00000001_00, 0b11111111_00]))
+        self.assertNotEqual(self.data, bytes.fromhex('00 01'))
+
+    def test_invalid_word_is_only_unpacked_on_access(self):
+        data = DataWords([0b00000000_00, 0b11111111_01])
+
+        self.assertEqual(data[0], 0x00)
+
+        with self.assertRaises(ProtocolError):
+            data[1]
+
 class ResetTestCase(unittest.TestCase):
     def test_pack(self):
         self.assertEqual(Reset().pack_outbound_frame(), (FrameFormat.WORD_DATA, 0b000_00010_01))
@@ -343,6 +445,30 @@ class WriteDataTestCase(unittest.TestCase):
     def test_pack(self):
         self.assertEqual(WriteData(bytes.fromhex('00 ff')).pack_outbound_frame(), (FrameFormat.WORD_DATA, 0b000_01100_01, bytes.fromhex('00 ff')))
 
+    def test_pack_frames(self):
+        self.assertEqual(WriteData(bytes.fromhex('00 ff')).pack_outbound_frames(2), [(FrameFormat.WORD_DATA, 0b000_01100_01, bytes.fromhex('00 ff'))])
+        self.assertEqual(WriteData(bytes.fromhex('00 ff 01')).pack_outbound_frames(2), [(FrameFormat.WORD_DATA, 0b000_01100_01, bytes.fromhex('00 ff')), (FrameFormat.WORD_DATA, 0b000_01100_01, bytes.fromhex('01'))])
+
+    def test_pack_frames_repeat(self):
+        frames = WriteData(b'\x01' + (b'\x00' * 100) + b'\x02').pack_outbound_frames(7401, repeat=True)
+
+        self.assertEqual(frames, [(FrameFormat.WORD_DATA, 0b000_01100_01, b'\x01'), (FrameFormat.WORD_DATA, 0b000_01100_01, (b'\x00', 100)), (FrameFormat.WORD_DATA, 0b000_01100_01, b'\x02')])
+
+    def test_pack_frames_repeat_short_run(self):
+        frames = WriteData(b'\x01' + (b'\x00' * 10) + b'\x02').pack_outbound_frames(7401, repeat=True)
+
+        self.assertEqual(frames, [(FrameFormat.WORD_DATA, 0b000_01100_01, b'\x01' + (b'\x00' * 10) + b'\x02')])
+
+    def test_pack_frames_repeat_max_length(self):
+        frames = WriteData(b'\x00' * 200).pack_outbound_frames(80, repeat=True)
+
+        self.assertEqual(frames, [(FrameFormat.WORD_DATA, 0b000_01100_01, (b'\x00', 80)), (FrameFormat.WORD_DATA, 0b000_01100_01, (b'\x00', 80)), (FrameFormat.WORD_DATA, 0b000_01100_01, (b'\x00', 40))])
+
+    def test_pack_frames_repeat_existing_repeat(self):
+        frames = WriteData((b'\x00', 100)).pack_outbound_frames(7401, repeat=True)
+
+        self.assertEqual(frames, [(FrameFormat.WORD_DATA, 0b000_01100_01, (b'\x00', 100))])
+
     def test_unpack_tt_ar(self):
         self.assertIsNone(WriteData(bytes.fromhex('00 ff')).unpack_inbound_frame([0b0000000000]))
 
@@ -449,6 +575,12 @@ class PackDataWordTestCase(unittest.TestCase):
         self.assertEqual(pack_data_word(0x01, set_parity=False), 0b00000001_00)
         self.assertEqual(pack_data_word(0xff, set_parity=False), 0b11111111_00)
 
+    def test_with_out_of_range_input(self):
+        for input in [-1, 256]:
+            with self.subTest(input=input):
+                with self.assertRaises(ValueError):
+                    pack_data_word(input)
+
 class UnpackDataWordTestCase(unittest.TestCase):
     def test_do_not_check_parity(self):
         self.assertEqual(unpack_data_word(0b00000000_10, check_parity=True), 0x00)
@@ -466,9 +598,42 @@ class PackDataWordsTestCase(unittest.TestCase):
     def test(self):
         self.assertEqual(pack_data_words(bytes.fromhex('00 ff')), [0b00000000_10, 0b11111111_10])
 
+    def test_do_not_set_parity(self):
+        self.assertEqual(pack_data_words(bytes.fromhex('00 01 ff'), set_parity=False), [0b00000000_00, 0b00000001_00, 0b11111111_00])
+
+    def test_all_bytes(self):
+        self.assertEqual(pack_data_words(bytes(range(256))), [pack_data_word(byte) for byte in range(256)])
+
+    def test_list(self):
+        self.assertEqual(pack_data_words([0x00, 0xff]), [0b00000000_10, 0b11111111_10])
+
+    def test_empty(self):
+        self.assertEqual(pack_data_words(b''), [])
+
+    def test_with_out_of_range_input(self):
+        with self.assertRaises(ValueError):
+            pack_data_words([0x00, 256])
+
 class UnpackDataWordsTestCase(unittest.TestCase):
     def test(self):
         self.assertEqual(unpack_data_words([0b00000000_10, 0b11111111_10]), bytes.fromhex('00 ff'))
 
+    def test_all_bytes(self):
+        self.assertEqual(unpack_data_words([byte << 2 for byte in range(256)]), bytes(range(256)))
+
+    def test_empty(self):
+        self.assertEqual(unpack_data_words([]), b'')
+
+    def test_data_bit_not_set_error(self):
+        with self.assertRaisesRegex(ProtocolError, 'Word does not have data bit set: 771'):
+            unpack_data_words([0b00000000_10, 0b11000000_11])
+
+    def test_check_parity_all_bytes(self):
+        self.assertEqual(unpack_data_words([pack_data_word(byte) for byte in range(256)], check_parity=True), bytes(range(256)))
+
+    def test_parity_error(self):
+        with self.assertRaisesRegex(ProtocolError, 'Parity error: 1020'):
+            unpack_data_words([0b00000000_10, 0b11111111_00], check_parity=True)
+
 if __name__ == '__main__':
     unittest.main()
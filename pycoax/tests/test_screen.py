@@ -0,0 +1,435 @@
+import unittest
+from unittest.mock import Mock
+
+import context
+
+from coax.interface import normalize_frame
+
+from coax.protocol import LoadAddressCounterHi, LoadAddressCounterLo, LoadSecondaryControl, WriteData, ReadMultiple, EABWriteAlternate, EABLoadMask, EABWriteUnderMask
+from coax.screen import ScreenBuffer, read_buffer, interleave_eab, deinterleave_eab, _get_eab_write_commands
+from coax.exceptions import ReceiveTimeout
+
+def describe_commands(commands):
+    descriptions = []
+
+    for command in commands:
+        if isinstance(command, LoadAddressCounterHi):
+            descriptions.append(('hi', command.address))
+        elif isinstance(command, LoadAddressCounterLo):
+            descriptions.append(('lo', command.address))
+        elif isinstance(command, WriteData):
+            descriptions.append(('write', command.data))
+        elif isinstance(command, EABWriteAlternate):
+            descriptions.append(('write_alternate', command.data))
+        elif isinstance(command, EABLoadMask):
+            descriptions.append(('load_mask', command.mask))
+        elif isinstance(command, EABWriteUnderMask):
+            descriptions.append(('write_under_mask', command.byte))
+
+    return descriptions
+
+def get_message_length(commands):
+    # Length of the TRANSMIT_RECEIVE messages for the commands.
+    return sum(7 + len(normalize_frame(None, command.pack_outbound_frame())[0]) * 2 for command in commands)
+
+class ScreenBufferTestCase(unittest.TestCase):
+    def setUp(self):
+        self.buffer = ScreenBuffer(1024)
+
+        self.interface = Mock()
+
+        self.interface.execute = Mock(side_effect=lambda commands: [None] * len(commands))
+
+    def test_initial_flush_writes_entire_buffer(self):
+        # Act
+        commands = self.buffer.get_commands()
+
+        # Assert
+        self.assertEqual(describe_commands(commands), [('hi', 0), ('lo', 0), ('write', bytes(1024))])
+
+    def test_no_changes(self):
+        # Arrange
+        self.buffer.flush(self.interface)
+
+        self.buffer.write(10, bytes(4))
+
+        # Act
+        commands = self.buffer.get_commands()
+
+        # Assert
+        self.assertEqual(commands, [])
+
+    def test_single_change(self):
+        # Arrange
+        self.buffer.flush(self.interface)
+
+        self.buffer.write(300, b'\x01\x02\x00\x03')
+
+        # Act
+        commands = self.buffer.get_commands()
+
+        # Assert
+        self.assertEqual(describe_commands(commands), [('hi', 1), ('lo', 44), ('write', b'\x01\x02\x00\x03')])
+
+    def test_small_gap_is_merged(self):
+        # Arrange
+        self.buffer.flush(self.interface)
+
+        self.buffer.write(100, b'\x01')
+        self.buffer.write(110, b'\x02')
+
+        # Act
+        commands = self.buffer.get_commands()
+
+        # Assert
+        self.assertEqual(describe_commands(commands), [('hi', 0), ('lo', 100), ('write', b'\x01' + bytes(9) + b'\x02')])
+
+    def test_large_gap_is_not_merged(self):
+        # Arrange
+        self.buffer.flush(self.interface)
+
+        self.buffer.write(100, b'\x01')
+        self.buffer.write(200, b'\x02')
+
+        # Act
+        commands = self.buffer.get_commands()
+
+        # Assert
+        self.assertEqual(describe_commands(commands), [('hi', 0), ('lo', 100), ('write', b'\x01'), ('lo', 200), ('write', b'\x02')])
+
+    def test_address_counter_hi_is_loaded_when_changed(self):
+        # Arrange
+        self.buffer.flush(self.interface)
+
+        self.buffer.write(100, b'\x01')
+        self.buffer.write(600, b'\x02')
+
+        # Act
+        commands = self.buffer.get_commands()
+
+        # Assert
+        self.assertEqual(describe_commands(commands), [('hi', 0), ('lo', 100), ('write', b'\x01'), ('hi', 2), ('lo', 88), ('write', b'\x02')])
+
+    def test_overlapping_writes(self):
+        # Arrange
+        self.buffer.flush(self.interface)
+
+        self.buffer.write(100, b'\x01\x01\x01')
+        self.buffer.write(101, b'\x02\x02\x02')
+
+        # Act
+        commands = self.buffer.get_commands()
+
+        # Assert
+        self.assertEqual(describe_commands(commands), [('hi', 0), ('lo', 100), ('write', b'\x01\x02\x02\x02')])
+
+    def test_many_writes(self):
+        # Arrange
+        self.buffer.flush(self.interface)
+
+        for address in range(0, 1000, 5):
+            self.buffer.write(address, b'\x01')
+
+        # Act
+        commands = self.buffer.get_commands()
+
+        # Assert
+        self.assertEqual(describe_commands(commands), [('hi', 0), ('lo', 0), ('write', (b'\x01' + bytes(4)) * 199 + b'\x01')])
+
+    def test_fill(self):
+        # Arrange
+        self.buffer.flush(self.interface)
+
+        # Act
+        self.buffer.fill(80, 80, 0x01)
+
+        # Assert
+        self.assertEqual(self.buffer.read(80, 80), b'\x01' * 80)
+        self.assertEqual(describe_commands(self.buffer.get_commands()), [('hi', 0), ('lo', 80), ('write', b'\x01' * 80)])
+
+    def test_out_of_range(self):
+        for (address, length) in [(-1, 1), (1020, 5)]:
+            with self.subTest(address=address, length=length):
+                with self.assertRaises(IndexError):
+                    self.buffer.write(address, bytes(length))
+
+    def test_flush(self):
+        # Arrange
+        self.buffer.flush(self.interface)
+
+        self.buffer.write(100, b'\x01')
+
+        # Act
+        self.buffer.flush(self.interface, address=0b111000)
+
+        # Assert
+        commands = self.interface.execute.call_args[0][0]
+
+        self.assertEqual([address for (address, _) in commands], [0b111000] * 3)
+        self.assertEqual(self.buffer.get_commands(), [])
+
+    def test_flush_error(self):
+        # Arrange
+        self.buffer.flush(self.interface)
+
+        self.buffer.write(100, b'\x01')
+
+        self.interface.execute.side_effect = lambda commands: [None, None, ReceiveTimeout()]
+
+        # Act and assert
+        with self.assertRaises(ReceiveTimeout):
+            self.buffer.flush(self.interface)
+
+        self.assertEqual(describe_commands(self.buffer.get_commands()), [('hi', 0), ('lo', 100), ('write', b'\x01')])
+
+    def test_invalidate(self):
+        # Arrange
+        self.buffer.flush(self.interface)
+
+        # Act
+        self.buffer.invalidate()
+
+        # Assert
+        self.assertEqual(describe_commands(self.buffer.get_commands()), [('hi', 0), ('lo', 0), ('write', bytes(1024))])
+
+class EABScreenBufferTestCase(unittest.TestCase):
+    def setUp(self):
+        self.buffer = ScreenBuffer(1024, eab_address=7)
+
+        self.interface = Mock()
+
+        self.interface.execute = Mock(side_effect=lambda commands: [None] * len(commands))
+
+        self.buffer.flush(self.interface)
+
+    def test_initial_flush_writes_entire_buffer(self):
+        # Arrange
+        self.buffer.invalidate()
+
+        # Act
+        commands = self.buffer.get_commands()
+
+        # Assert
+        self.assertEqual(describe_commands(commands), [('hi', 0), ('lo', 0), ('write_alternate', bytes(2048))])
+        self.assertEqual(commands[2].feature_address, 7)
+
+    def test_regen_change(self):
+        # Arrange
+        self.buffer.write(100, b'\x01\x02')
+
+        # Act
+        commands = self.buffer.get_commands()
+
+        # Assert
+        self.assertEqual(describe_commands(commands), [('hi', 0), ('lo', 100), ('write_alternate', b'\x01\x00\x02\x00')])
+
+    def test_regen_and_eab_change(self):
+        # Arrange
+        self.buffer.write(100, b'\x01\x02', eab=b'\x80\x00')
+        self.buffer.write_eab(102, b'\x40')
+
+        # Act
+        commands = self.buffer.get_commands()
+
+        # Assert
+        self.assertEqual(describe_commands(commands), [('hi', 0), ('lo', 100), ('write_alternate', b'\x01\x80\x02\x00\x00\x40')])
+
+        self.assertEqual(self.buffer.read_eab(100, 3), b'\x80\x00\x40')
+
+    def test_few_eab_only_changes(self):
+        # Arrange
+        self.buffer.write_eab(100, b'\x80')
+        self.buffer.write_eab(200, b'\x80')
+
+        # Act
+        commands = self.buffer.get_commands()
+
+        # Assert
+        self.assertEqual(describe_commands(commands), [('hi', 0), ('lo', 100), ('write_alternate', b'\x00\x80'), ('lo', 200), ('write_alternate', b'\x00\x80')])
+
+    def test_many_eab_only_changes(self):
+        # Arrange
+        for address in range(0, 1000, 100):
+            self.buffer.write_eab(address, b'\x80')
+
+        # Act
+        commands = self.buffer.get_commands()
+
+        # Assert
+        descriptions = describe_commands(commands)
+
+        self.assertEqual(descriptions[0], ('load_mask', 0xff))
+        self.assertEqual(descriptions[1:4], [('hi', 0), ('lo', 0), ('write_under_mask', 0x80)])
+        self.assertEqual(descriptions[4:6], [('lo', 100), ('write_under_mask', 0x80)])
+        self.assertEqual(len([description for description in descriptions if description[0] == 'write_under_mask']), 10)
+
+    def test_eab_only_changes_are_cheaper(self):
+        # Arrange
+        buffer = ScreenBuffer(1920, eab_address=7)
+
+        buffer.flush(self.interface)
+
+        for address in range(0, 1840, 40)[:23]:
+            buffer.write_eab(address, b'\x80')
+
+        # Act
+        commands = buffer.get_commands()
+
+        # Assert
+        self.assertIn(('load_mask', 0xff), describe_commands(commands))
+
+        write_alternate_commands = _get_eab_write_commands(buffer.regen, buffer.eab, None, buffer._get_changed_ranges(), 7)
+
+        self.assertLess(get_message_length(commands), get_message_length(write_alternate_commands))
+
+    def test_eab_only_change_at_end_of_block(self):
+        # Arrange
+        for address in range(55, 1000, 100):
+            self.buffer.write_eab(address, b'\x80')
+
+        self.buffer.write_eab(255, b'\x80')
+
+        # Act
+        commands = self.buffer.get_commands()
+
+        # Assert
+        descriptions = describe_commands(commands)
+
+        self.assertEqual(descriptions[descriptions.index(('lo', 255)) + 1], ('write_alternate', b'\x00\x80'))
+
+    def test_fill(self):
+        # Act
+        self.buffer.fill(80, 2, 0x01, eab_byte=0x80)
+
+        # Assert
+        self.assertEqual(describe_commands(self.buffer.get_commands()), [('hi', 0), ('lo', 80), ('write_alternate', b'\x01\x80\x01\x80')])
+
+    def test_eab_length_mismatch(self):
+        with self.assertRaises(ValueError):
+            self.buffer.write(100, b'\x01\x02', eab=b'\x80')
+
+    def test_eab_without_feature_address(self):
+        buffer = ScreenBuffer(1024)
+
+        with self.assertRaises(ValueError):
+            buffer.write_eab(100, b'\x80')
+
+class MockTerminal:
+    def __init__(self, regen, boundary=16):
+        self.regen = regen
+        self.boundary = boundary
+        self.address_counter = 0
+        self.big = False
+        self.batches = []
+
+    def execute(self, commands):
+        if not isinstance(commands, list):
+            commands = [commands]
+
+        self.batches.append([command for (_, command) in commands])
+
+        responses = []
+
+        for (_, command) in commands:
+            response = None
+
+            if isinstance(command, LoadAddressCounterHi):
+                self.address_counter = (command.address << 8) | (self.address_counter & 0xff)
+            elif isinstance(command, LoadAddressCounterLo):
+                self.address_counter = (self.address_counter & 0xff00) | command.address
+            elif isinstance(command, LoadSecondaryControl):
+                self.big = command.control.big
+            elif isinstance(command, ReadMultiple):
+                # Read to the next boundary, which is doubled for big.
+                boundary = self.boundary * 2 if self.big else self.boundary
+
+                end = (self.address_counter // boundary + 1) * boundary
+
+                response = bytes(self.regen[self.address_counter:end])
+
+                self.address_counter = end
+
+            responses.append(response)
+
+        return responses
+
+class ReadBufferTestCase(unittest.TestCase):
+    def setUp(self):
+        self.terminal = MockTerminal(bytes(range(256)) * 8)
+
+    def test(self):
+        # Act
+        buffer = read_buffer(self.terminal, 80, 1920)
+
+        # Assert
+        self.assertIsInstance(buffer, bytearray)
+        self.assertEqual(buffer, self.terminal.regen[80:2000])
+
+        self.assertEqual(len(self.terminal.batches), 1)
+        self.assertEqual(len([command for command in self.terminal.batches[0] if isinstance(command, ReadMultiple)]), 120)
+
+    def test_unaligned(self):
+        # Act
+        buffer = read_buffer(self.terminal, 81, 100)
+
+        # Assert
+        self.assertEqual(buffer, self.terminal.regen[81:181])
+
+        self.assertEqual(len(self.terminal.batches), 1)
+        self.assertEqual(len([command for command in self.terminal.batches[0] if isinstance(command, ReadMultiple)]), 7)
+
+    def test_remainder_is_read(self):
+        # Arrange
+        terminal = MockTerminal(self.terminal.regen, boundary=8)
+
+        # Act
+        buffer = read_buffer(terminal, 80, 100)
+
+        # Assert
+        self.assertEqual(buffer, terminal.regen[80:180])
+
+        self.assertGreater(len(terminal.batches), 1)
+
+    def test_big(self):
+        # Act
+        buffer = read_buffer(self.terminal, 64, 1920, big=True)
+
+        # Assert
+        self.assertEqual(buffer, self.terminal.regen[64:1984])
+
+        self.assertEqual(len(self.terminal.batches), 2)
+        self.assertTrue(self.terminal.batches[0][2].control.big)
+        self.assertFalse(self.terminal.batches[1][0].control.big)
+        self.assertFalse(self.terminal.big)
+
+    def test_error(self):
+        # Arrange
+        terminal = Mock()
+
+        terminal.execute = Mock(side_effect=lambda commands: [None, None, ReceiveTimeout()])
+
+        # Act and assert
+        with self.assertRaises(ReceiveTimeout):
+            read_buffer(terminal, 0, 10)
+
+class InterleaveEABTestCase(unittest.TestCase):
+    def test(self):
+        self.assertEqual(interleave_eab(b'\x01\x02\x03', b'\x80\x40\x00'), b'\x01\x80\x02\x40\x03\x00')
+
+    def test_empty(self):
+        self.assertEqual(interleave_eab(b'', b''), b'')
+
+    def test_length_mismatch(self):
+        with self.assertRaises(ValueError):
+            interleave_eab(b'\x01\x02', b'\x80')
+
+class DeinterleaveEABTestCase(unittest.TestCase):
+    def test(self):
+        self.assertEqual(deinterleave_eab(b'\x01\x80\x02\x40\x03\x00'), (b'\x01\x02\x03', b'\x80\x40\x00'))
+
+    def test_odd_length(self):
+        with self.assertRaises(ValueError):
+            deinterleave_eab(b'\x01\x80\x02')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,13 +1,14 @@
 import unittest
-from unittest.mock import Mock, create_autospec, call
+from unittest.mock import Mock, create_autospec, call, patch
 from serial import Serial
-import sliplib
 
 import context
 
 from coax.interface import InterfaceFeature, FrameFormat
-from coax.serial_interface import SerialInterface
-from coax.exceptions import InterfaceError, ReceiveTimeout
+from coax.serial_interface import SerialInterface, _get_transmit_receive_message, _MESSAGE_CACHE
+from coax.protocol import ReadStatus, WriteData
+from coax.slip import SlipError
+from coax.exceptions import InterfaceError, InterfaceTimeout, ReceiveTimeout
 
 class SerialInterfaceResetTestCase(unittest.TestCase):
     def setUp(self):
@@ -46,6 +47,41 @@ class SerialInterfaceResetTestCase(unittest.TestCase):
         self.assertTrue(self.interface.legacy_firmware_detected)
         self.assertEqual(self.interface.legacy_firmware_version, '1.2.3')
 
+    def test_features_and_message_buffer_size_are_queried(self):
+        # Arrange
+        self.interface._read_message.side_effect=[bytes.fromhex('01 32 70'), bytes.fromhex('01 10'), bytes.fromhex('01 00 00 39 e2')]
+
+        # Act
+        self.interface.reset()
+
+        # Assert
+        self.assertEqual(self.interface.features, {InterfaceFeature.PROTOCOL_3299})
+        self.assertEqual(self.interface.message_buffer_size, 14818)
+        self.assertEqual(self.interface.max_data_length, 7401)
+
+    def test_message_buffer_size_query_error_is_ignored(self):
+        # Arrange
+        self.interface._read_message.side_effect=[bytes.fromhex('01 32 70'), bytes.fromhex('01 10'), bytes.fromhex('02 01')]
+
+        # Act
+        self.interface.reset()
+
+        # Assert
+        self.assertIsNone(self.interface.message_buffer_size)
+        self.assertIsNone(self.interface.max_data_length)
+
+    def test_timeout(self):
+        # Arrange
+        timeouts = []
+
+        self.interface._read_message.side_effect = lambda: timeouts.append(self.serial.timeout) or bytes.fromhex('01 32 70')
+
+        # Act
+        self.interface.reset(timeout=0.5)
+
+        # Assert
+        self.assertEqual(timeouts[0], 0.5)
+
     def test_timeout_is_restored_after_reset(self):
         # Arrange
         self.serial.timeout = 123
@@ -80,6 +116,105 @@ class SerialInterfaceResetTestCase(unittest.TestCase):
         with self.assertRaisesRegex(InterfaceError, 'Invalid request message: Error description'):
             self.interface.reset()
 
+class SerialInterfaceWaitForReadyTestCase(unittest.TestCase):
+    def setUp(self):
+        self.serial = create_autospec(Serial, instance=True)
+
+        self.serial.timeout = None
+
+        self.interface = SerialInterface(self.serial)
+
+        self.interface._write_message = Mock()
+        self.interface._read_message = Mock()
+
+    def test_first_probe_response(self):
+        # Arrange
+        self.interface._read_message.return_value = bytes.fromhex('01 01 02 05 06 07')
+
+        # Act
+        self.interface.wait_for_ready()
+
+        # Assert
+        self.interface._write_message.assert_called_once_with(bytes.fromhex('f0 01'))
+        self.interface._read_message.assert_called_once()
+
+    def test_legacy_error_response(self):
+        # Arrange
+        self.interface._read_message.return_value = bytes.fromhex('02 02')
+
+        # Act
+        self.interface.wait_for_ready()
+
+        # Assert
+        self.interface._write_message.assert_called_once()
+
+    def test_probe_is_retried_until_response(self):
+        # Arrange
+        self.interface._read_message.side_effect = [InterfaceTimeout(), InterfaceError('SLIP protocol error'), bytes.fromhex('02 02'), InterfaceTimeout()]
+
+        # Act
+        self.interface.wait_for_ready()
+
+        # Assert
+        self.assertEqual(self.interface._write_message.call_count, 3)
+
+        # Late responses to earlier probes are consumed.
+        self.assertEqual(self.interface._read_message.call_count, 4)
+
+    def test_timeout(self):
+        # Arrange
+        self.interface._read_message.side_effect = InterfaceTimeout()
+
+        # Act and assert
+        with self.assertRaisesRegex(InterfaceTimeout, 'Interface did not respond'):
+            self.interface.wait_for_ready(timeout=0)
+
+    def test_timeout_is_restored(self):
+        # Arrange
+        self.serial.timeout = 123
+
+        self.interface._read_message.side_effect = [InterfaceTimeout(), bytes.fromhex('02 02'), InterfaceTimeout()]
+
+        # Act
+        self.interface.wait_for_ready()
+
+        # Assert
+        self.assertEqual(self.serial.timeout, 123)
+
+class SerialInterfaceGetInfoTestCase(unittest.TestCase):
+    def setUp(self):
+        self.serial = create_autospec(Serial, instance=True)
+
+        self.interface = SerialInterface(self.serial)
+
+        self.interface._write_message = Mock()
+        self.interface._read_message = Mock()
+
+    def test(self):
+        # Arrange
+        self.interface._read_message.side_effect=[bytes.fromhex('01 01 02 05 06 07'), b'\x01interface2', b'\x010.1.2 (build abc)', bytes.fromhex('01 00 00 39 e2'), bytes.fromhex('01 10')]
+
+        # Act
+        info = self.interface.get_info()
+
+        # Assert
+        self.assertEqual(info.hardware_type, 'interface2')
+        self.assertIsNone(info.hardware_revision)
+        self.assertIsNone(info.hardware_serial)
+        self.assertEqual(info.firmware_version, '0.1.2 (build abc)')
+        self.assertEqual(info.message_buffer_size, 14818)
+        self.assertEqual(info.features, {InterfaceFeature.PROTOCOL_3299})
+
+        self.interface._write_message.assert_has_calls([call(bytes.fromhex('f0 01')), call(bytes.fromhex('f0 02')), call(bytes.fromhex('f0 05')), call(bytes.fromhex('f0 06')), call(bytes.fromhex('f0 07'))])
+
+    def test_error_is_handled_correctly(self):
+        # Arrange
+        self.interface._read_message.return_value=bytes.fromhex('02 02')
+
+        # Act and assert
+        with self.assertRaisesRegex(InterfaceError, 'Unknown command'):
+            self.interface.get_info()
+
 class SerialInterfaceTransmitReceiveTestCase(unittest.TestCase):
     def setUp(self):
         self.serial = create_autospec(Serial, instance=True)
@@ -163,6 +298,16 @@ class SerialInterfaceTransmitReceiveTestCase(unittest.TestCase):
 
         self.interface._write_message.assert_called_with(bytes.fromhex('06 00 02 02 00 fe 03 00 01 00 00'))
 
+    def test_multiple_word_response(self):
+        # Arrange
+        self.interface._read_message.return_value=memoryview(bytes.fromhex('01 02 00 fe 03 01'))
+
+        # Act
+        responses = self.interface._transmit_receive([(None, (FrameFormat.WORD_DATA, 0b1111111111))], [2], None)
+
+        # Assert
+        self.assertEqual(responses, [[0b0000000010, 0b1111111110]])
+
     def test_receive_timeout_error(self):
         # Arrange
         self.interface._read_message.return_value=bytes.fromhex('02 66')
@@ -225,6 +370,174 @@ class SerialInterfaceTransmitReceiveTestCase(unittest.TestCase):
 
         self.interface._write_message.assert_has_calls([call(bytes.fromhex('06 00 00 ff 03 00 00 00 01 00 00')), call(bytes.fromhex('06 00 00 ff 03 02 00 fe 03 00 01 00 00'))])
 
+class SerialInterfaceExecutePreparedTestCase(unittest.TestCase):
+    def setUp(self):
+        self.serial = create_autospec(Serial, instance=True)
+
+        self.serial.timeout = 1
+
+        self.interface = SerialInterface(self.serial)
+
+        self.interface._write_message = Mock()
+        self.interface._read_message = Mock(return_value=bytes.fromhex('01 00 00'))
+
+    def test_messages_are_packed_once(self):
+        # Arrange
+        prepared_commands = self.interface.prepare(WriteData(bytes.fromhex('00 ff')), timeout=0.1)
+
+        with patch('coax.serial_interface._pack_transmit_receive_message') as pack_transmit_receive_message:
+            # Act
+            self.interface.execute_prepared(prepared_commands)
+            self.interface.execute_prepared(prepared_commands)
+
+        # Assert
+        pack_transmit_receive_message.assert_not_called()
+
+        self.interface._write_message.assert_called_with(bytes.fromhex('06 00 00 31 00 02 00 fe 03 00 01 00 64'))
+        self.assertEqual(self.interface._write_message.call_count, 2)
+
+    def test_rebind(self):
+        # Arrange
+        prepared_commands = self.interface.prepare(WriteData(bytes.fromhex('00 ff')))
+
+        # Act
+        prepared_commands.rebind(0, bytes.fromhex('ff 00'))
+
+        self.interface.execute_prepared(prepared_commands)
+
+        # Assert
+        self.interface._write_message.assert_called_once_with(bytes.fromhex('06 00 00 31 00 fe 03 02 00 00 01 00 00'))
+
+    def test_unsupported_3299_protocol(self):
+        # Act and assert
+        with self.assertRaises(NotImplementedError):
+            self.interface.prepare((0b111000, ReadStatus()))
+
+    def test_timeout_greater_than_serial_timeout(self):
+        # Act and assert
+        with self.assertRaises(ValueError):
+            self.interface.prepare(ReadStatus(), timeout=5)
+
+class GetTransmitReceiveMessageTestCase(unittest.TestCase):
+    def setUp(self):
+        _MESSAGE_CACHE.clear()
+
+    def test_word_data_frame_without_data_is_cached(self):
+        # Act
+        message1 = _get_transmit_receive_message(None, (FrameFormat.WORD_DATA, 0b0000000101), 1, 0)
+        message2 = _get_transmit_receive_message(None, (FrameFormat.WORD_DATA, 0b0000000101), 1, 0)
+
+        # Assert
+        self.assertEqual(message1, bytes.fromhex('06 00 00 05 00 00 01 00 00'))
+        self.assertIs(message1, message2)
+
+    def test_address_and_timeout_are_part_of_key(self):
+        # Act
+        message1 = _get_transmit_receive_message(None, (FrameFormat.WORD_DATA, 0b0000000101), 1, 0)
+        message2 = _get_transmit_receive_message(1, (FrameFormat.WORD_DATA, 0b0000000101), 1, 0)
+        message3 = _get_transmit_receive_message(None, (FrameFormat.WORD_DATA, 0b0000000101), 1, 100)
+
+        # Assert
+        self.assertEqual(message1, bytes.fromhex('06 00 00 05 00 00 01 00 00'))
+        self.assertEqual(message2, bytes.fromhex('06 00 00 01 80 05 00 00 01 00 00'))
+        self.assertEqual(message3, bytes.fromhex('06 00 00 05 00 00 01 00 64'))
+
+    def test_frame_with_data_is_not_cached(self):
+        # Act
+        message = _get_transmit_receive_message(None, (FrameFormat.WORD_DATA, 0b1111111111, [0x00, 0xff]), 1, 0)
+
+        # Assert
+        self.assertEqual(message, bytes.fromhex('06 00 00 ff 03 02 00 fe 03 00 01 00 00'))
+        self.assertEqual(len(_MESSAGE_CACHE), 0)
+
+class SerialInterfacePipelineTestCase(unittest.TestCase):
+    def setUp(self):
+        self.serial = create_autospec(Serial, instance=True)
+
+        self.serial.timeout = None
+
+        self.interface = SerialInterface(self.serial, pipeline_depth=2)
+
+        self.calls = Mock()
+
+        self.interface._write_message = self.calls.write
+        self.interface._read_message = self.calls.read
+
+        self.frames = [(None, (FrameFormat.WORDS, [0b1111111111, 0b0000000000])) for _ in range(3)]
+
+    def test_messages_are_pipelined(self):
+        # Arrange
+        self.calls.read.return_value=bytes.fromhex('01 00 00')
+
+        # Act
+        responses = self.interface._transmit_receive(self.frames, [1, 1, 1], None)
+
+        # Assert
+        self.assertEqual(responses, [[0], [0], [0]])
+
+        self.assertEqual([name for (name, _, _) in self.calls.mock_calls], ['write', 'write', 'read', 'write', 'read', 'read'])
+
+    def test_message_buffer_size_limits_messages_in_flight(self):
+        # Arrange
+        self.interface.message_buffer_size = 20
+
+        self.calls.read.return_value=bytes.fromhex('01 00 00')
+
+        # Act
+        self.interface._transmit_receive(self.frames, [1, 1, 1], None)
+
+        # Assert
+        self.assertEqual([name for (name, _, _) in self.calls.mock_calls], ['write', 'read', 'write', 'read', 'write', 'read'])
+
+    def test_receive_timeout_error(self):
+        # Arrange
+        self.calls.read.side_effect=[bytes.fromhex('01 00 00'), bytes.fromhex('02 66'), bytes.fromhex('01 00 00')]
+
+        # Act
+        responses = self.interface._transmit_receive(self.frames, [1, 1, 1], None)
+
+        # Assert
+        self.assertEqual(responses[0], [0])
+        self.assertIsInstance(responses[1], ReceiveTimeout)
+        self.assertEqual(responses[2], [0])
+
+    def test_interface_error_consumes_messages_in_flight(self):
+        # Arrange
+        self.calls.read.side_effect=[bytes.fromhex('02 65'), bytes.fromhex('01 00 00')]
+
+        # Act and assert
+        with self.assertRaises(InterfaceError):
+            self.interface._transmit_receive(self.frames, [1, 1, 1], None)
+
+        self.assertEqual([name for (name, _, _) in self.calls.mock_calls], ['write', 'write', 'read', 'read'])
+
+    def test_interface_timeout_consumes_messages_in_flight(self):
+        # Arrange
+        self.calls.read.side_effect=[InterfaceTimeout(), bytes.fromhex('01 00 00'), bytes.fromhex('01 00 00')]
+
+        # Act and assert
+        with self.assertRaises(InterfaceTimeout):
+            self.interface._transmit_receive(self.frames, [1, 1, 1], None)
+
+        self.assertEqual([name for (name, _, _) in self.calls.mock_calls], ['write', 'write', 'read', 'read', 'read'])
+
+    def test_interface_timeout_then_execute(self):
+        # Arrange
+        self.calls.read.side_effect=[InterfaceTimeout(), bytes.fromhex('01 00 00'), bytes.fromhex('01 04 00'), bytes.fromhex('01 08 00')]
+
+        with self.assertRaises(InterfaceTimeout):
+            self.interface._transmit_receive(self.frames, [1, 1, 1], None)
+
+        # Act
+        responses = self.interface._transmit_receive(self.frames[:1], [1], None)
+
+        # Assert
+        self.assertEqual(responses, [[8]])
+
+    def test_invalid_pipeline_depth(self):
+        with self.assertRaises(ValueError):
+            SerialInterface(self.serial, pipeline_depth=0)
+
 class SerialInterfaceReadMessageTestCase(unittest.TestCase):
     def setUp(self):
         self.serial = create_autospec(Serial, instance=True)
@@ -245,7 +558,7 @@ class SerialInterfaceReadMessageTestCase(unittest.TestCase):
 
     def test_protocol_error_is_handled_correctly(self):
         # Arrange
-        self.interface.slip_serial.recv_msg.side_effect=sliplib.ProtocolError
+        self.interface.slip_serial.recv_msg.side_effect=SlipError
 
         # Act and assert
         with self.assertRaisesRegex(InterfaceError, 'SLIP protocol error'):
@@ -275,6 +588,50 @@ class SerialInterfaceReadMessageTestCase(unittest.TestCase):
         with self.assertRaisesRegex(InterfaceError, 'Empty response message'):
             self.interface._read_message()
 
+class SlipSerialTestCase(unittest.TestCase):
+    def setUp(self):
+        self.serial = create_autospec(Serial, instance=True)
+
+        self.serial.closed = False
+
+        self.interface = SerialInterface(self.serial)
+
+    def test_message_split_across_reads(self):
+        # Arrange
+        self.serial.in_waiting = 4
+
+        self.serial.read.side_effect=[bytes.fromhex('c0 00 04 01 02'), bytes.fromhex('03 04 00 00 c0')]
+
+        # Act
+        message = self.interface._read_message()
+
+        # Assert
+        self.assertEqual(message, bytes.fromhex('01 02 03 04'))
+
+    def test_multiple_messages_in_single_read(self):
+        # Arrange
+        self.serial.in_waiting = 20
+
+        self.serial.read.return_value=bytes.fromhex('c0 00 01 01 00 00 c0 c0 00 01 02 00 00 c0')
+
+        # Act
+        messages = [self.interface._read_message(), self.interface._read_message()]
+
+        # Assert
+        self.assertEqual(messages, [bytes.fromhex('01'), bytes.fromhex('02')])
+
+        self.serial.read.assert_called_once()
+
+    def test_timeout(self):
+        # Arrange
+        self.serial.in_waiting = 0
+
+        self.serial.read.return_value=b''
+
+        # Act and assert
+        with self.assertRaises(InterfaceTimeout):
+            self.interface._read_message()
+
 class SerialInterfaceWriteMessageTestCase(unittest.TestCase):
     def setUp(self):
         self.serial = create_autospec(Serial, instance=True)
@@ -290,5 +647,7 @@ class SerialInterfaceWriteMessageTestCase(unittest.TestCase):
         # Assert
         self.interface.slip_serial.send_msg.assert_called_with(bytes.fromhex('00 04 01 02 03 04 00 00'))
 
+        self.serial.write.assert_called_with(bytes.fromhex('c0 00 04 01 02 03 04 00 00 c0'))
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,60 @@
+import unittest
+
+import context
+
+from coax.slip import SlipDecoder, SlipError, encode, decode
+
+class EncodeTestCase(unittest.TestCase):
+    def test(self):
+        self.assertEqual(encode(bytes.fromhex('01 02 03')), bytes.fromhex('c0 01 02 03 c0'))
+
+    def test_escape(self):
+        self.assertEqual(encode(bytes.fromhex('01 c0 db 02')), bytes.fromhex('c0 01 db dc db dd 02 c0'))
+
+class DecodeTestCase(unittest.TestCase):
+    def test(self):
+        self.assertEqual(decode(bytes.fromhex('01 02 03')), bytes.fromhex('01 02 03'))
+
+    def test_escape(self):
+        self.assertEqual(decode(bytes.fromhex('01 db dc db dd 02')), bytes.fromhex('01 c0 db 02'))
+
+    def test_escaped_escape_followed_by_escape_end_byte(self):
+        self.assertEqual(decode(bytes.fromhex('db dd dc')), bytes.fromhex('db dc'))
+
+    def test_invalid_escape(self):
+        for packet in [bytes.fromhex('01 db 02'), bytes.fromhex('01 db'), bytes.fromhex('db db dc')]:
+            with self.subTest(packet=packet):
+                with self.assertRaises(SlipError):
+                    decode(packet)
+
+class SlipDecoderTestCase(unittest.TestCase):
+    def setUp(self):
+        self.decoder = SlipDecoder()
+
+    def test_single_message(self):
+        self.assertEqual(self.decoder.decode(bytes.fromhex('c0 01 02 c0')), [bytes.fromhex('01 02')])
+
+    def test_multiple_messages(self):
+        self.assertEqual(self.decoder.decode(bytes.fromhex('c0 01 c0 c0 02 c0')), [bytes.fromhex('01'), bytes.fromhex('02')])
+
+    def test_partial_message(self):
+        self.assertEqual(self.decoder.decode(bytes.fromhex('c0 01 db')), [])
+        self.assertEqual(self.decoder.decode(bytes.fromhex('dc 02')), [])
+        self.assertEqual(self.decoder.decode(bytes.fromhex('c0')), [bytes.fromhex('01 c0 02')])
+
+    def test_invalid_message_is_returned_in_order(self):
+        messages = self.decoder.decode(bytes.fromhex('c0 01 c0 02 db 03 c0 04 c0'))
+
+        self.assertEqual(messages[0], bytes.fromhex('01'))
+        self.assertIsInstance(messages[1], SlipError)
+        self.assertEqual(messages[2], bytes.fromhex('04'))
+
+    def test_reset(self):
+        self.decoder.decode(bytes.fromhex('c0 01 02'))
+
+        self.decoder.reset()
+
+        self.assertEqual(self.decoder.decode(bytes.fromhex('03 c0')), [bytes.fromhex('03')])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,111 @@
+import unittest
+from unittest.mock import Mock, patch
+
+import context
+
+from coax.protocol import Status
+from coax.status import wait_for_status
+from coax.exceptions import ReceiveTimeout, StatusTimeout
+
+BUSY = Status(0b0000_0000)
+NOT_BUSY = Status(0b0010_0000)
+OPERATION_COMPLETE = Status(0b0010_0010)
+
+class WaitForStatusTestCase(unittest.TestCase):
+    def setUp(self):
+        self.interface = Mock()
+
+        self.statuses = []
+
+        self.interface.execute = Mock(side_effect=lambda commands: [self.statuses.pop(0) if self.statuses else BUSY for _ in commands])
+
+        patcher = patch('coax.status.time.sleep')
+
+        self.sleep = patcher.start()
+
+        self.addCleanup(patch.stopall)
+
+    def get_batch_sizes(self):
+        return [len(call[0][0]) for call in self.interface.execute.call_args_list]
+
+    def test_not_busy(self):
+        # Arrange
+        self.statuses = [NOT_BUSY]
+
+        # Act
+        (status, count) = wait_for_status(self.interface)
+
+        # Assert
+        self.assertIs(status, NOT_BUSY)
+        self.assertEqual(count, 1)
+
+        self.interface.execute.assert_called_once()
+
+    def test_batches(self):
+        # Arrange
+        self.statuses = [BUSY, BUSY, BUSY, BUSY, NOT_BUSY]
+
+        # Act
+        (status, count) = wait_for_status(self.interface)
+
+        # Assert
+        self.assertIs(status, NOT_BUSY)
+        self.assertEqual(count, 7)
+        self.assertEqual(self.get_batch_sizes(), [1, 2, 4])
+
+        self.sleep.assert_not_called()
+
+    def test_backoff(self):
+        # Arrange
+        self.statuses = [BUSY] * 15 + [BUSY] * 8 * 4 + [NOT_BUSY]
+
+        # Act
+        (status, count) = wait_for_status(self.interface, max_batch_size=8, max_interval=0.004, timeout=10)
+
+        # Assert
+        self.assertIs(status, NOT_BUSY)
+        self.assertEqual(self.get_batch_sizes(), [1, 2, 4, 8, 8, 8, 8, 8, 8])
+        self.assertEqual([call[0][0] for call in self.sleep.call_args_list], [0.001, 0.002, 0.004, 0.004, 0.004])
+
+    def test_predicate(self):
+        # Arrange
+        self.statuses = [NOT_BUSY, OPERATION_COMPLETE]
+
+        # Act
+        (status, count) = wait_for_status(self.interface, lambda status: status.operation_complete)
+
+        # Assert
+        self.assertIs(status, OPERATION_COMPLETE)
+        self.assertEqual(count, 3)
+
+    def test_address(self):
+        # Arrange
+        self.statuses = [NOT_BUSY]
+
+        # Act
+        wait_for_status(self.interface, address=0b111000)
+
+        # Assert
+        self.assertEqual(self.interface.execute.call_args[0][0][0][0], 0b111000)
+
+    def test_timeout(self):
+        # Arrange
+        self.statuses = [BUSY]
+
+        # Act and assert
+        with self.assertRaises(StatusTimeout) as context_manager:
+            wait_for_status(self.interface, timeout=0)
+
+        self.assertIs(context_manager.exception.status, BUSY)
+        self.assertEqual(context_manager.exception.count, 1)
+
+    def test_error_response(self):
+        # Arrange
+        self.statuses = [BUSY, ReceiveTimeout()]
+
+        # Act and assert
+        with self.assertRaises(ReceiveTimeout):
+            wait_for_status(self.interface)
+
+if __name__ == '__main__':
+    unittest.main()